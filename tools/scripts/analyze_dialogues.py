@@ -13,6 +13,7 @@ import textwrap # Import textwrap
 import subprocess
 import logging
 import sys
+from lib.analysis_utils import calculate_percentile_minimums, parse_percentage_series, parse_percentage_columns
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -29,27 +30,6 @@ pd.set_option('display.max_colwidth', 150) # Adjust display width for reports
 
 # --- Helper Functions ---
 
-def parse_percentage(value):
-    """Converts percentage strings ('X%') or ' - ' to floats (0.X or NaN)."""
-    if isinstance(value, (int, float)):
-        # Allow for values that might already be numeric (e.g., from cache)
-        if not np.isnan(value):
-             return float(value)
-        else:
-             return np.nan # Keep existing NaNs
-    if isinstance(value, str):
-        value = value.strip()
-        if value == '-' or value == '':
-            return np.nan
-        if value.endswith('%'):
-            try:
-                return float(value[:-1]) / 100.0
-            except ValueError:
-                # Catch cases like ' %' or non-numeric before %
-                return np.nan # Error during conversion
-    # Default to NaN if input is not recognized or fails conversion
-    return np.nan
-
 def longest_common_suffix(strings):
     """Calculates the longest common suffix of a list of strings."""
     if not strings:
@@ -237,7 +217,7 @@ def load_and_preprocess_data(csv_path, cache_path, force_reparse=False, padding_
                                 # Suppress SettingWithCopyWarning temporarily if it occurs here
                                 with warnings.catch_warnings():
                                     warnings.simplefilter("ignore", category=pd.errors.SettingWithCopyWarning)
-                                    df[col] = df[col].apply(parse_percentage)
+                                    df[col] = parse_percentage_series(df[col])
                             else:
                                 print(f"Warning: Identified segment column '{col}' not found in DataFrame for QID {q_id}. Columns: {df.columns.tolist()}")
 
@@ -284,7 +264,7 @@ def load_and_preprocess_data(csv_path, cache_path, force_reparse=False, padding_
                                 if col in df.columns:
                                      with warnings.catch_warnings():
                                         warnings.simplefilter("ignore", category=pd.errors.SettingWithCopyWarning)
-                                        df[col] = df[col].apply(parse_percentage)
+                                        df[col] = parse_percentage_series(df[col])
                                 else:
                                     print(f"Warning: Identified segment column '{col}' not found in DataFrame for final QID {q_id}. Columns: {df.columns.tolist()}")
 
@@ -478,7 +458,7 @@ def calculate_consensus_profiles(questions_data, consensus_output_dir,
     # Ensure output dir exists
     os.makedirs(consensus_output_dir, exist_ok=True)
     all_consensus_results = []
-    percentiles_to_calc.sort(reverse=True) # Ensure descending order for clarity
+    percentiles_to_calc = sorted(percentiles_to_calc, reverse=True) # Ensure descending order for clarity
     percentile_cols = [f'MinAgree_{p}pct' for p in percentiles_to_calc]
 
     for metadata, df in questions_data:
@@ -507,60 +487,31 @@ def calculate_consensus_profiles(questions_data, consensus_output_dir,
 
         print(f"  Processing QID {q_id} ('{q_text[:50]}...') with {len(analysis_segments)} segments.")
 
-        # Select only the valid segment columns for calculation
-        segment_data = df[analysis_segments].copy()
-        # Ensure data is numeric, converting errors to NaN
-        for col in analysis_segments:
-            segment_data[col] = pd.to_numeric(segment_data[col], errors='coerce')
-
-        for index, row in segment_data.iterrows():
-            # Get agreement rates for this response, drop NaNs
-            valid_rates = row.dropna()
+        # Select only the valid segment columns, converting errors to NaN
+        segment_data = df[analysis_segments].apply(pd.to_numeric, errors='coerce')
 
-            if valid_rates.empty:
-                continue # Skip if no valid rates for this response
-
-            # Sort rates descending to easily find percentile minimums
-            sorted_rates = valid_rates.sort_values(ascending=False)
-            num_valid_segments = len(sorted_rates)
-
-            response_profile = {
-                'Question ID': q_id,
-                'Question Text': q_text,
-                'Response Text': df.loc[index, response_col],
-                'Num Valid Segments': num_valid_segments
-            }
-
-            # Calculate minimum agreement for each requested percentile
-            for p in percentiles_to_calc:
-                col_name = f'MinAgree_{p}pct'
-                if p == 0: # Avoid division by zero if 0 is requested
-                    response_profile[col_name] = np.nan
-                    continue
-                
-                # Calculate the index corresponding to the percentile minimum
-                # We want the agreement rate of the segment at the cutoff defined by (100-p)%
-                # Example: For 90%, we want the minimum of the top 90%. If sorted DESC, 
-                # this is the value at index floor(N * 0.9) - 1 if N*0.9 is whole, or floor(N*0.9)
-                # More simply: calculate how many segments to *keep* (N * p/100)
-                # The minimum value among these kept segments is at index: ceil(N * p/100) - 1
-                
-                # Ensure k is at least 1 and does not exceed N
-                k = max(1, min(num_valid_segments, math.ceil(num_valid_segments * p / 100.0)))
-                idx_for_min = k - 1 # 0-based index
-                
-                # The value at this index in the DESC sorted list is the minimum agreement 
-                # achieved by at least p% of the segments.
-                response_profile[col_name] = sorted_rates.iloc[idx_for_min]
+        # Minimum agreement of the top p% of segments, for every response and percentile at once.
+        # For percentile p this is the k-th highest rate with k = ceil(N * p/100), clamped to [1, N].
+        num_valid, percentile_values = calculate_percentile_minimums(
+            segment_data.to_numpy(dtype=float), percentiles_to_calc
+        )
+        has_rates = num_valid > 0 # Skip responses without any valid rates
+        if not has_rates.any():
+            continue
 
-            all_consensus_results.append(response_profile)
+        question_results = pd.DataFrame(percentile_values[has_rates], columns=percentile_cols)
+        question_results.insert(0, 'Question ID', q_id)
+        question_results.insert(1, 'Question Text', q_text)
+        question_results.insert(2, 'Response Text', df[response_col].to_numpy()[has_rates])
+        question_results.insert(3, 'Num Valid Segments', num_valid[has_rates])
+        all_consensus_results.append(question_results)
 
     if not all_consensus_results:
         print("No consensus profiles generated (no valid Ask Opinion responses found?).")
         return pd.DataFrame()
 
     # Create DataFrame
-    results_df = pd.DataFrame(all_consensus_results)
+    results_df = pd.concat(all_consensus_results, ignore_index=True)
 
     # --- Generate Reports ---
     # 1. Full Profiles Report
@@ -766,68 +717,31 @@ def calculate_major_segment_consensus(questions_data, major_segment_column_names
                  print(f"  Skipping QID {q_id} - Could not find response column ('{response_col}' or '{response_col_fallback}').")
                  continue
 
-        # Convert relevant columns to numeric once for the question
-        for col in available_major_segments:
-             # Ensure column is numeric, coercing errors. Use temporary copy to avoid SettingWithCopyWarning
-             temp_col_data = pd.to_numeric(df[col], errors='coerce')
-             # Check if the column *after* coercion is different from original (if types changed)
-             # This is tricky, safer to just assign back if needed, or rely on later .loc access
-             # Let's assume the original df needs modification or work on copies for calculations.
-             # Best approach: extract needed data per row.
-
-        # print(f"  Processing QID {q_id} ('{q_text[:50]}...') with {len(available_major_segments)} available major segments.")
-
-        for index, row in df.iterrows():
-            # --- CORRECTED LOGIC START ---
-            # Step 1: Parse rates for AVAILABLE major segments using the correct function
-            parsed_available_rates = {}
-            for seg_col in available_major_segments:
-                if seg_col in row.index: # Check if segment exists for this question's row
-                    # Use parse_percentage to get float or NaN
-                    parsed_available_rates[seg_col] = parse_percentage(row[seg_col])
-                # No else needed, we only care about available segments for the minimum calculation
-
-            # Step 2: Calculate the minimum agreement rate from the correctly parsed rates
-            # Convert dict values to a pandas Series to easily drop NaN and find min
-            major_rates_series = pd.Series(list(parsed_available_rates.values())).dropna()
-
-            if major_rates_series.empty: # Need at least one valid major segment rate
-                continue
+        # Parse the rates of the available major segments for all responses at once
+        parsed_rates = parse_percentage_columns(df[available_major_segments])
 
-            min_major_agree = major_rates_series.min() # Calculate min from CORRECTLY parsed rates
-            # --- CORRECTED LOGIC END ---
+        # Minimum agreement across *available* major segments (NaN if none has a valid rate)
+        min_major_agree = parsed_rates.min(axis=1)
 
-            # Filter for responses where minimum agreement across *available* major segments is > 50%
-            if min_major_agree > 0.50:
-                response_text = row[response_col]
-                result_dict = {
-                    'Question ID': q_id,
-                    'Question Text': q_text,
-                    'Response Text': response_text,
-                    'Min Agreement Across Major Segments': min_major_agree # Use the CORRECT minimum
-                }
-
-                # Populate the dictionary with ALL globally defined major segments
-                # --- CORRECTED LOGIC START ---
-                # Re-parse from the original row for each global major segment
-                for seg_col in major_segment_column_names: # Loop through ALL globally defined major segments
-                    if seg_col in row.index: # Check if the column exists in the original row
-                        # Parse the value directly from the row
-                        parsed_value = parse_percentage(row[seg_col])
-                        result_dict[seg_col] = parsed_value # Store the parsed value (float or NaN)
-                    else:
-                        # If the column doesn't exist in the row, store NaN
-                        result_dict[seg_col] = np.nan
-                # --- CORRECTED LOGIC END ---
+        # Filter for responses where minimum agreement across *available* major segments is > 50%
+        qualifying = (min_major_agree > 0.50).to_numpy()
+        if not qualifying.any():
+            continue
 
-                all_major_consensus_results.append(result_dict)
+        # Populate ALL globally defined major segments; segments absent from this question stay NaN
+        question_results = parsed_rates[qualifying].reindex(columns=major_segment_column_names).reset_index(drop=True)
+        question_results.insert(0, 'Question ID', q_id)
+        question_results.insert(1, 'Question Text', q_text)
+        question_results.insert(2, 'Response Text', df[response_col].to_numpy()[qualifying])
+        question_results.insert(3, 'Min Agreement Across Major Segments', min_major_agree.to_numpy()[qualifying])
+        all_major_consensus_results.append(question_results)
 
     if not all_major_consensus_results:
         print("  No responses found with >50% minimum agreement across available major segments.")
         return pd.DataFrame()
 
     # Create DataFrame from results
-    results_df = pd.DataFrame(all_major_consensus_results)
+    results_df = pd.concat(all_major_consensus_results, ignore_index=True)
 
     # Identify the dynamic major segment columns for sorting/display
     # These are columns added beyond the fixed ones
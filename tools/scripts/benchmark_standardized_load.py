@@ -0,0 +1,95 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import resource
+import time
+import pandas as pd
+from lib.agreement_store import get_typed_standardized_path, write_typed_standardized, read_typed_standardized, PYARROW_AVAILABLE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _rss_mb():
+    """Current resident set size of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss # KB on Linux, bytes on macOS
+        return peak / (1024 * 1024) if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+def _measure_load(file_format, std_csv_path):
+    """Loads the CSV or its typed copy in a fresh process and reports load time, RSS growth and frame size."""
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    df = read_typed_standardized(std_csv_path) if file_format == 'typed' else pd.read_csv(std_csv_path, low_memory=False)
+    elapsed = time.perf_counter() - start
+    return {
+        'seconds': elapsed,
+        'rss_mb': _rss_mb() - baseline,
+        'frame_mb': df.memory_usage(deep=True).sum() / (1024 * 1024),
+        'shape': df.shape,
+    }
+
+
+def measure_in_subprocess(file_format, path):
+    """Runs _measure_load in a spawned process so every measurement starts from a clean heap."""
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        return pool.apply(_measure_load, (file_format, path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare load time and memory of the standardized aggregate CSV and its typed Parquet copy.')
+
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument("--gd_number", type=int, nargs='+', help="One or more Global Dialogue cadence numbers (e.g., 1 2 3 4).")
+    input_group.add_argument("--standardized_csv", nargs='+', help="Explicit path(s) to standardized aggregate CSV files.")
+    parser.add_argument('--write_missing', action='store_true', help='Write the typed Parquet copy first where it is missing or stale.')
+
+    args = parser.parse_args()
+
+    if not PYARROW_AVAILABLE:
+        parser.error("pyarrow is required to read the typed standardized file (pip install pyarrow).")
+
+    if args.gd_number:
+        std_csv_paths = [os.path.join("Data", f"GD{n}", f"GD{n}_aggregate_standardized.csv") for n in args.gd_number]
+    else:
+        std_csv_paths = args.standardized_csv
+
+    results = []
+    for std_csv_path in std_csv_paths:
+        if not os.path.exists(std_csv_path):
+            logging.warning(f"Skipping {std_csv_path}: file not found.")
+            continue
+        typed_path = get_typed_standardized_path(std_csv_path)
+        stale = not os.path.exists(typed_path) or os.path.getmtime(typed_path) < os.path.getmtime(std_csv_path)
+        if stale and args.write_missing:
+            write_typed_standardized(std_csv_path)
+        elif stale:
+            logging.warning(f"Skipping {std_csv_path}: no up-to-date {typed_path} (use --write_missing).")
+            continue
+
+        logging.info(f"Measuring {std_csv_path}")
+        csv_stats = measure_in_subprocess('csv', std_csv_path)
+        typed_stats = measure_in_subprocess('typed', std_csv_path)
+        results.append((os.path.basename(std_csv_path), csv_stats, typed_stats))
+
+    if not results:
+        logging.error("Nothing to measure.")
+        exit(1)
+
+    print("\n--- Standardized Aggregate Load: CSV vs Typed Parquet ---")
+    print(f"{'File':<40} {'Rows x Cols':>14} {'CSV s':>8} {'Typed s':>8} {'Speedup':>8} "
+          f"{'CSV RSS MB':>11} {'Typed RSS MB':>13} {'CSV frame MB':>13} {'Typed frame MB':>15}")
+    for name, csv_stats, typed_stats in results:
+        shape = f"{csv_stats['shape'][0]} x {csv_stats['shape'][1]}"
+        print(f"{name:<40} {shape:>14} {csv_stats['seconds']:>8.2f} {typed_stats['seconds']:>8.2f} "
+              f"{csv_stats['seconds'] / typed_stats['seconds']:>7.1f}x {csv_stats['rss_mb']:>11.0f} "
+              f"{typed_stats['rss_mb']:>13.0f} {csv_stats['frame_mb']:>13.0f} {typed_stats['frame_mb']:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
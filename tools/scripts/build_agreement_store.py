@@ -0,0 +1,147 @@
+import argparse
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+from lib.analysis_utils import parse_percentage_series
+from lib.agreement_store import (
+    build_agreement_store, load_agreement_store, get_store_dir, get_segment_counts_path, PYARROW_AVAILABLE,
+    write_long_agreement_table, load_long_agreement_table, get_long_table_dir,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def _parse_percentage_cell(value):
+    """Per-cell reference parser with the semantics of parse_percentage_series (benchmark baseline)."""
+    if pd.isna(value):
+        return np.nan
+    text = str(value).strip()
+    try:
+        number = float(text.removesuffix('%').strip())
+    except ValueError:
+        return np.nan
+    if text.endswith('%'):
+        return number / 100.0
+    if 0 <= number <= 1:
+        return number
+    return number / 100.0 if 1 < number <= 100 else np.nan
+
+
+def run_parse_benchmark(n_cells, seed=0):
+    """Times per-cell Series.apply parsing against parse_percentage_series on a synthetic column."""
+    print(f"\n--- Benchmark: parsing {n_cells:,} agreement cells ---")
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"{i}%" for i in range(101)] + [f"{i}.5%" for i in range(100)] + ['-', ' - ', ''], dtype=object)
+    column = pd.Series(vocabulary[rng.integers(0, len(vocabulary), size=n_cells)], dtype=object)
+
+    start = time.perf_counter()
+    per_cell = pd.to_numeric(column.apply(_parse_percentage_cell), errors='coerce').to_numpy(dtype=float)
+    per_cell_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = parse_percentage_series(column).to_numpy()
+    vectorized_time = time.perf_counter() - start
+
+    print(f"  Series.apply (per cell): {per_cell_time:.3f}s")
+    print(f"  parse_percentage_series: {vectorized_time:.3f}s ({per_cell_time / vectorized_time:.1f}x faster)")
+    print(f"  Results identical: {np.array_equal(per_cell, vectorized, equal_nan=True)}")
+
+
+def _dir_size_mb(directory):
+    """Total size of the files in a directory, in MB."""
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file()) / (1024 * 1024)
+
+
+def report_long_format(std_csv_path, long_dir):
+    """Compares size and load time of the long-format table against the wide standardized CSV."""
+    start = time.perf_counter()
+    wide = pd.read_csv(std_csv_path, low_memory=False)
+    wide_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    tables = load_long_agreement_table(long_dir)
+    long_seconds = time.perf_counter() - start
+
+    wide_mb = os.path.getsize(std_csv_path) / (1024 * 1024)
+    long_mb = _dir_size_mb(long_dir)
+    segment_cells = len(wide) * len(tables['segments'])
+    print("\n--- Long-Format Agreement Table vs Wide CSV ---")
+    print(f"Segment cells in wide CSV: {segment_cells:,} ({len(wide):,} rows x {len(tables['segments'])} segments)")
+    print(f"Rows in long table: {len(tables['agreement']):,} ({len(tables['agreement']) / max(segment_cells, 1):.1%} of cells populated)")
+    print(f"Size: {wide_mb:.1f} MB wide CSV -> {long_mb:.1f} MB long table with dictionaries ({wide_mb / long_mb:.1f}x smaller)")
+    print(f"Load time: {wide_seconds:.2f}s wide CSV -> {long_seconds:.2f}s long table with dictionaries ({wide_seconds / long_seconds:.1f}x faster)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a standardized aggregate CSV into the pre-parsed numeric agreement store used by the analysis scripts.')
+
+    # Input specification
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument("--gd_number", type=int, help="Global Dialogue cadence number (e.g., 1, 2, 3). Constructs default paths.")
+    input_group.add_argument("--standardized_csv", help="Explicit path to the standardized aggregate CSV file.")
+    input_group.add_argument("--benchmark", type=int, metavar="N", help="Time percentage parsing on a synthetic column of N cells and exit.")
+
+    parser.add_argument('--segment_counts_csv', help='Path to the segment counts per question CSV file (default: next to the standardized CSV).')
+    parser.add_argument('-o', '--output_dir', help='Store directory (default: GD<N>_agreement_store next to the standardized CSV).')
+    parser.add_argument('--long_format', action='store_true', help='Also write the long-format agreement table (one row per populated response x segment cell, integer-coded keys) and compare it with the wide CSV.')
+    parser.add_argument('--long_output_dir', help='Long-format table directory (default: GD<N>_agreement_long next to the standardized CSV).')
+    parser.add_argument('--debug', action='store_true', help='Enable debug logging.')
+
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    if args.benchmark:
+        run_parse_benchmark(args.benchmark)
+        return
+
+    if not PYARROW_AVAILABLE:
+        parser.error("pyarrow is required to build the agreement store (pip install pyarrow).")
+
+    # --- Determine File Paths ---
+    if args.gd_number:
+        gd_identifier = f"GD{args.gd_number}"
+        std_csv_path = os.path.join("Data", gd_identifier, f"{gd_identifier}_aggregate_standardized.csv")
+    else:
+        std_csv_path = args.standardized_csv
+    counts_csv_path = args.segment_counts_csv or get_segment_counts_path(std_csv_path)
+    store_dir = args.output_dir or get_store_dir(std_csv_path)
+
+    if not os.path.exists(std_csv_path):
+        parser.error(f"Standardized input file not found. Expected at: {std_csv_path}")
+
+    logging.info(f"  Standardized Data: {std_csv_path}")
+    logging.info(f"  Segment Counts: {counts_csv_path}")
+    logging.info(f"  Store Directory: {store_dir}")
+
+    # --- Build ---
+    if build_agreement_store(std_csv_path, counts_csv_path, store_dir) is None:
+        exit(1)
+
+    # --- Report open time ---
+    start = time.perf_counter()
+    store = load_agreement_store(store_dir)
+    open_ms = (time.perf_counter() - start) * 1000
+    agreement = store['agreement']
+
+    print("\n--- Agreement Store Summary ---")
+    print(f"Rows: {agreement.shape[0]}")
+    print(f"Segments: {agreement.shape[1]} ({store['segments']['O-Code'].notna().sum()} with an O-code)")
+    print(f"Questions: {len(store['segment_sizes'])}")
+    print(f"Cells with agreement data: {int(np.count_nonzero(~np.isnan(agreement)))}")
+    print(f"Open time: {open_ms:.1f} ms")
+
+    # --- Long-format table ---
+    if args.long_format:
+        long_dir = args.long_output_dir or get_long_table_dir(std_csv_path)
+        if write_long_agreement_table(store_dir, long_dir) is None:
+            exit(1)
+        report_long_format(std_csv_path, long_dir)
+
+    logging.info("Agreement store build finished.")
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,14 @@ import logging
 import os
 import pandas as pd
 import numpy as np
-import math
 import re
 # Assuming analysis_utils has the refined get_segment_columns
-from lib.analysis_utils import parse_percentage, get_segment_columns
+from lib.analysis_utils import get_segment_columns, calculate_percentile_minimums
+from lib.agreement_store import load_standardized_store, get_store_segment_columns, iter_store_blocks, block_rates
+from lib.streaming_topk import StreamingTopK
+from lib.segment_pairs import (
+    calculate_segment_pair_divergence, top_segment_pairs, calculate_bridging_scores, top_bridging_responses,
+)
 
 # --- Suppress PerformanceWarning ---
 import warnings
@@ -20,44 +24,51 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 # --- Core Calculation Functions (modified for standardized data) ---
 
-def calculate_consensus_profiles(standardized_df, segment_counts_df, output_dir,
+def calculate_consensus_profiles(store, segment_counts_df, output_dir,
                                  min_segment_size, # Now required for per-question filtering
                                  percentiles_to_calc=[100, 95, 90, 80, 70, 60, 50, 40, 30, 20, 10],
                                  top_n_percentiles=[100, 95, 90],
-                                 top_n_count=5):
+                                 top_n_count=5, chunksize=None):
     """
     Calculates consensus profiles for Ask Opinion questions using standardized data.
     Filters segments per question based on counts from segment_counts_df.
 
     Args:
-        standardized_df (pd.DataFrame): DataFrame from _aggregate_standardized.csv.
+        store (dict): Agreement store of _aggregate_standardized.csv (see lib/agreement_store.py).
         segment_counts_df (pd.DataFrame): DataFrame from _segment_counts_by_question.csv.
         output_dir (str): Directory to save the consensus report CSV files.
         min_segment_size (int): Minimum participant count for a segment to be included in analysis for a specific question.
         percentiles_to_calc (list): List of percentiles to calculate consensus for.
-        top_n_percentiles (list): List of percentiles to show top N responses for.
+        top_n_percentiles (list): List of percentiles to show top N responses for (calculated
+                    even if missing from percentiles_to_calc; the first one orders the report).
         top_n_count (int): Number of top responses to show for each percentile.
+        chunksize (int): Score the store in blocks of this many rows. Profiles are then
+                    written block by block in file order instead of sorted, and only the
+                    top responses are kept in memory.
 
     Returns:
-        pd.DataFrame: DataFrame containing all consensus results.
+        pd.DataFrame: DataFrame containing all consensus results (with chunks: the top
+                    top_n_count responses by the first of top_n_percentiles).
                     Returns empty DataFrame if no Ask Opinion questions found or processed.
     """
     print("\n--- Calculating Consensus Profiles (using standardized data) --- ")
     os.makedirs(output_dir, exist_ok=True)
+    streaming = chunksize is not None
     all_consensus_results = []
-    percentiles_to_calc.sort(reverse=True) # Ensure descending order for clarity
+    # Ensure descending order for clarity; the top N columns must exist to sort by them
+    percentiles_to_calc = sorted(set(percentiles_to_calc) | set(top_n_percentiles), reverse=True)
     percentile_cols = [f'MinAgree_{p}pct' for p in percentiles_to_calc]
+    sort_col = f'MinAgree_{top_n_percentiles[0]}pct'
+    report_path_profiles = os.path.join(output_dir, 'consensus_profiles.csv')
+    # Ties broken like idxmax over the in-memory results: by question, then file order
+    top_responses = StreamingTopK(top_n_count, [sort_col, 'Question ID', 'Row Position'], [False, True, True])
+    reported_questions = set()
+    rows_written = 0
 
-    # Identify all potential segment columns from the standardized data
-    # Exclude known non-segment columns that are part of the base header
-    base_cols = ["Question ID", "Question Type", "Question", "Response", "OriginalResponse",
-                 "Star", "Categories", "Sentiment", "Submitted By", "Language", "Sample ID", "Participant ID"]
-    all_segment_columns = [col for col in standardized_df.columns if col not in base_cols]
-
+    all_segment_columns = get_store_segment_columns(store)
     if not all_segment_columns:
          print("  Error: No segment columns found in the standardized data header.")
          return pd.DataFrame()
-
     print(f"  Identified {len(all_segment_columns)} potential segment columns in standardized data.")
 
     # Pre-process segment counts for easier lookup
@@ -67,13 +78,71 @@ def calculate_consensus_profiles(standardized_df, segment_counts_df, output_dir,
         if col in segment_counts_df.columns:
              segment_counts_df[col] = pd.to_numeric(segment_counts_df[col], errors='coerce')
 
+    for rows, agreement in iter_store_blocks(store, chunksize):
+        block_results = _score_consensus_block(
+            rows, agreement, segment_counts_df, all_segment_columns, min_segment_size,
+            percentiles_to_calc, percentile_cols, reported_questions
+        )
+        if block_results.empty:
+            continue
+        if not streaming:
+            all_consensus_results.append(block_results)
+            continue
+
+        # Streaming: append this block's profiles and keep only the top responses
+        top_responses.update(block_results)
+        try:
+            block_results.drop(columns=['Row Position']).to_csv(
+                report_path_profiles, mode='w' if rows_written == 0 else 'a', header=rows_written == 0,
+                index=False, float_format='%.4f'
+            )
+            rows_written += len(block_results)
+        except Exception as e:
+            print(f"  Error saving full consensus profiles report: {e}")
+
+    if streaming:
+        if rows_written == 0:
+            print("No consensus profiles generated (no valid Ask Opinion responses found or processed?).")
+            return pd.DataFrame()
+        print(f"  Saved full consensus profiles ({rows_written} responses, in file order) to: {report_path_profiles}")
+        print("--- Consensus Profile Calculation Complete ---")
+        return top_responses.result().drop(columns=['Row Position'])
+
+    if not all_consensus_results:
+        print("No consensus profiles generated (no valid Ask Opinion responses found or processed?).")
+        return pd.DataFrame()
+
+    # Create DataFrame
+    results_df = pd.concat(all_consensus_results, ignore_index=True).drop(columns=['Row Position'])
+
+    # --- Generate Reports ---
+    # 1. Full Profiles Report
+    try:
+        # Sort by highest percentile first
+        results_df.sort_values(by=sort_col, ascending=False).to_csv(report_path_profiles, index=False, float_format='%.4f')
+        print(f"  Saved full consensus profiles to: {report_path_profiles}")
+    except Exception as e:
+        print(f"  Error saving full consensus profiles report: {e}")
+
+    print("--- Consensus Profile Calculation Complete ---")
+    return results_df
+
+
+def _score_consensus_block(rows, agreement, segment_counts_df, all_segment_columns, min_segment_size,
+                           percentiles_to_calc, percentile_cols, reported_questions):
+    """Percentile minimums for the Ask Opinion responses of one block (whole file or one chunk)."""
+    segment_position = {col: i for i, col in enumerate(all_segment_columns)}
+    block_results = []
+
     # Group by question and process each one
-    for q_id, group in standardized_df.groupby('Question ID'):
+    for q_id, group in rows.groupby('Question ID'):
         q_text = group['Question'].iloc[0]
         q_type = group['Question Type'].iloc[0]
 
         if q_type != 'Ask Opinion':
             continue
+        first_seen = q_id not in reported_questions
+        reported_questions.add(q_id)
 
         # --- Filter segments for *this specific question* ---
         try:
@@ -83,97 +152,63 @@ def calculate_consensus_profiles(standardized_df, segment_counts_df, output_dir,
                 if col in q_counts.index and pd.notna(q_counts[col]) and q_counts[col] >= min_segment_size
             ]
         except KeyError:
-             print(f"  Skipping QID {q_id} - Could not find segment counts for this question ID.")
+             if first_seen:
+                 print(f"  Skipping QID {q_id} - Could not find segment counts for this question ID.")
              continue
         except Exception as e:
              print(f"  Error accessing segment counts for QID {q_id}: {e}")
              continue
 
         if not valid_segments_for_q:
-            print(f"  Skipping QID {q_id} (Ask Opinion) - No segments met min size ({min_segment_size}) for this question.")
+            if first_seen:
+                print(f"  Skipping QID {q_id} (Ask Opinion) - No segments met min size ({min_segment_size}) for this question.")
             continue
 
-        print(f"  Processing QID {q_id} ('{q_text[:50]}...') with {len(valid_segments_for_q)} valid segments (>= {min_segment_size} participants).")
-
-        # Select only the valid segment columns for calculation from this group
-        segment_data = group[valid_segments_for_q].copy()
-
-        # Parse percentages and ensure numeric type
-        for col in valid_segments_for_q:
-            segment_data[col] = segment_data[col].apply(parse_percentage)
-            segment_data[col] = pd.to_numeric(segment_data[col], errors='coerce')
-
-        for index, row in segment_data.iterrows():
-            # Get agreement rates for this response, drop NaNs
-            valid_rates = row.dropna()
-
-            if valid_rates.empty:
-                continue # Skip if no valid rates for this response
-
-            # Sort rates descending to easily find percentile minimums
-            sorted_rates = valid_rates.sort_values(ascending=False)
-            num_valid_segments_for_row = len(sorted_rates)
-
-            # Use the group's index to get the original response text
-            response_text = group.loc[index, 'Response'] # Use new standard column name
+        if first_seen:
+            print(f"  Processing QID {q_id} ('{q_text[:50]}...') with {len(valid_segments_for_q)} valid segments (>= {min_segment_size} participants).")
 
-            response_profile = {
-                'Question ID': q_id,
-                'Question Text': q_text,
-                'Response Text': response_text,
-                'Num Valid Segments': num_valid_segments_for_row
-            }
+        # Responses x valid-segments rate matrix of this question
+        segment_data = block_rates(rows, agreement, group.index, [segment_position[col] for col in valid_segments_for_q])
 
-            # Calculate minimum agreement for each requested percentile
-            for p in percentiles_to_calc:
-                col_name = f'MinAgree_{p}pct'
-                if p == 0:
-                    response_profile[col_name] = np.nan; continue
-
-                # Calculate index for percentile minimum (same logic as before)
-                k = max(1, min(num_valid_segments_for_row, math.ceil(num_valid_segments_for_row * p / 100.0)))
-                idx_for_min = k - 1
-                response_profile[col_name] = sorted_rates.iloc[idx_for_min]
+        # All percentile minimums for all responses of the question in one pass
+        num_valid, percentile_values = calculate_percentile_minimums(segment_data, percentiles_to_calc)
+        has_rates = num_valid > 0 # Skip responses without any valid rates
+        if not has_rates.any():
+            continue
 
-            all_consensus_results.append(response_profile)
+        question_results = pd.DataFrame(percentile_values[has_rates], columns=percentile_cols)
+        question_results.insert(0, 'Question ID', q_id)
+        question_results.insert(1, 'Question Text', q_text)
+        question_results.insert(2, 'Response Text', group['Response'].to_numpy()[has_rates]) # Use new standard column name
+        question_results.insert(3, 'Num Valid Segments', num_valid[has_rates])
+        question_results['Row Position'] = group.index.to_numpy()[has_rates]
+        block_results.append(question_results)
 
-    if not all_consensus_results:
-        print("No consensus profiles generated (no valid Ask Opinion responses found or processed?).")
+    if not block_results:
         return pd.DataFrame()
-
-    # Create DataFrame
-    results_df = pd.DataFrame(all_consensus_results)
-
-    # --- Generate Reports ---
-    # 1. Full Profiles Report
-    report_path_profiles = os.path.join(output_dir, 'consensus_profiles.csv')
-    try:
-        # Sort by highest percentile first
-        results_df.sort_values(by=f'MinAgree_{top_n_percentiles[0]}pct', ascending=False).to_csv(report_path_profiles, index=False, float_format='%.4f')
-        print(f"  Saved full consensus profiles to: {report_path_profiles}")
-    except Exception as e:
-        print(f"  Error saving full consensus profiles report: {e}")
-
-    print("--- Consensus Profile Calculation Complete ---")
-    return results_df
+    return pd.concat(block_results, ignore_index=True)
 
 
-def calculate_major_segment_consensus(standardized_df, segment_counts_df, segment_details_map, output_dir,
+def calculate_major_segment_consensus(store, segment_counts_df, segment_details_map, output_dir,
                                       min_segment_size, # Used for dynamic threshold calc
-                                      top_n=10):
+                                      top_n=10, chunksize=None):
     """
     Calculates the minimum agreement rate across *dynamically determined major segments*
     for each Ask Opinion response (excluding NaN and 0% rates) and reports the top N
     responses per question based on this minimum agreement rate. Major segments are
     determined *per question* based on counts and criteria (>= threshold, not O1/O7).
 
+    The top N are selected with a streaming per-question top-K (ties keep file order),
+    so the data may be scored in chunks without holding every response in memory.
+
     Args:
-        standardized_df (pd.DataFrame): DataFrame from _aggregate_standardized.csv.
+        store (dict): Agreement store of _aggregate_standardized.csv (see lib/agreement_store.py).
         segment_counts_df (pd.DataFrame): DataFrame from _segment_counts_by_question.csv.
         segment_details_map (dict): Maps core segment names to their details (o_code).
         output_dir (str): Directory to save the major segment consensus report CSV files.
         min_segment_size (int): The *base* minimum segment size threshold (used if dynamic calc fails or as lower bound).
         top_n (int): Number of top responses per question to report.
+        chunksize (int): Score the store in blocks of this many rows.
 
     Returns:
         pd.DataFrame: DataFrame containing the top N responses per question,
@@ -182,14 +217,13 @@ def calculate_major_segment_consensus(standardized_df, segment_counts_df, segmen
     """
     print(f"\n--- Calculating Highest Minimum Agreement (Top {top_n}) Across Major Segments --- ")
     os.makedirs(output_dir, exist_ok=True)
-    all_min_rates_per_response = []
+    top_per_question = StreamingTopK(
+        top_n, ['Question ID', 'Min Agreement Rate', 'Row Position'], [True, False, True], group_by='Question ID'
+    )
     all_major_segments_used = set() # Track all major segments encountered across all questions
+    reported_questions = set()
 
-    # Identify all potential segment columns from the standardized data
-    base_cols = ["Question ID", "Question Type", "Question", "Response", "OriginalResponse",
-                 "Star", "Categories", "Sentiment", "Submitted By", "Language", "Sample ID", "Participant ID"]
-    all_segment_columns = [col for col in standardized_df.columns if col not in base_cols]
-
+    all_segment_columns = get_store_segment_columns(store)
     if not all_segment_columns:
          print("  Error: No segment columns found in the standardized data header.")
          return pd.DataFrame()
@@ -202,16 +236,64 @@ def calculate_major_segment_consensus(standardized_df, segment_counts_df, segmen
             if col in segment_counts_df.columns:
                 segment_counts_df[col] = pd.to_numeric(segment_counts_df[col], errors='coerce')
 
+    # Question-independent part of the major segment criteria: not 'All', not O1/O7
+    segment_index = pd.Index(all_segment_columns)
+    o_codes = [(segment_details_map.get(seg) or {}).get('o_code') for seg in all_segment_columns]
+    eligible_segments = (segment_index.str.lower() != 'all') & ~np.isin(np.array(o_codes, dtype=object), ['O1', 'O7'])
+
+    for rows, agreement in iter_store_blocks(store, chunksize):
+        top_per_question.update(_score_major_segment_block(
+            rows, agreement, segment_counts_df, segment_index, eligible_segments, min_segment_size,
+            all_major_segments_used, reported_questions
+        ))
+
+    # Top N per question, sorted by QID, then by Min Agreement Rate (descending)
+    top_n_df = top_per_question.result()
+    if top_n_df.empty:
+        print("\nNo responses found with a minimum agreement rate > 0% across identified major segments for any question.")
+        return pd.DataFrame()
+
+    # --- Ensure all major segment columns *encountered* are present ---
+    core_cols = ['Question ID', 'Question Text', 'Response Text', 'Min Agreement Rate']
+    # Use the set of all major segments found across all questions
+    all_expected_cols = core_cols + sorted(list(all_major_segments_used))
+    # Add any missing columns and fill with NA
+    top_n_df = top_n_df.reindex(columns=all_expected_cols, fill_value=pd.NA)
+
+    # Reorder columns for better readability
+    segment_rate_cols_in_df = [col for col in top_n_df.columns if col in all_major_segments_used]
+    segment_rate_cols_in_df.sort()
+    final_column_order = core_cols + segment_rate_cols_in_df
+    top_n_df = top_n_df[final_column_order]
+
+    # Save report
+    report_path = os.path.join(output_dir, f'major_segment_min_agreement_top{top_n}.csv')
+    try:
+        top_n_df.to_csv(report_path, index=False, float_format='%.4f')
+        print(f"  Saved Top {top_n} responses per question by minimum major segment agreement to: {report_path}")
+    except Exception as e:
+        print(f"  Error saving minimum agreement report: {e}")
+
+    print("--- Highest Minimum Agreement Calculation Complete ---")
+    return top_n_df
+
+
+def _score_major_segment_block(rows, agreement, segment_counts_df, segment_index, eligible_segments,
+                               min_segment_size, all_major_segments_used, reported_questions):
+    """Minimum positive major-segment agreement for the Ask Opinion responses of one block."""
+    all_min_rates_per_response = []
+
     # Group by question and process each one
-    for q_id, group in standardized_df.groupby('Question ID'):
+    for q_id, group in rows.groupby('Question ID'):
         q_text = group['Question'].iloc[0]
         q_type = group['Question Type'].iloc[0]
 
         if q_type != 'Ask Opinion':
             continue
+        first_seen = q_id not in reported_questions
+        reported_questions.add(q_id)
 
         # --- Dynamically Determine Major Segments for *this specific question* ---
-        major_segments_for_q = []
         try:
             q_counts = segment_counts_df.loc[q_id]
             # Determine threshold for this question
@@ -223,100 +305,163 @@ def calculate_major_segment_consensus(standardized_df, segment_counts_df, segmen
             else:
                  logging.debug(f"QID {q_id}: Cannot calculate dynamic threshold, using base min_segment_size ({min_segment_size}).")
 
-            for core_seg_name in all_segment_columns:
-                if core_seg_name.lower() == 'all': continue # Exclude 'All'
-
-                # Check size for this question
-                size = q_counts.get(core_seg_name)
-                if pd.isna(size) or size < min_threshold_q: continue # Skip if too small or NaN
-
-                # Check O-code from the details map
-                details = segment_details_map.get(core_seg_name)
-                o_code = details.get('o_code') if details else None
-
-                if o_code not in ['O1', 'O7']:
-                    major_segments_for_q.append(core_seg_name)
+            # Boolean mask over all segment columns: large enough for this question and eligible
+            sizes = pd.to_numeric(q_counts.reindex(segment_index), errors='coerce').to_numpy(dtype=float)
+            with np.errstate(invalid='ignore'):
+                major_mask = eligible_segments & (sizes >= min_threshold_q) # NaN sizes compare False
+            major_segments_for_q = segment_index[major_mask].tolist()
 
             if not major_segments_for_q:
                 # print(f"  Skipping QID {q_id} - No major segments identified meeting criteria for this question (threshold: {min_threshold_q}).")
                 continue
             all_major_segments_used.update(major_segments_for_q) # Add to overall set
-            print(f"  Processing QID {q_id} ('{q_text[:50]}...') with {len(major_segments_for_q)} major segments (threshold: {min_threshold_q}).")
+            if first_seen:
+                print(f"  Processing QID {q_id} ('{q_text[:50]}...') with {len(major_segments_for_q)} major segments (threshold: {min_threshold_q}).")
 
         except KeyError:
-             print(f"  Skipping QID {q_id} - Could not find segment counts.")
+             if first_seen:
+                 print(f"  Skipping QID {q_id} - Could not find segment counts.")
              continue
         except Exception as e:
              print(f"  Error determining major segments for QID {q_id}: {e}")
              continue
 
-        # Loop through responses (rows in the group)
-        for index, row in group.iterrows():
-            response_text = row['Response'] # Use new standard name
-            parsed_rates = {}
-
-            # 1. Get & Parse Rates for the major segments identified *for this question*
-            for seg_col in major_segments_for_q:
-                 # Value should already be in the row from standardized_df
-                 parsed_value = parse_percentage(row.get(seg_col)) # Use .get for safety
-                 if pd.notna(parsed_value):
-                      parsed_rates[seg_col] = parsed_value
-
-            # 2. Filter Rates for minimum calculation (Exclude zeros)
-            rates_for_min_calc = pd.Series(list(parsed_rates.values()))
-            rates_for_min_calc = rates_for_min_calc[rates_for_min_calc > 0.0]
-
-            # 3. Calculate Minimum if valid rates (>0) remain
-            if not rates_for_min_calc.empty:
-                min_rate = rates_for_min_calc.min()
-
-                # 4. Store result, including individual rates
-                result_data = {
-                    'Question ID': q_id,
-                    'Question Text': q_text,
-                    'Response Text': response_text,
-                    'Min Agreement Rate': min_rate
-                }
-                # Add individual parsed rates (including 0.0 if present)
-                result_data.update(parsed_rates)
-                all_min_rates_per_response.append(result_data)
+        # 1. Rates for the major segments of this question (responses x segments, NaN if missing)
+        rate_values = block_rates(rows, agreement, group.index, np.flatnonzero(major_mask))
+
+        # 2. Minimum over positive rates only (NaN and 0% excluded); rows without any are dropped
+        positive = rate_values > 0.0
+        has_positive = positive.any(axis=1)
+        if not has_positive.any():
+            continue
+        min_rates = np.where(positive, rate_values, np.inf).min(axis=1)
+
+        # 3. Store results, including individual rates (0.0 kept, NaN for missing)
+        question_results = pd.DataFrame(rate_values[has_positive], columns=major_segments_for_q)
+        question_results.insert(0, 'Question ID', q_id)
+        question_results.insert(1, 'Question Text', q_text)
+        question_results.insert(2, 'Response Text', group['Response'].to_numpy()[has_positive]) # Use new standard name
+        question_results.insert(3, 'Min Agreement Rate', min_rates[has_positive])
+        question_results['Row Position'] = group.index.to_numpy()[has_positive]
+        all_min_rates_per_response.append(question_results)
 
     if not all_min_rates_per_response:
-        print("\nNo responses found with a minimum agreement rate > 0% across identified major segments for any question.")
         return pd.DataFrame()
+    return pd.concat(all_min_rates_per_response, ignore_index=True)
 
-    # Create DataFrame from all calculated minimums
-    results_df = pd.DataFrame(all_min_rates_per_response)
 
-    # Sort by QID, then by Min Agreement Rate (descending)
-    results_df = results_df.sort_values(by=['Question ID', 'Min Agreement Rate'], ascending=[True, False])
+def calculate_bridging_report(store, segment_counts_df, output_dir, min_segment_size,
+                              segment_pairs=None, auto_pairs=5, top_n=10, min_pair_responses=5):
+    """
+    Finds bridging statements: Ask Opinion responses that opposing segments both agree with.
 
-    # Get Top N per Question
-    top_n_df = results_df.groupby('Question ID').head(top_n).reset_index(drop=True)
+    For each question, every response is scored against every segment pair at
+    once as min(agreement of A, agreement of B), and the top N responses per pair
+    are reported. Pairs are either given explicitly, or auto-detected per question
+    as the segment pairs that diverge most (highest mean absolute agreement
+    difference, see lib/segment_pairs.top_segment_pairs; 'All' is never paired).
+    Segments below min_segment_size for a question are left out of its pairs.
 
-    # --- Ensure all major segment columns *encountered* are present ---
-    core_cols = ['Question ID', 'Question Text', 'Response Text', 'Min Agreement Rate']
-    # Use the set of all major segments found across all questions
-    all_expected_cols = core_cols + sorted(list(all_major_segments_used))
-    # Add any missing columns and fill with NA
-    top_n_df = top_n_df.reindex(columns=all_expected_cols, fill_value=pd.NA)
+    Args:
+        store (dict): Agreement store of _aggregate_standardized.csv (see lib/agreement_store.py).
+        segment_counts_df (pd.DataFrame): DataFrame from _segment_counts_by_question.csv.
+        output_dir (str): Directory to save the bridging report CSV file.
+        min_segment_size (int): Minimum participant count for a segment to be included for a question.
+        segment_pairs (list): Optional list of (segment A, segment B) column-name pairs.
+        auto_pairs (int): Most divergent pairs per question to use when segment_pairs is not given.
+        top_n (int): Number of top responses per pair per question.
+        min_pair_responses (int): Minimum responses rated by both segments for an auto-detected pair.
 
-    # Reorder columns for better readability
-    segment_rate_cols_in_df = [col for col in top_n_df.columns if col in all_major_segments_used]
-    segment_rate_cols_in_df.sort()
-    final_column_order = core_cols + segment_rate_cols_in_df
-    top_n_df = top_n_df[final_column_order]
+    Returns:
+        pd.DataFrame: Top N bridging responses per pair per question (empty if none).
+    """
+    print(f"\n--- Calculating Bridging Statements (Top {top_n} per Segment Pair) --- ")
+    os.makedirs(output_dir, exist_ok=True)
 
-    # Save report
-    report_path = os.path.join(output_dir, f'major_segment_min_agreement_top{top_n}.csv')
+    all_segment_columns = get_store_segment_columns(store)
+    segment_position = {col: i for i, col in enumerate(all_segment_columns)}
+
+    if segment_pairs:
+        unknown = sorted({seg for pair in segment_pairs for seg in pair} - set(all_segment_columns))
+        if unknown:
+            print(f"  Warning: Ignoring pairs with segments not in the standardized data: {unknown}")
+        segment_pairs = [tuple(pair) for pair in segment_pairs if not set(pair) & set(unknown)]
+        if not segment_pairs:
+            print("  Error: No valid segment pairs to analyze.")
+            return pd.DataFrame()
+        print(f"  Using {len(segment_pairs)} requested segment pairs.")
+    else:
+        print(f"  Auto-detecting the {auto_pairs} most divergent segment pairs per question.")
+
+    if segment_counts_df.index.name != 'Question ID':
+        segment_counts_df = segment_counts_df.set_index('Question ID')
+
+    all_bridging_results = []
+    rows, agreement = store['rows'], store['agreement']
+    for q_id, group in rows.groupby('Question ID'):
+        q_text = group['Question'].iloc[0]
+        if group['Question Type'].iloc[0] != 'Ask Opinion':
+            continue
+        if q_id not in segment_counts_df.index:
+            print(f"  Skipping QID {q_id} - Could not find segment counts for this question ID.")
+            continue
+
+        sizes = pd.to_numeric(segment_counts_df.loc[q_id].reindex(all_segment_columns), errors='coerce')
+        valid_segments_for_q = [
+            col for col, size in zip(all_segment_columns, sizes) if size >= min_segment_size and col.lower() != 'all'
+        ]
+        if len(valid_segments_for_q) < 2:
+            continue
+        rates = block_rates(rows, agreement, group.index, [segment_position[col] for col in valid_segments_for_q])
+
+        # Pairs for this question, as column indices into `rates`
+        if segment_pairs:
+            position = {col: i for i, col in enumerate(valid_segments_for_q)}
+            q_pairs = [(position[a], position[b]) for a, b in segment_pairs if a in position and b in position]
+        else:
+            mean_abs_diff, opposite_count, pair_count = calculate_segment_pair_divergence(rates)
+            q_top_pairs = top_segment_pairs(mean_abs_diff, opposite_count, pair_count, valid_segments_for_q,
+                                            auto_pairs, min_pair_responses)
+            position = {col: i for i, col in enumerate(valid_segments_for_q)}
+            q_pairs = [(position[a], position[b]) for a, b in zip(q_top_pairs['Segment A'], q_top_pairs['Segment B'])]
+        if not q_pairs:
+            continue
+
+        # Responses x pairs bridging matrix, then the top N per pair
+        pair_a, pair_b = (np.array(idx) for idx in zip(*q_pairs))
+        scores = calculate_bridging_scores(rates, pair_a, pair_b)
+        response_idx, pair_idx, rank = top_bridging_responses(scores, top_n)
+        if len(response_idx) == 0:
+            continue
+        print(f"  Processing QID {q_id} ('{q_text[:50]}...') with {len(q_pairs)} segment pairs.")
+
+        segment_names = np.asarray(valid_segments_for_q, dtype=object)
+        all_bridging_results.append(pd.DataFrame({
+            'Question ID': q_id,
+            'Question Text': q_text,
+            'Segment A': segment_names[pair_a[pair_idx]],
+            'Segment B': segment_names[pair_b[pair_idx]],
+            'Rank': rank,
+            'Response Text': group['Response'].to_numpy()[response_idx],
+            'Bridging Score': scores[response_idx, pair_idx],
+            'Segment A Agreement': rates[response_idx, pair_a[pair_idx]],
+            'Segment B Agreement': rates[response_idx, pair_b[pair_idx]],
+        }))
+
+    if not all_bridging_results:
+        print("No bridging statements found (no Ask Opinion question had a valid segment pair).")
+        return pd.DataFrame()
+
+    results_df = pd.concat(all_bridging_results, ignore_index=True)
+    report_path = os.path.join(output_dir, f'bridging_statements_top{top_n}.csv')
     try:
-        top_n_df.to_csv(report_path, index=False, float_format='%.4f')
-        print(f"  Saved Top {top_n} responses per question by minimum major segment agreement to: {report_path}")
+        results_df.to_csv(report_path, index=False, float_format='%.4f')
+        print(f"  Saved top {top_n} bridging responses per segment pair to: {report_path}")
     except Exception as e:
-        print(f"  Error saving minimum agreement report: {e}")
+        print(f"  Error saving bridging report: {e}")
 
-    print("--- Highest Minimum Agreement Calculation Complete ---")
-    return top_n_df
+    print("--- Bridging Statement Calculation Complete ---")
+    return results_df
 
 
 def main():
@@ -345,6 +490,19 @@ def main():
     # Major Segment Consensus specific
     parser.add_argument('--top_n_major_consensus', type=int, default=10,
                        help='Number of top responses per question to report based on minimum major segment agreement.')
+    # Bridging statements
+    parser.add_argument('--bridging', action='store_true',
+                       help='Also rank responses by the minimum agreement of opposing segment pairs (bridging statements).')
+    parser.add_argument('--bridging_pair', nargs=2, action='append', metavar=('SEGMENT_A', 'SEGMENT_B'),
+                       help='Segment pair to bridge (repeatable, e.g. --bridging_pair "O2: Left" "O2: Right"). '
+                            'Default: the most divergent pairs of each question.')
+    parser.add_argument('--bridging_auto_pairs', type=int, default=5,
+                       help='Number of most divergent segment pairs per question to bridge when no --bridging_pair is given.')
+    parser.add_argument('--bridging_top_n', type=int, default=10,
+                       help='Number of top bridging responses per segment pair per question.')
+    parser.add_argument('--chunksize', type=int,
+                       help='Score the memory-mapped agreement store in blocks of this many rows, keeping only the top '
+                            'responses in memory (consensus_profiles.csv is then written in file order).')
 
     # Debug flag
     parser.add_argument('--debug', action='store_true', help='Enable debug logging.')
@@ -393,16 +551,12 @@ def main():
     os.makedirs(output_path, exist_ok=True)
 
     # --- Load Data ---
-    logging.info(f"Loading standardized data from: {std_csv_path}")
-    try:
-        standardized_data = pd.read_csv(std_csv_path, low_memory=False)
-        logging.info(f"Loaded standardized data with shape: {standardized_data.shape}")
-    except FileNotFoundError:
-        logging.error(f"Standardized data file not found: {std_csv_path}")
-        exit(1)
-    except Exception as e:
-        logging.error(f"Error loading standardized data: {e}")
+    # Memory-mapped agreement store next to the CSV (built on first use)
+    store = load_standardized_store(std_csv_path, counts_csv_path)
+    if store is None:
         exit(1)
+    if args.chunksize:
+        logging.info(f"Scoring standardized data in blocks of {args.chunksize} rows")
 
     logging.info(f"Loading segment counts data from: {counts_csv_path}")
     try:
@@ -417,12 +571,7 @@ def main():
 
     # --- Prepare Segment Details Map (for major segment O-code lookup) ---
     # Extract O-code directly from the core segment names in the standardized header
-    all_std_columns = standardized_data.columns.tolist()
-    base_cols = [
-        "Question ID", "Question Type", "Question", "Response", "OriginalResponse",
-        "Star", "Categories", "Sentiment", "Submitted By", "Language", "Sample ID", "Participant ID"
-    ]
-    all_segment_columns_std = [col for col in all_std_columns if col not in base_cols]
+    all_segment_columns_std = get_store_segment_columns(store)
     
     segment_details_map = {}
     o_code_pattern = re.compile(r'^O(\d+):') # Pattern to find O-code at the start
@@ -439,24 +588,37 @@ def main():
 
     # --- Run Analysis Functions ---
     consensus_results = calculate_consensus_profiles(
-        standardized_data.copy(), # Pass copy to avoid modifying original
+        store,
         segment_counts_data.copy(),
         output_path,
         min_segment_size=args.min_segment_size,
         percentiles_to_calc=args.percentiles,
         top_n_percentiles=args.top_n_percentiles,
-        top_n_count=args.top_n_count
+        top_n_count=args.top_n_count,
+        chunksize=args.chunksize
     )
 
     major_segment_results = calculate_major_segment_consensus(
-        standardized_data.copy(),
+        store,
         segment_counts_data.copy(),
         segment_details_map, # Pass the map for O-code lookup
         output_path,
         min_segment_size=args.min_segment_size, # Pass base min size
-        top_n=args.top_n_major_consensus
+        top_n=args.top_n_major_consensus,
+        chunksize=args.chunksize
     )
 
+    if args.bridging:
+        calculate_bridging_report(
+            store,
+            segment_counts_data.copy(),
+            output_path,
+            min_segment_size=args.min_segment_size,
+            segment_pairs=args.bridging_pair,
+            auto_pairs=args.bridging_auto_pairs,
+            top_n=args.bridging_top_n
+        )
+
     # --- Optional: Summary ---
     if consensus_results is not None and not consensus_results.empty and f'MinAgree_{args.top_n_percentiles[0]}pct' in consensus_results.columns:
          highest_consensus = consensus_results.loc[consensus_results[f'MinAgree_{args.top_n_percentiles[0]}pct'].idxmax()]
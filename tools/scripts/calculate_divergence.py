@@ -2,10 +2,14 @@
 import argparse
 import logging
 import os
-import math
 import pandas as pd
 import numpy as np
-from lib.analysis_utils import parse_percentage # Keep parse_percentage
+from lib.analysis_utils import two_sided_normal_p_values, benjamini_hochberg, calculate_family_eta_squared
+from lib.agreement_store import (
+    load_standardized_store, get_store_segment_columns, iter_store_blocks, block_rates, parse_o_code,
+)
+from lib.streaming_topk import StreamingTopK
+from lib.segment_pairs import calculate_segment_pair_divergence, top_segment_pairs
 
 # --- Suppress PerformanceWarning if needed ---
 import warnings
@@ -16,55 +20,330 @@ warnings.filterwarnings('ignore', category=PerformanceWarning)
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def calculate_divergence_report(standardized_df, segment_counts_df, output_dir,
-                                min_segment_size, # Now required for per-question filtering
-                                top_n_per_question=20, top_n_overall=50):
+# Significance of the max - min gap, added when segment sizes are known
+GAP_SIGNIFICANCE_COLUMNS = ['Gap SE', 'Gap Z', 'Gap P Value']
+GAP_FDR_COLUMN = 'Gap FDR Q Value'
+
+def calculate_divergence_scores(rates, segment_names, segment_sizes=None):
     """
-    Calculates divergence for Ask Opinion questions using standardized data.
-    Filters segments per question based on counts from segment_counts_df.
+    Computes divergence for every response of one question at once.
+
+    For each row of the responses x segments matrix, the score is
+    sqrt(max(max_rate - 0.5, 0) * max(0.5 - min_rate, 0)), i.e. positive only when
+    some segment agrees (> 50%) and another disagrees (< 50%). Rows with fewer than
+    two non-NaN rates are skipped.
+
+    With segment sizes, the max - min gap is also tested as a difference of two
+    proportions with the pooled standard error
+    SE = sqrt(p (1 - p) (1 / n_max + 1 / n_min)), p = (n_max p_max + n_min p_min) / (n_max + n_min),
+    z = gap / SE and a two-sided normal p-value, so a gap between small segments
+    counts for less than the same gap between large ones. Pooling keeps the SE
+    positive when a segment sits at 0% or 100% (a scored gap always straddles
+    50%); where a size is unknown the three columns are NaN, never inf.
+
+    Args:
+        rates (np.ndarray): Float matrix (responses x segments) of agreement rates (0-1), NaN for missing.
+        segment_names (list): Segment column names, one per matrix column.
+        segment_sizes (array-like): Optional participant count per segment column.
+
+    Returns:
+        pd.DataFrame: One row per response with a positive score, indexed by the row's
+                      position in `rates`, with Divergence Score, Min/Max Segment and
+                      Min/Max Agreement columns, plus Gap SE, Gap Z and Gap P Value
+                      when segment_sizes is given.
+    """
+    result_cols = ['Divergence Score', 'Min Segment', 'Min Agreement', 'Max Segment', 'Max Agreement']
+    if segment_sizes is not None:
+        result_cols += GAP_SIGNIFICANCE_COLUMNS
+    valid_rows = np.flatnonzero(np.sum(~np.isnan(rates), axis=1) >= 2)
+    if len(valid_rows) == 0:
+        return pd.DataFrame(columns=result_cols)
+
+    valid_rates = rates[valid_rows]
+    min_rate = np.nanmin(valid_rates, axis=1)
+    max_rate = np.nanmax(valid_rates, axis=1)
+
+    # Masked divergence: both sides must be on opposite sides of 50%
+    max_div = np.maximum(max_rate - 0.5, 0)
+    min_div = np.maximum(0.5 - min_rate, 0)
+    divergence_score = np.sqrt(max_div * min_div)
+    positive = divergence_score > 0
+    if not positive.any():
+        return pd.DataFrame(columns=result_cols)
+
+    # First occurrence of the min/max, matching Series.idxmin/idxmax
+    segment_names = np.asarray(segment_names, dtype=object)
+    min_idx = np.nanargmin(valid_rates[positive], axis=1)
+    max_idx = np.nanargmax(valid_rates[positive], axis=1)
+
+    results = pd.DataFrame({
+        'Divergence Score': divergence_score[positive],
+        'Min Segment': segment_names[min_idx],
+        'Min Agreement': min_rate[positive],
+        'Max Segment': segment_names[max_idx],
+        'Max Agreement': max_rate[positive],
+    }, index=valid_rows[positive])
+
+    if segment_sizes is not None:
+        segment_sizes = np.asarray(segment_sizes, dtype=float)
+        p_min, p_max = min_rate[positive], max_rate[positive]
+        n_min, n_max = segment_sizes[min_idx], segment_sizes[max_idx]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_pooled = (n_max * p_max + n_min * p_min) / (n_max + n_min)
+            gap_se = np.sqrt(p_pooled * (1 - p_pooled) * (1 / n_max + 1 / n_min))
+            gap_se = np.where(np.isfinite(gap_se) & (gap_se > 0), gap_se, np.nan) # e.g. unknown or zero sizes
+            gap_z = (p_max - p_min) / gap_se
+        results['Gap SE'] = gap_se
+        results['Gap Z'] = gap_z
+        results['Gap P Value'] = two_sided_normal_p_values(gap_z)
+    return results
+
+
+def calculate_segment_pair_report(store, segment_counts_df, output_dir, min_segment_size,
+                                  top_k=20, min_pair_responses=5):
+    """
+    Computes full segment x segment divergence matrices for every Ask Opinion question.
+
+    Segments are filtered per question by size as in the divergence report.
+    Saves:
+        - segment_pair_divergence.npz: question_ids, segments, and per-question
+          questions x segments x segments arrays mean_abs_diff (float32, NaN where not
+          compared), opposite_count and pair_count (int32), plus overall_* matrices
+          pooled across questions.
+        - segment_pair_divergence_top{top_k}.csv: the top_k pairs per question.
 
     Args:
-        standardized_df (pd.DataFrame): DataFrame from _aggregate_standardized.csv.
+        store (dict): Agreement store of _aggregate_standardized.csv (see lib/agreement_store.py).
         segment_counts_df (pd.DataFrame): DataFrame from _segment_counts_by_question.csv.
-        output_dir (str): Directory to save the divergence report CSV files.
+        output_dir (str): Directory to save the pairwise output files.
         min_segment_size (int): Minimum participant count for a segment to be included.
-        top_n_per_question (int): Number of top divergent responses to show per question.
-        top_n_overall (int): Number of top divergent responses to show overall.
+        top_k (int): Number of segment pairs to report per question.
+        min_pair_responses (int): Minimum responses rated by both segments for a pair to be ranked.
 
     Returns:
-        pd.DataFrame: DataFrame containing all divergence results (score > 0).
-                    Returns empty DataFrame if no Ask Opinion questions found or processed.
+        pd.DataFrame: The top-K pairs for all questions (empty if none).
     """
-    print("\n--- Calculating Divergence Report (using standardized data) --- ")
+    print("\n--- Calculating Segment Pair Divergence Matrices --- ")
     os.makedirs(output_dir, exist_ok=True)
-    all_divergence_results = []
 
-    # Identify all potential segment columns from the standardized data
-    base_cols = ["Question ID", "Question Type", "Question", "Response", "OriginalResponse",
-                 "Star", "Categories", "Sentiment", "Submitted By", "Language", "Sample ID", "Participant ID"]
-    all_segment_columns = [col for col in standardized_df.columns if col not in base_cols]
+    all_segment_columns = get_store_segment_columns(store)
+    segment_position = {col: i for i, col in enumerate(all_segment_columns)}
+    num_segments = len(all_segment_columns)
 
-    if not all_segment_columns:
-         print("  Error: No segment columns found in the standardized data header.")
-         return pd.DataFrame()
+    if segment_counts_df.index.name != 'Question ID':
+        segment_counts_df = segment_counts_df.set_index('Question ID')
 
-    print(f"  Identified {len(all_segment_columns)} potential segment columns in standardized data.")
+    question_ids, mean_matrices, opposite_matrices, count_matrices, top_pairs = [], [], [], [], []
+    overall_abs_sum = np.zeros((num_segments, num_segments), dtype=np.float64)
+    overall_opposite = np.zeros((num_segments, num_segments), dtype=np.int64)
+    overall_count = np.zeros((num_segments, num_segments), dtype=np.int64)
 
-    # Pre-process segment counts for easier lookup
+    rows, agreement = store['rows'], store['agreement']
+    for q_id, group in rows.groupby('Question ID'):
+        q_text = group['Question'].iloc[0]
+        if group['Question Type'].iloc[0] != 'Ask Opinion':
+            continue
+        if q_id not in segment_counts_df.index:
+            print(f"  Skipping QID {q_id} - Could not find segment counts for this question ID.")
+            continue
+
+        sizes = pd.to_numeric(segment_counts_df.loc[q_id].reindex(all_segment_columns), errors='coerce')
+        valid_segments_for_q = [col for col, size in zip(all_segment_columns, sizes) if size >= min_segment_size]
+        if len(valid_segments_for_q) < 2:
+            continue
+
+        idx = np.array([segment_position[col] for col in valid_segments_for_q])
+        rates = block_rates(rows, agreement, group.index, idx).astype(np.float32)
+        mean_abs_diff, opposite_count, pair_count = calculate_segment_pair_divergence(rates)
+        print(f"  QID {q_id}: {len(valid_segments_for_q)} segments x {len(group)} responses")
+
+        # Place the question's matrices into the full segment index (unused segments stay empty)
+        full_mean = np.full((num_segments, num_segments), np.nan, dtype=np.float32)
+        full_opposite = np.zeros((num_segments, num_segments), dtype=np.int32)
+        full_count = np.zeros((num_segments, num_segments), dtype=np.int32)
+        full_mean[np.ix_(idx, idx)] = mean_abs_diff
+        full_opposite[np.ix_(idx, idx)] = opposite_count
+        full_count[np.ix_(idx, idx)] = pair_count
+
+        question_ids.append(str(q_id))
+        mean_matrices.append(full_mean)
+        opposite_matrices.append(full_opposite)
+        count_matrices.append(full_count)
+        overall_abs_sum[np.ix_(idx, idx)] += np.nan_to_num(mean_abs_diff.astype(np.float64)) * pair_count
+        overall_opposite[np.ix_(idx, idx)] += opposite_count
+        overall_count[np.ix_(idx, idx)] += pair_count
+
+        q_top = top_segment_pairs(mean_abs_diff, opposite_count, pair_count, valid_segments_for_q,
+                                  top_k, min_pair_responses)
+        if not q_top.empty:
+            q_top.insert(0, 'Question ID', q_id)
+            q_top.insert(1, 'Question Text', q_text)
+            top_pairs.append(q_top)
+
+    if not question_ids:
+        print("No Ask Opinion questions with at least two valid segments for pairwise divergence.")
+        return pd.DataFrame()
+
+    overall_mean = np.full((num_segments, num_segments), np.nan, dtype=np.float32)
+    np.divide(overall_abs_sum, overall_count, out=overall_mean, where=overall_count > 0, casting='unsafe')
+
+    matrices_path = os.path.join(output_dir, 'segment_pair_divergence.npz')
+    try:
+        np.savez_compressed(
+            matrices_path,
+            question_ids=np.array(question_ids),
+            segments=np.array(all_segment_columns),
+            mean_abs_diff=np.stack(mean_matrices),
+            opposite_count=np.stack(opposite_matrices),
+            pair_count=np.stack(count_matrices),
+            overall_mean_abs_diff=overall_mean,
+            overall_opposite_count=overall_opposite.astype(np.int32),
+            overall_pair_count=overall_count.astype(np.int32),
+        )
+        print(f"  Saved segment pair matrices to: {matrices_path}")
+    except Exception as e:
+        print(f"  Error saving segment pair matrices: {e}")
+
+    top_pairs_df = pd.concat(top_pairs, ignore_index=True) if top_pairs else pd.DataFrame()
+    report_path = os.path.join(output_dir, f'segment_pair_divergence_top{top_k}.csv')
+    try:
+        top_pairs_df.to_csv(report_path, index=False, float_format='%.4f')
+        print(f"  Saved top {top_k} segment pairs per question to: {report_path}")
+    except Exception as e:
+        print(f"  Error saving segment pair report: {e}")
+
+    print("--- Segment Pair Divergence Calculation Complete ---")
+    return top_pairs_df
+
+
+def calculate_family_variance_report(store, segment_counts_df, output_dir, min_segment_size):
+    """
+    Decomposes the spread in agreement of every Ask Opinion response by O-code family.
+
+    For each response and family (all segments sharing an O-code, e.g. all age
+    bands), eta-squared is the share of agreement variance explained by the
+    family's segments (see analysis_utils.calculate_family_eta_squared). The whole
+    round is computed as one responses x segments matrix; segments below
+    min_segment_size for a question are left out.
+    Saves:
+        - family_variance_by_response.csv: eta-squared per family per response, and the top family.
+        - family_variance_by_question.csv: mean eta-squared per family over each question's
+          responses, and the family explaining the most spread.
+
+    Args:
+        store (dict): Agreement store of _aggregate_standardized.csv (see lib/agreement_store.py).
+        segment_counts_df (pd.DataFrame): DataFrame from _segment_counts_by_question.csv.
+        output_dir (str): Directory to save the report CSV files.
+        min_segment_size (int): Minimum participant count for a segment to be included.
+
+    Returns:
+        pd.DataFrame: The per-question summary (empty if nothing could be computed).
+    """
+    print("\n--- Calculating Variance Decomposition by O-code Family --- ")
+    os.makedirs(output_dir, exist_ok=True)
+
+    all_segment_columns = get_store_segment_columns(store)
+    o_codes = [None if col.lower() == 'all' else parse_o_code(col) for col in all_segment_columns]
+    families = sorted({code for code in o_codes if code}, key=lambda code: int(code[1:]))
+    if not families:
+        print("  Error: No segment columns with an O-code prefix found in the standardized data.")
+        return pd.DataFrame()
+    family_index = {code: i for i, code in enumerate(families)}
+    family_codes = np.array([family_index.get(code, -1) for code in o_codes])
+    print(f"  {len(families)} families over {int((family_codes >= 0).sum())} segments: {', '.join(families)}")
+
+    is_opinion = (store['rows']['Question Type'] == 'Ask Opinion').to_numpy()
+    responses = store['rows'][is_opinion]
+    if responses.empty:
+        print("  No Ask Opinion responses found.")
+        return pd.DataFrame()
+
+    # Responses x segments matrices for the whole round: rates, and each row's question counts
+    rates = np.asarray(store['agreement'][is_opinion], dtype=float)
     if segment_counts_df.index.name != 'Question ID':
         segment_counts_df = segment_counts_df.set_index('Question ID')
-    # Convert counts columns to numeric, coercing errors to NaN
-    for col in all_segment_columns:
-        if col in segment_counts_df.columns:
-             segment_counts_df[col] = pd.to_numeric(segment_counts_df[col], errors='coerce')
+    segment_counts_df = segment_counts_df[~segment_counts_df.index.duplicated()]
+    sizes = segment_counts_df.reindex(index=responses['Question ID'], columns=all_segment_columns)
+    sizes = sizes.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+    sizes = np.where(sizes >= min_segment_size, sizes, np.nan) # NaN sizes compare False
+
+    eta_squared, _ = calculate_family_eta_squared(rates, sizes, family_codes, len(families))
+    eta_cols = [f'Eta Squared {code}' for code in families]
+    has_any = ~np.isnan(eta_squared).all(axis=1)
+    if not has_any.any():
+        print("  No response had two or more segments with data in any family.")
+        return pd.DataFrame()
+
+    by_response = pd.DataFrame(eta_squared[has_any], columns=eta_cols)
+    top_family = np.nanargmax(eta_squared[has_any], axis=1)
+    by_response.insert(0, 'Question ID', responses['Question ID'].to_numpy()[has_any])
+    by_response.insert(1, 'Question Text', responses['Question'].to_numpy()[has_any])
+    by_response.insert(2, 'Response Text', responses['Response'].to_numpy()[has_any])
+    by_response['Top Family'] = np.array(families, dtype=object)[top_family]
+    by_response['Top Family Eta Squared'] = eta_squared[has_any][np.arange(len(top_family)), top_family]
+
+    # Per question: mean eta-squared per family over its responses
+    grouped = by_response.groupby('Question ID', sort=True)
+    by_question = grouped[eta_cols].mean()
+    by_question.insert(0, 'Question Text', grouped['Question Text'].first())
+    by_question.insert(1, 'Responses', grouped.size())
+    family_means = by_question[eta_cols].to_numpy(dtype=float)
+    has_family = ~np.isnan(family_means).all(axis=1)
+    top_idx = np.nanargmax(np.where(has_family[:, None], family_means, 0.0), axis=1)
+    by_question['Top Family'] = np.where(has_family, np.array(families, dtype=object)[top_idx], None)
+    by_question = by_question.reset_index()
+
+    for name, df in [('family_variance_by_response.csv', by_response), ('family_variance_by_question.csv', by_question)]:
+        report_path = os.path.join(output_dir, name)
+        try:
+            df.to_csv(report_path, index=False, float_format='%.4f')
+            print(f"  Saved {name} to: {report_path}")
+        except Exception as e:
+            print(f"  Error saving {name}: {e}")
+
+    for _, row in by_question.iterrows():
+        if row['Top Family'] is not None:
+            top_eta = row['Eta Squared ' + row['Top Family']]
+            print(f"  QID {row['Question ID']}: most spread explained by {row['Top Family']} "
+                  f"(mean eta^2 {top_eta:.3f} over {row['Responses']} responses)")
+
+    print("--- Variance Decomposition Complete ---")
+    return by_question
+
+
+def score_divergence_block(rows, agreement, segment_counts_df, all_segment_columns, min_segment_size,
+                           reported_questions=None):
+    """
+    Scores all Ask Opinion responses in a block of the standardized data.
+
+    The block may be the whole file or one chunk of it; a question split across
+    chunks is simply scored piece by piece, since every response is scored on
+    its own.
+
+    Args:
+        rows (pd.DataFrame): Row metadata of the block; the index is the row position in the file.
+        agreement (np.ndarray): The block's rows of the agreement matrix (see iter_store_blocks).
+        segment_counts_df (pd.DataFrame): Segment counts indexed by Question ID, numeric.
+        all_segment_columns (list): Segment columns of the standardized data.
+        min_segment_size (int): Minimum participant count for a segment to be included.
+        reported_questions (set): Question IDs already reported on; progress is printed once per question.
+
+    Returns:
+        pd.DataFrame: Responses with a positive divergence score, with a 'Row Position' column.
+    """
+    reported_questions = reported_questions if reported_questions is not None else set()
+    segment_position = {col: i for i, col in enumerate(all_segment_columns)}
+    block_results = []
 
     # Group by question and process each one
-    for q_id, group in standardized_df.groupby('Question ID'):
+    for q_id, group in rows.groupby('Question ID'):
         q_text = group['Question'].iloc[0]
         q_type = group['Question Type'].iloc[0]
 
         if q_type != 'Ask Opinion':
             continue
+        first_seen = q_id not in reported_questions
+        reported_questions.add(q_id)
 
         # --- Filter segments for *this specific question* --- 
         try:
@@ -74,7 +353,8 @@ def calculate_divergence_report(standardized_df, segment_counts_df, output_dir,
                 if col in q_counts.index and pd.notna(q_counts[col]) and q_counts[col] >= min_segment_size
             ]
         except KeyError:
-             print(f"  Skipping QID {q_id} - Could not find segment counts for this question ID.")
+             if first_seen:
+                 print(f"  Skipping QID {q_id} - Could not find segment counts for this question ID.")
              continue
         except Exception as e:
              print(f"  Error accessing segment counts for QID {q_id}: {e}")
@@ -82,87 +362,140 @@ def calculate_divergence_report(standardized_df, segment_counts_df, output_dir,
              
         # Need at least two segments to calculate divergence
         if len(valid_segments_for_q) < 2:
-            print(f"  Skipping QID {q_id} (Ask Opinion) - Fewer than 2 segments met min size ({min_segment_size}) for divergence calculation.")
+            if first_seen:
+                print(f"  Skipping QID {q_id} (Ask Opinion) - Fewer than 2 segments met min size ({min_segment_size}) for divergence calculation.")
             continue
 
-        print(f"  Processing QID {q_id} ('{q_text[:50]}...') with {len(valid_segments_for_q)} valid segments (>= {min_segment_size} participants).")
-        question_results = []
+        if first_seen:
+            print(f"  Processing QID {q_id} ('{q_text[:50]}...') with {len(valid_segments_for_q)} valid segments (>= {min_segment_size} participants).")
 
-        # Select only the valid segment columns for calculation from this group
-        segment_data = group[valid_segments_for_q].copy()
+        # Responses x valid-segments rate matrix of this question
+        segment_data = block_rates(rows, agreement, group.index, [segment_position[col] for col in valid_segments_for_q])
+        question_results = calculate_divergence_scores(
+            segment_data, valid_segments_for_q,
+            segment_sizes=q_counts[valid_segments_for_q].to_numpy(dtype=float)
+        )
+        if question_results.empty:
+            continue
 
-        # Parse percentages and ensure numeric type
-        for col in valid_segments_for_q:
-            segment_data[col] = segment_data[col].apply(parse_percentage)
-            segment_data[col] = pd.to_numeric(segment_data[col], errors='coerce')
+        # Attach question and response text (rows keep their order within the group)
+        question_results.insert(0, 'Question ID', q_id)
+        question_results.insert(1, 'Question Text', q_text)
+        question_results.insert(2, 'Response Text', group['Response'].to_numpy()[question_results.index])
+        question_results['Row Position'] = group.index.to_numpy()[question_results.index]
+        block_results.append(question_results)
 
-        for index, row in segment_data.iterrows():
-            # Get the agreement rates for valid segments for this specific response
-            # Drop NaNs for this row's min/max calculation
-            valid_rates = row.dropna()
+    if not block_results:
+        return pd.DataFrame()
+    return pd.concat(block_results, ignore_index=True)
 
-            if len(valid_rates) < 2:
-                # Cannot calculate divergence without at least two valid data points
-                continue
 
-            min_rate = valid_rates.min()
-            max_rate = valid_rates.max()
+def calculate_divergence_report(store, segment_counts_df, output_dir,
+                                min_segment_size, # Now required for per-question filtering
+                                top_n_per_question=20, top_n_overall=50, chunksize=None):
+    """
+    Calculates divergence for Ask Opinion questions using standardized data.
+    Filters segments per question based on counts from segment_counts_df.
 
-            # Calculate divergence score
-            max_div = max(max_rate - 0.5, 0)
-            min_div = max(0.5 - min_rate, 0)
-            divergence_score = math.sqrt(max_div * min_div) if (max_div > 0 and min_div > 0) else 0
+    Both reports are built with streaming top-K selection: responses are ranked by
+    Divergence Score (descending), ties broken by Question ID and file order.
+    Gap significance (SE, z, p) comes from the per-question segment counts, and the
+    p-values of all scored responses in the round are Benjamini-Hochberg adjusted
+    into a false-discovery-rate q-value.
 
-            if divergence_score > 0:
-                # Find segment names corresponding to min/max rates for this row
-                min_segment = valid_rates.idxmin() if pd.notna(min_rate) else 'N/A'
-                max_segment = valid_rates.idxmax() if pd.notna(max_rate) else 'N/A'
+    Args:
+        store (dict): Agreement store of _aggregate_standardized.csv (see lib/agreement_store.py).
+        segment_counts_df (pd.DataFrame): DataFrame from _segment_counts_by_question.csv.
+        output_dir (str): Directory to save the divergence report CSV files.
+        min_segment_size (int): Minimum participant count for a segment to be included.
+        top_n_per_question (int): Number of top divergent responses to show per question.
+        top_n_overall (int): Number of top divergent responses to show overall.
+        chunksize (int): Score the store in blocks of this many rows, keeping only the
+                    top responses in memory.
 
-                # Get response text using the original DataFrame index (from the group)
-                response_text = group.loc[index, 'Response'] # Use standard name
+    Returns:
+        pd.DataFrame: All divergence results (score > 0) sorted by score; the overall
+                    top N when scored in chunks.
+                    Returns empty DataFrame if no Ask Opinion questions found or processed.
+    """
+    print("\n--- Calculating Divergence Report (using standardized data) --- ")
+    os.makedirs(output_dir, exist_ok=True)
+    streaming = chunksize is not None
 
-                question_results.append({
-                    'Question ID': q_id,
-                    'Question Text': q_text,
-                    'Response Text': response_text,
-                    'Divergence Score': divergence_score,
-                    'Min Segment': min_segment,
-                    'Min Agreement': min_rate,
-                    'Max Segment': max_segment,
-                    'Max Agreement': max_rate
-                })
+    sort_keys = ['Divergence Score', 'Question ID', 'Row Position']
+    sort_ascending = [False, True, True]
+    top_per_question = StreamingTopK(top_n_per_question, sort_keys, sort_ascending, group_by='Question ID')
+    top_overall = StreamingTopK(top_n_overall, sort_keys, sort_ascending)
+    all_divergence_results = []
+    round_positions, round_p_values = [], [] # Every scored response, for the FDR correction
+    reported_questions = set()
 
-        all_divergence_results.extend(question_results)
+    all_segment_columns = get_store_segment_columns(store)
+    if not all_segment_columns:
+         print("  Error: No segment columns found in the standardized data header.")
+         return pd.DataFrame()
+    print(f"  Identified {len(all_segment_columns)} potential segment columns in standardized data.")
 
-    if not all_divergence_results:
+    # Pre-process segment counts for easier lookup
+    if segment_counts_df.index.name != 'Question ID':
+        segment_counts_df = segment_counts_df.set_index('Question ID')
+    # Convert counts columns to numeric, coercing errors to NaN
+    for col in all_segment_columns:
+        if col in segment_counts_df.columns:
+             segment_counts_df[col] = pd.to_numeric(segment_counts_df[col], errors='coerce')
+
+    for rows, agreement in iter_store_blocks(store, chunksize):
+        block_results = score_divergence_block(
+            rows, agreement, segment_counts_df, all_segment_columns, min_segment_size, reported_questions
+        )
+        if not block_results.empty:
+            round_positions.append(block_results['Row Position'].to_numpy())
+            round_p_values.append(block_results['Gap P Value'].to_numpy(dtype=float))
+        top_per_question.update(block_results)
+        top_overall.update(block_results)
+        if not streaming and not block_results.empty:
+            all_divergence_results.append(block_results)
+
+    top_per_question_df = top_per_question.result()
+    if top_per_question_df.empty:
         print("No responses with positive divergence found across any Ask Opinion questions.")
         return pd.DataFrame() # Return empty DataFrame
 
-    # Create DataFrame from all results
-    results_df = pd.DataFrame(all_divergence_results)
-    results_df = results_df.sort_values(by='Divergence Score', ascending=False)
+    # False-discovery-rate correction across all scored responses of the round
+    q_values = pd.Series(
+        benjamini_hochberg(np.concatenate(round_p_values)), index=np.concatenate(round_positions)
+    )
+    print(f"  Gap significance: {int((q_values < 0.05).sum())} of {len(q_values)} divergent responses with FDR q < 0.05.")
+    top_per_question_df[GAP_FDR_COLUMN] = q_values.reindex(top_per_question_df['Row Position']).to_numpy()
 
     # --- Generate Reports --- 
     # 1. Top N per Question Report
-    top_per_question = results_df.groupby('Question ID').head(top_n_per_question)
     report_path_per_q = os.path.join(output_dir, 'divergence_by_question.csv')
     try:
-        top_per_question.to_csv(report_path_per_q, index=False, float_format='%.4f')
+        top_per_question_df.drop(columns=['Row Position']).to_csv(report_path_per_q, index=False, float_format='%.4f')
         print(f"  Saved divergence per question report to: {report_path_per_q}")
     except Exception as e:
         print(f"  Error saving per-question divergence report: {e}")
 
     # 2. Top N Overall Report
-    top_overall = results_df.head(top_n_overall)
+    top_overall_df = top_overall.result()
+    top_overall_df[GAP_FDR_COLUMN] = q_values.reindex(top_overall_df['Row Position']).to_numpy()
+    top_overall_df = top_overall_df.drop(columns=['Row Position'])
     report_path_overall = os.path.join(output_dir, 'divergence_overall.csv')
     try:
-        top_overall.to_csv(report_path_overall, index=False, float_format='%.4f')
+        top_overall_df.to_csv(report_path_overall, index=False, float_format='%.4f')
         print(f"  Saved overall divergence report to: {report_path_overall}")
     except Exception as e:
         print(f"  Error saving overall divergence report: {e}")
 
     print("--- Divergence Calculation Complete ---")
-    return results_df # Return the full results DataFrame
+    if streaming:
+        return top_overall_df
+    # Return the full results DataFrame, in the same ranking order as the reports
+    results_df = pd.concat(all_divergence_results, ignore_index=True)
+    results_df[GAP_FDR_COLUMN] = q_values.reindex(results_df['Row Position']).to_numpy()
+    results_df = results_df.sort_values(by=sort_keys, ascending=sort_ascending, kind='stable')
+    return results_df.drop(columns=['Row Position']).reset_index(drop=True)
 
 def main():
     parser = argparse.ArgumentParser(description='Calculate divergence analysis from standardized data.')
@@ -185,6 +518,16 @@ def main():
                        help='Number of top divergent responses to show overall.')
     parser.add_argument('--min_segment_size', type=int, default=15,
                        help='Minimum participant size for a segment to be included in analysis (per question).')
+    parser.add_argument('--pairwise', action='store_true',
+                       help='Also compute full segment x segment divergence matrices and top segment pairs per question.')
+    parser.add_argument('--top_k_pairs', type=int, default=20,
+                       help='Number of most divergent segment pairs to report per question (with --pairwise).')
+    parser.add_argument('--min_pair_responses', type=int, default=5,
+                       help='Minimum responses rated by both segments for a pair to be ranked (with --pairwise).')
+    parser.add_argument('--family_variance', action='store_true',
+                       help='Also decompose agreement spread by O-code family (eta-squared per response and per question).')
+    parser.add_argument('--chunksize', type=int,
+                       help='Score the memory-mapped agreement store in blocks of this many rows, keeping only the top responses in memory.')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging.')
 
     args = parser.parse_args()
@@ -229,14 +572,12 @@ def main():
     os.makedirs(output_path, exist_ok=True)
 
     # --- Load Data --- 
-    logging.info(f"Loading standardized data from: {std_csv_path}")
-    try:
-        standardized_data = pd.read_csv(std_csv_path, low_memory=False)
-        logging.info(f"Loaded standardized data with shape: {standardized_data.shape}")
-    except FileNotFoundError:
-        logging.error(f"Standardized data file not found: {std_csv_path}"); exit(1)
-    except Exception as e:
-        logging.error(f"Error loading standardized data: {e}"); exit(1)
+    # Memory-mapped agreement store next to the CSV (built on first use)
+    store = load_standardized_store(std_csv_path, counts_csv_path)
+    if store is None:
+        exit(1)
+    if args.chunksize:
+        logging.info(f"Scoring standardized data in blocks of {args.chunksize} rows")
 
     logging.info(f"Loading segment counts data from: {counts_csv_path}")
     try:
@@ -249,13 +590,32 @@ def main():
 
     # --- Calculate Divergence --- 
     results_df = calculate_divergence_report(
-        standardized_data.copy(), # Pass copy to avoid modifying original
+        store,
         segment_counts_data.copy(),
         output_path, 
         min_segment_size=args.min_segment_size,
         top_n_per_question=args.top_n_per_question,
-        top_n_overall=args.top_n_overall
+        top_n_overall=args.top_n_overall,
+        chunksize=args.chunksize
     )
+
+    if args.pairwise:
+        calculate_segment_pair_report(
+            store,
+            segment_counts_data.copy(),
+            output_path,
+            min_segment_size=args.min_segment_size,
+            top_k=args.top_k_pairs,
+            min_pair_responses=args.min_pair_responses
+        )
+
+    if args.family_variance:
+        calculate_family_variance_report(
+            store,
+            segment_counts_data.copy(),
+            output_path,
+            min_segment_size=args.min_segment_size
+        )
         
     # --- Summary --- 
     if results_df is not None and not results_df.empty:
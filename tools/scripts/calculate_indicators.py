@@ -7,7 +7,8 @@ import textwrap
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from lib.analysis_utils import load_standardized_data, parse_percentage
+from lib.analysis_utils import parse_percentage_columns
+from lib.agreement_store import load_standardized_frame
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -139,10 +140,9 @@ def generate_indicator_heatmaps(standardized_df, indicator_codesheet_path, outpu
         if 'Response' not in group.columns:
              print(f"    Warning: Skipping category '{category}' - 'Response' column not found."); continue
             
-        # Apply parse_percentage to the 'All' column
+        # Parse the 'All' column (already numeric when loaded from the agreement store)
         try:
-             group['All_Parsed'] = group['All'].apply(parse_percentage)
-             group['All_Parsed'] = pd.to_numeric(group['All_Parsed'], errors='coerce')
+             group['All_Parsed'] = parse_percentage_columns(group[['All']])['All']
         except Exception as e:
              print(f"    Warning: Error parsing 'All' column for category '{category}': {e}"); continue
             
@@ -280,14 +280,10 @@ def main():
     os.makedirs(output_path, exist_ok=True)
 
     # --- Load Data ---
-    logging.info(f"Loading standardized data from: {std_csv_path}")
-    try:
-        standardized_data = pd.read_csv(std_csv_path, low_memory=False)
-        logging.info(f"Loaded standardized data with shape: {standardized_data.shape}")
-    except FileNotFoundError:
-        logging.error(f"Standardized data file not found: {std_csv_path}"); exit(1)
-    except Exception as e:
-        logging.error(f"Error loading standardized data: {e}"); exit(1)
+    # Uses the pre-parsed agreement store next to the CSV (built on first use); only 'All' is plotted
+    standardized_data = load_standardized_frame(std_csv_path, segment_columns=['All'])
+    if standardized_data is None:
+        exit(1)
 
     # --- Generate Heatmaps ---
     generate_indicator_heatmaps(standardized_data, codesheet_path, output_path)
@@ -7,15 +7,18 @@ combining multiple signals to create a comprehensive measure of participant enga
 and response quality.
 
 Usage:
-    python calculate_pri.py <gd_number> [--debug] [--limit N]
+    python calculate_pri.py <gd_number> [--debug] [--limit N] [--duplicate-signal] [--preference-signal]
 
 Arguments:
     gd_number   The Global Dialogue number (e.g., 1, 2, 3)
     --debug     Enable verbose debug output
     --limit     Limit processing to first N participants (for testing)
+    --duplicate-signal  Include the near-duplicate response ratio as an optional PRI component
+    --preference-signal Include pairwise-preference consistency as an optional PRI component
 
 Output:
-    CSV file with participant IDs and calculated metrics
+    CSV file with participant IDs and calculated metrics, plus a typed Parquet copy
+    with run metadata (requires pyarrow)
 """
 
 import pandas as pd
@@ -35,6 +38,12 @@ from dotenv import load_dotenv
 import aiohttp
 from pydantic import BaseModel, Field
 from scipy.stats import pearsonr, spearmanr
+from lib.duplicate_detection import detect_near_duplicates, summarize_participant_duplicates
+from lib.pri_io import build_pri_metadata, write_pri_parquet
+from lib.agreement_store import load_standardized_frame
+from lib.analysis_utils import parse_percentage_series
+from lib.tag_assignments import load_tag_assignments, labels_to_tag_assignments, rows_with_tag, TAG_COL_PATTERN
+from export_unreliable_participants import build_response_pivot, export_unreliable_participants
 
 # Load environment variables
 load_dotenv()
@@ -82,6 +91,8 @@ def parse_args():
     parser.add_argument('--debug', action='store_true', help='Enable verbose debug output')
     parser.add_argument('--limit', type=int, help='Limit processing to first N participants (for testing)', default=None)
     parser.add_argument('--llm-judge', action='store_true', help='Enable LLM judge assessment (requires API key and costs $)')
+    parser.add_argument('--duplicate-signal', action='store_true', help='Include the near-duplicate response ratio as an optional PRI component')
+    parser.add_argument('--preference-signal', action='store_true', help='Include pairwise-preference consistency as an optional PRI component')
     return parser.parse_args()
 
 
@@ -111,6 +122,7 @@ def get_config(gd_number):
         'THOUGHT_LABELS_PATH': str(tags_dir / "all_thought_labels.csv"),
         'DISCUSSION_GUIDE_PATH': str(data_dir / f"GD{gd_number}_discussion_guide.csv"),
         'OUTPUT_PATH': str(output_dir / f"GD{gd_number}_pri_scores.csv"),
+        'PARQUET_OUTPUT_PATH': str(output_dir / f"GD{gd_number}_pri_scores.parquet"),
         
         # PRI Parameters (per documentation)
         'ASC_HIGH_THRESHOLD': 0.70,                         # Agreement rate for strong agreement
@@ -133,6 +145,13 @@ def get_config(gd_number):
         'UNIVERSAL_DISAGREEMENT_WEIGHT_LLM': 0.15,
         'ASC_WEIGHT_LLM': 0.15,
         'LLM_JUDGE_WEIGHT': 0.30,
+        
+        # Optional components (enabled via CLI flags), blended on top of the weights above:
+        # score = (1 - weight) * score + weight * component
+        'DUPLICATE_WEIGHT': 0.10,
+        'DUPLICATE_SIMILARITY_THRESHOLD': 0.80,             # Min estimated Jaccard similarity for near-duplicate thoughts
+        'DUPLICATE_MIN_CHARS': 20,                          # Shorter thoughts are too generic to count as copies
+        'PREFERENCE_CONSISTENCY_WEIGHT': 0.10,
     }
     
     return config
@@ -204,7 +223,7 @@ def load_data(config, debug=False):
     
     # 4. Load verbatim map data
     try:
-        verbatim_map_df = pd.read_csv(config['VERBATIM_MAP_PATH'], quotechar='"', engine='python')
+        verbatim_map_df = pd.read_csv(config['VERBATIM_MAP_PATH'], quotechar='"')
         print(f"Loaded verbatim map data with shape: {verbatim_map_df.shape}")
     except Exception as e:
         print(f"Error loading verbatim map data: {e}")
@@ -214,16 +233,19 @@ def load_data(config, debug=False):
     try:
         # Suppress dtype warnings for mixed columns
         with pd.option_context('mode.chained_assignment', None):
-            aggregate_std_df = pd.read_csv(config['AGGREGATE_STD_PATH'], low_memory=False)
+            # Load major segments from segment counts file
+            major_segments = load_major_segments(config, debug)
+
+            # Pre-parsed agreement store next to the CSV (built on first use); only the
+            # 'All' and major segment rates are used, so only those columns are loaded
+            aggregate_std_df = load_standardized_frame(config['AGGREGATE_STD_PATH'], config['SEGMENT_COUNTS_PATH'],
+                                                       segment_columns=['All'] + list(major_segments))
+            if aggregate_std_df is None:
+                raise ValueError(f"could not load {config['AGGREGATE_STD_PATH']}")
             
             # Convert percentage columns to numeric values
             if 'All' in aggregate_std_df.columns:
-                aggregate_std_df['All_Agreement'] = aggregate_std_df['All'].apply(
-                    lambda x: parse_percentage(x, debug)
-                )
-            
-            # Load major segments from segment counts file
-            major_segments = load_major_segments(config, debug)
+                aggregate_std_df['All_Agreement'] = parse_percentage_series(aggregate_std_df['All'])
             
             # Convert percentage columns to numeric values for major segment columns
             segment_cols = [col for col in aggregate_std_df.columns if col in major_segments]
@@ -233,7 +255,7 @@ def load_data(config, debug=False):
             else:
                 for col in segment_cols:
                     segment_agreement_col = f'{col}_Agreement'
-                    aggregate_std_df[segment_agreement_col] = aggregate_std_df[col].apply(lambda x: parse_percentage(x, debug))
+                    aggregate_std_df[segment_agreement_col] = parse_percentage_series(aggregate_std_df[col])
                     
                 if debug:
                     print(f"Processed {len(segment_cols)} major segment columns for agreement calculation")
@@ -270,32 +292,6 @@ def load_data(config, debug=False):
     )
 
 
-def parse_percentage(value, debug=False):
-    """Convert percentage strings to float values (0-1 range)."""
-    if pd.isna(value):
-        return np.nan
-    
-    try:
-        # Handle numeric values
-        if isinstance(value, (int, float)):
-            return float(value) / 100.0 if value > 1 else float(value)
-        
-        # Handle string values
-        value_str = str(value).strip()
-        if value_str.endswith('%'):
-            return float(value_str.rstrip('%')) / 100.0
-        elif value_str in ['-', ' - ']:
-            return np.nan
-        else:
-            # Direct conversion with range check
-            val = float(value_str)
-            return val / 100.0 if val > 1 else val
-    except (ValueError, TypeError) as e:
-        if debug:
-            print(f"Warning: Could not convert '{value}' to float: {e}")
-        return np.nan
-
-
 def load_major_segments(config, debug=False):
     """
     Load and identify major segments based on participation counts from segment counts file.
@@ -392,59 +388,46 @@ def calculate_duration(participant_id, binary_df, preference_df, debug=False):
     return duration
 
 
-def calculate_low_quality_tag_percentage(participant_id, thought_labels_df, debug=False):
+def calculate_low_quality_ratios(thought_labels_df, config, debug=False):
     """
-    Calculate the percentage of a participant's responses tagged as 'Uninformative answer'.
+    Calculate, for every participant, the share of their labeled responses tagged 'Uninformative answer'.
+    
+    Uses the long tag assignment table written by preprocess_tag_files.py (see lib/tag_assignments.py),
+    so the tagged responses are one lookup instead of a scan of every tag column per participant.
+    The table's tags are stripped, so its rows are re-checked for an exact 'Uninformative answer' value.
     
     Args:
-        participant_id: Unique ID of the participant
-        thought_labels_df: DataFrame with thought labels
+        thought_labels_df: DataFrame with thought labels (one row per labeled response)
+        config: Dictionary with configuration values
         debug: Whether to print debug information
         
     Returns:
-        float: Ratio of low quality responses to total responses (0-1)
+        dict: Participant ID -> ratio of low quality responses to labeled responses (0-1)
     """
-    if debug:
-        print(f"[LowQuality {participant_id}] Calculating low quality percentage...")
-    
-    # If no thought labels data is available, return 0
-    if thought_labels_df.empty:
+    # If no thought labels data is available, every participant scores 0
+    if thought_labels_df.empty or 'Participant ID' not in thought_labels_df.columns:
         if debug:
-            print(f"[LowQuality {participant_id}] No thought labels data available")
-        return 0.0
-    
-    # Filter for this participant's labeled responses
-    participant_labels = thought_labels_df[thought_labels_df['Participant ID'] == participant_id]
-    
-    if participant_labels.empty:
-        if debug:
-            print(f"[LowQuality {participant_id}] No labeled responses found")
-        return 0.0  # No labeled responses, assume perfect quality
-    
-    # Find tag columns
-    tag_cols = [col for col in thought_labels_df.columns if col.startswith('Tag ')]
-    
-    if debug:
-        print(f"[LowQuality {participant_id}] Found {len(tag_cols)} tag columns")
+            print("[LowQuality] No thought labels data available")
+        return {}
     
-    if not tag_cols:
+    tag_assignments = load_tag_assignments(config['TAGS_DIR'], config['THOUGHT_LABELS_PATH'])
+    if tag_assignments is None or (len(tag_assignments[0]) and tag_assignments[0]['thought_index'].max() >= len(thought_labels_df)):
         if debug:
-            print(f"[LowQuality {participant_id}] No tag columns found")
-        return 0.0  # No tag columns, cannot evaluate
-    
-    # Check for 'Uninformative answer' tag in any tag column
-    is_low_quality = participant_labels[tag_cols].apply(
-        lambda row: any('Uninformative answer' == val for val in row.values if pd.notna(val)), 
-        axis=1
-    )
+            print("[LowQuality] No up-to-date tag assignment table; building it from the tag columns")
+        tag_assignments = labels_to_tag_assignments(thought_labels_df)
+    assignments, tag_dictionary = tag_assignments
     
-    num_low_quality = is_low_quality.sum()
-    total_responses = len(participant_labels)
+    candidates = rows_with_tag(assignments, tag_dictionary, 'Uninformative answer')['thought_index'].to_numpy()
+    tag_cols = [col for col in thought_labels_df.columns if TAG_COL_PATTERN.match(str(col))]
+    is_low_quality = np.zeros(len(thought_labels_df), dtype=bool)
+    is_low_quality[candidates] = (thought_labels_df[tag_cols].iloc[candidates] == 'Uninformative answer').any(axis=1).to_numpy()
+    low_quality_ratios = pd.Series(is_low_quality).groupby(thought_labels_df['Participant ID'].to_numpy()).mean()
     
     if debug:
-        print(f"[LowQuality {participant_id}] Low quality responses: {num_low_quality}/{total_responses}")
+        print(f"[LowQuality] {int(is_low_quality.sum())}/{len(is_low_quality)} labeled responses tagged low quality "
+              f"across {len(low_quality_ratios)} participants")
     
-    return num_low_quality / total_responses if total_responses > 0 else 0.0
+    return low_quality_ratios.to_dict()
 
 
 def calculate_universal_disagreement_percentage(participant_id, verbatim_map_df, aggregate_std_df, major_segments, config, debug=False):
@@ -715,6 +698,165 @@ def calculate_asc_score(participant_id, binary_df, consensus_data, debug=False):
     return asc_score
 
 
+def calculate_duplicate_ratios(verbatim_map_df, config, debug=False):
+    """
+    Calculate the share of each participant's authored thoughts that are near-duplicates,
+    either of their own other answers or of text submitted by other participants.
+    
+    Computed once for all participants with MinHash/LSH (see lib/duplicate_detection.py).
+    
+    Args:
+        verbatim_map_df: DataFrame mapping thoughts to authors
+        config: Dictionary with configuration values
+        debug: Whether to print debug information
+        
+    Returns:
+        dict: Participant ID -> duplicate ratio (0-1)
+    """
+    print("Detecting near-duplicate responses...")
+    if verbatim_map_df.empty or 'Thought Text' not in verbatim_map_df.columns:
+        print("Warning: No thought text available for duplicate detection")
+        return {}
+    
+    flagged_df = detect_near_duplicates(
+        verbatim_map_df,
+        threshold=config['DUPLICATE_SIMILARITY_THRESHOLD'],
+        min_chars=config['DUPLICATE_MIN_CHARS']
+    )
+    summary_df = summarize_participant_duplicates(flagged_df)
+    
+    if debug:
+        print(f"[Duplicates] {int((flagged_df['Duplicate Cluster'] >= 0).sum())} thoughts in near-duplicate clusters")
+        print(f"[Duplicates] {int(flagged_df['Within Participant Repeat'].sum())} within-participant repeats, "
+              f"{int(flagged_df['Cross Participant Duplicate'].sum())} cross-participant duplicates")
+    
+    return dict(zip(summary_df['Participant ID'], summary_df['Duplicate_Ratio']))
+
+
+def calculate_preference_consistency(preference_df, binary_df, debug=False):
+    """
+    Calculate pairwise-preference consistency for all participants at once.
+    
+    Two kinds of inconsistency are measured from each participant's own votes:
+    - Intransitivity: within a question, preferring A over B and B over A (reversed pair),
+      or A over B, B over C and C over A (cyclic triad). The rate is the share of
+      checkable cases (pairs compared more than once, triads with all three pairs
+      compared) that are inconsistent.
+    - Binary contradiction: preferring a thought the participant disagreed with over one
+      they agreed with, choosing "I agree with both" after disagreeing with one of them,
+      or "I disagree with both" after agreeing with one of them.
+    
+    Args:
+        preference_df: DataFrame with pairwise preference votes
+        binary_df: DataFrame with binary votes (needs VoteNumeric)
+        debug: Whether to print debug information
+        
+    Returns:
+        DataFrame indexed by Participant ID with PreferenceCycle_Rate,
+        PreferenceContradiction_Rate and PreferenceConsistency_Score (1 - mean of the
+        available rates; higher is better)
+    """
+    print("Calculating pairwise-preference consistency...")
+    required_cols = {'Participant ID', 'Question ID', 'Thought A ID', 'Thought B ID', 'Vote'}
+    if not required_cols.issubset(preference_df.columns):
+        print(f"Warning: Preference data missing columns {required_cols - set(preference_df.columns)}")
+        return pd.DataFrame(columns=['PreferenceCycle_Rate', 'PreferenceContradiction_Rate', 'PreferenceConsistency_Score'])
+    
+    keys = ['Participant ID', 'Question ID']
+    prefs = preference_df[keys + ['Thought A ID', 'Thought B ID', 'Vote']].copy()
+    vote = prefs['Vote'].astype(str).str.strip().str.lower()
+    prefs['Choice'] = vote.map({
+        'thought a': 'A', 'thought b': 'B',
+        'i agree with both': 'both_agree', 'i disagree with both': 'both_disagree'
+    })
+    prefs = prefs.dropna(subset=['Choice'])
+    
+    # --- Intransitivity ---
+    strict = prefs[prefs['Choice'].isin(['A', 'B'])]
+    thought_a = strict['Thought A ID'].astype(str)
+    thought_b = strict['Thought B ID'].astype(str)
+    all_edges = pd.DataFrame({
+        'Participant ID': strict['Participant ID'],
+        'Question ID': strict['Question ID'],
+        'Winner': np.where(strict['Choice'] == 'A', thought_a, thought_b),
+        'Loser': np.where(strict['Choice'] == 'A', thought_b, thought_a),
+        'Pair': np.where(thought_a < thought_b, thought_a + '|' + thought_b, thought_b + '|' + thought_a),
+    })
+    
+    # Pairs compared more than once, and how many of those flipped direction
+    pair_stats = all_edges.groupby(keys + ['Pair']).agg(
+        Times=('Winner', 'size'), Winners=('Winner', 'nunique')
+    ).reset_index()
+    repeated_pairs = pair_stats[pair_stats['Times'] > 1].groupby('Participant ID').size()
+    reversed_pairs = pair_stats[pair_stats['Winners'] > 1].groupby('Participant ID').size()
+    
+    edges = all_edges.drop(columns='Pair').drop_duplicates()
+    
+    # Two-step paths a > b > c whose ends (a, c) were also compared
+    paths = edges.merge(edges, left_on=keys + ['Loser'], right_on=keys + ['Winner'], suffixes=('', '_2'))
+    paths = paths[paths['Winner'] != paths['Loser_2']]
+    closes_transitive = paths.merge(
+        edges, left_on=keys + ['Winner', 'Loser_2'], right_on=keys + ['Winner', 'Loser'], suffixes=('', '_3')
+    ).groupby('Participant ID').size()
+    # Each cyclic triad is found once per rotation
+    closes_cyclic = paths.merge(
+        edges, left_on=keys + ['Loser_2', 'Winner'], right_on=keys + ['Winner', 'Loser'], suffixes=('', '_3')
+    ).groupby('Participant ID').size() / 3
+    
+    cycle_counts = pd.concat(
+        [repeated_pairs, reversed_pairs, closes_transitive, closes_cyclic], axis=1,
+        keys=['repeated', 'reversed', 'transitive', 'cyclic']
+    ).fillna(0)
+    checkable = cycle_counts['repeated'] + cycle_counts['transitive'] + cycle_counts['cyclic']
+    cycle_rate = (cycle_counts['reversed'] + cycle_counts['cyclic']) / checkable.where(checkable > 0)
+    
+    # --- Contradictions with binary votes ---
+    votes = binary_df.dropna(subset=['VoteNumeric']).drop_duplicates(
+        ['Participant ID', 'Thought ID'], keep='last'
+    )[['Participant ID', 'Thought ID', 'VoteNumeric']]
+    with_votes = prefs.merge(
+        votes.rename(columns={'Thought ID': 'Thought A ID', 'VoteNumeric': 'Vote_A'}),
+        on=['Participant ID', 'Thought A ID'], how='left'
+    ).merge(
+        votes.rename(columns={'Thought ID': 'Thought B ID', 'VoteNumeric': 'Vote_B'}),
+        on=['Participant ID', 'Thought B ID'], how='left'
+    )
+    vote_a, vote_b, choice = with_votes['Vote_A'], with_votes['Vote_B'], with_votes['Choice']
+    both_known = vote_a.notna() & vote_b.notna()
+    any_known = vote_a.notna() | vote_b.notna()
+    
+    evaluable = np.where(choice.isin(['A', 'B']), both_known, any_known)
+    contradiction = (
+        ((choice == 'A') & (vote_a == 0) & (vote_b == 1)) |
+        ((choice == 'B') & (vote_b == 0) & (vote_a == 1)) |
+        ((choice == 'both_agree') & ((vote_a == 0) | (vote_b == 0))) |
+        ((choice == 'both_disagree') & ((vote_a == 1) | (vote_b == 1)))
+    )
+    contradiction_counts = pd.DataFrame({
+        'Participant ID': with_votes['Participant ID'],
+        'evaluable': evaluable,
+        'contradiction': contradiction & evaluable,
+    }).groupby('Participant ID')[['evaluable', 'contradiction']].sum()
+    contradiction_rate = contradiction_counts['contradiction'] / contradiction_counts['evaluable'].where(
+        contradiction_counts['evaluable'] > 0
+    )
+    
+    consistency_df = pd.concat(
+        [cycle_rate, contradiction_rate], axis=1,
+        keys=['PreferenceCycle_Rate', 'PreferenceContradiction_Rate']
+    )
+    consistency_df['PreferenceConsistency_Score'] = 1 - consistency_df.mean(axis=1, skipna=True)
+    consistency_df.index.name = 'Participant ID'
+    
+    if debug:
+        print(f"[Preference] {len(edges)} strict preferences, {int(cycle_counts['reversed'].sum())} reversed pairs, "
+              f"{int(cycle_counts['cyclic'].sum())} cyclic triads")
+        print(f"[Preference] {int(contradiction_counts['contradiction'].sum())} of "
+              f"{int(contradiction_counts['evaluable'].sum())} evaluable comparisons contradict binary votes")
+    
+    return consistency_df
+
+
 # --- LLM Judge Functions ---
 
 def load_discussion_guide(config, debug=False):
@@ -1231,7 +1373,8 @@ async def calculate_llm_judge_score(participant_id, verbatim_map_df, evaluatable
         return 0.5, individual_scores  # Neutral score if all models failed
 
 
-def calculate_all_pri_signals(data_tuple, config, participant_limit=None, debug=False, enable_llm_judge=False):
+def calculate_all_pri_signals(data_tuple, config, participant_limit=None, debug=False, enable_llm_judge=False,
+                              enable_duplicate_signal=False, enable_preference_signal=False):
     """
     Calculate all PRI signals for all participants.
     
@@ -1241,6 +1384,8 @@ def calculate_all_pri_signals(data_tuple, config, participant_limit=None, debug=
         participant_limit: Limit processing to first N participants (for testing)
         debug: Whether to print debug information
         enable_llm_judge: Whether to enable LLM judge assessment (costs money)
+        enable_duplicate_signal: Whether to compute the near-duplicate response ratio
+        enable_preference_signal: Whether to compute pairwise-preference consistency
         
     Returns:
         DataFrame containing calculated PRI signals for each participant
@@ -1264,6 +1409,17 @@ def calculate_all_pri_signals(data_tuple, config, participant_limit=None, debug=
     # Pre-compute consensus data once for all participants
     consensus_data = precompute_consensus_data(binary_df, verbatim_map_df, aggregate_std_df, config, debug)
     
+    # Near-duplicate detection runs once over the whole verbatim map
+    duplicate_ratios = calculate_duplicate_ratios(verbatim_map_df, config, debug) if enable_duplicate_signal else {}
+    
+    # Low quality tag ratios come from one lookup of the 'Uninformative answer' tag
+    low_quality_ratios = calculate_low_quality_ratios(thought_labels_df, config, debug)
+    
+    # Preference consistency is computed for all participants with grouped operations
+    preference_consistency_df = None
+    if enable_preference_signal:
+        preference_consistency_df = calculate_preference_consistency(preference_df, binary_df, debug)
+    
     # Load evaluatable questions and context for LLM judge if enabled
     evaluatable_questions = {}
     contextual_info = {}
@@ -1302,7 +1458,7 @@ def calculate_all_pri_signals(data_tuple, config, participant_limit=None, debug=
             duration = calculate_duration(participant_id, binary_times_df, preference_times_df, debug)
             
             # 2. Low Quality Tags Percentage
-            low_quality_perc = calculate_low_quality_tag_percentage(participant_id, thought_labels_df, debug)
+            low_quality_perc = low_quality_ratios.get(participant_id, 0.0)
             
             # 3. Universal Disagreement Percentage
             universal_disagreement_perc = calculate_universal_disagreement_percentage(
@@ -1335,6 +1491,16 @@ def calculate_all_pri_signals(data_tuple, config, participant_limit=None, debug=
                 'ASC_Score_Raw': asc_raw,
             }
             
+            if enable_duplicate_signal:
+                # Participants without authored thoughts have nothing duplicated
+                result_dict['Duplicate_Ratio'] = duplicate_ratios.get(participant_id, 0.0)
+            
+            if preference_consistency_df is not None:
+                if participant_id in preference_consistency_df.index:
+                    result_dict.update(preference_consistency_df.loc[participant_id].to_dict())
+                else:
+                    result_dict.update({col: np.nan for col in preference_consistency_df.columns})
+            
             if enable_llm_judge:
                 result_dict['LLM_Judge_Score'] = llm_judge_score
                 # Add individual model scores
@@ -1356,6 +1522,12 @@ def calculate_all_pri_signals(data_tuple, config, participant_limit=None, debug=
                 'ASC_Score_Raw': np.nan,
             }
             
+            if enable_duplicate_signal:
+                error_dict['Duplicate_Ratio'] = np.nan
+            
+            if preference_consistency_df is not None:
+                error_dict.update({col: np.nan for col in preference_consistency_df.columns})
+            
             if enable_llm_judge:
                 error_dict['LLM_Judge_Score'] = np.nan
                 
@@ -1480,6 +1652,14 @@ def normalize_and_calculate_pri(pri_signals_df, config, debug=False):
         pri_signals_df['LLM_Judge_Norm'] = min_max_normalize(pri_signals_df['LLM_Judge_Score'])
         print(f"LLM judge scores available for PRI calculation")
     
+    # 6. Optional: Near-duplicate ratio (lower is better, so invert)
+    if 'Duplicate_Ratio' in pri_signals_df.columns:
+        pri_signals_df['Duplicate_Norm'] = min_max_normalize(pri_signals_df['Duplicate_Ratio'], invert=True)
+    
+    # 7. Optional: Pairwise-preference consistency (higher score is better, no inversion needed)
+    if 'PreferenceConsistency_Score' in pri_signals_df.columns:
+        pri_signals_df['PreferenceConsistency_Norm'] = min_max_normalize(pri_signals_df['PreferenceConsistency_Score'])
+    
     # Calculate heuristic-only PRI score (always calculated for comparison)
     print("Calculating heuristic-only PRI score...")
     if asc_available:
@@ -1564,6 +1744,21 @@ def normalize_and_calculate_pri(pri_signals_df, config, debug=False):
         pri_signals_df['PRI_Score'] = pri_signals_df['PRI_Score_Heuristic']
         print("PRI_Score set to heuristic-only version")
     
+    # Blend in optional components on top of the core weights
+    optional_weights = {
+        'Duplicate_Norm': config['DUPLICATE_WEIGHT'],
+        'PreferenceConsistency_Norm': config['PREFERENCE_CONSISTENCY_WEIGHT'],
+    }
+    for norm_col, weight in optional_weights.items():
+        if norm_col not in pri_signals_df.columns or pri_signals_df[norm_col].isna().all():
+            continue
+        component = pri_signals_df[norm_col].fillna(pri_signals_df[norm_col].median())
+        for score_col in ['PRI_Score_Heuristic', 'PRI_Score_Enhanced']:
+            if score_col in pri_signals_df.columns:
+                pri_signals_df[score_col] = pri_signals_df[score_col] * (1 - weight) + component * weight
+        print(f"Optional component {norm_col} blended into PRI with weight {weight:.2f}")
+    pri_signals_df['PRI_Score'] = pri_signals_df['PRI_Score_Enhanced' if llm_judge_available else 'PRI_Score_Heuristic']
+    
     # Create a 1-5 scale version for easier interpretation
     pri_signals_df['PRI_Scale_1_5'] = pri_signals_df['PRI_Score'] * 4 + 1
     
@@ -1791,7 +1986,7 @@ def create_comprehensive_correlation_report(pri_signals_df, output_path, debug=F
     # Identify all numeric PRI-related columns
     pri_columns = []
     for col in pri_signals_df.columns:
-        if any(keyword in col for keyword in ['PRI', 'Duration', 'LowQualityTag', 'UniversalDisagreement', 'ASC', 'LLM']):
+        if any(keyword in col for keyword in ['PRI', 'Duration', 'LowQualityTag', 'UniversalDisagreement', 'ASC', 'LLM', 'Duplicate', 'Preference']):
             if pri_signals_df[col].dtype in ['float64', 'int64']:
                 pri_columns.append(col)
     
@@ -1927,6 +2122,8 @@ def create_comprehensive_correlation_report(pri_signals_df, output_path, debug=F
                     ('UniversalDisagreement_Perc', 'UniversalDisagreement_Norm'),
                     ('ASC_Score_Raw', 'ASC_Norm'),
                     ('LLM_Judge_Score', 'LLM_Judge_Norm'),
+                    ('Duplicate_Ratio', 'Duplicate_Norm'),
+                    ('PreferenceConsistency_Score', 'PreferenceConsistency_Norm'),
                     ('PRI_Score', 'PRI_Scale_1_5')
                 ]
                 
@@ -2201,205 +2398,6 @@ async def batch_process_llm_judge(participant_ids, verbatim_map_df, evaluatable_
     return results
 
 
-def extract_open_ended_responses(verbatim_map_df, discussion_guide_df, participant_ids, debug=False):
-    """
-    Extract all open-ended (Ask Opinion, Ask Experience) responses for specific participants.
-    
-    Args:
-        verbatim_map_df: DataFrame with participant responses
-        discussion_guide_df: DataFrame with question types  
-        participant_ids: List of participant IDs to extract responses for
-        debug: Whether to print debug information
-        
-    Returns:
-        DataFrame with participant responses pivoted into columns
-    """
-    if debug:
-        print(f"Extracting open-ended responses for {len(participant_ids)} participants...")
-    
-    # Find Ask Opinion and Ask Experience questions from discussion guide
-    open_ended_questions = discussion_guide_df[
-        discussion_guide_df['Item type (dropdown)'].str.contains('ask opinion|ask experience', case=False, na=False)
-    ]['Cross Conversation Tag - Polls and Opinions only (Optional)'].tolist()
-    
-    if debug:
-        print(f"Found {len(open_ended_questions)} open-ended questions: {open_ended_questions}")
-    
-    # Filter verbatim responses for target participants and open-ended questions
-    responses_df = verbatim_map_df[
-        (verbatim_map_df['Participant ID'].isin(participant_ids)) &
-        (verbatim_map_df['Question ID'].isin(open_ended_questions))
-    ].copy()
-    
-    if debug:
-        print(f"Found {len(responses_df)} total responses for target participants")
-    
-    # Create a mapping of Question ID to Question Text for column names
-    question_mapping = dict(zip(responses_df['Question ID'], responses_df['Question Text']))
-    
-    # Group by participant and question, concatenate multiple thoughts if any
-    grouped_responses = responses_df.groupby(['Participant ID', 'Question ID'])['Thought Text'].agg(
-        lambda x: ' | '.join(x.astype(str)) if len(x) > 1 else x.iloc[0] if len(x) == 1 else ''
-    ).reset_index()
-    
-    # Pivot to get one column per question
-    pivoted_df = grouped_responses.pivot(index='Participant ID', columns='Question ID', values='Thought Text')
-    
-    # Rename columns to use question text instead of question ID
-    pivoted_df.columns = [question_mapping.get(col, col) for col in pivoted_df.columns]
-    
-    # Reset index to make Participant ID a regular column
-    pivoted_df = pivoted_df.reset_index()
-    
-    # Fill NaN values with empty strings
-    pivoted_df = pivoted_df.fillna('')
-    
-    if debug:
-        print(f"Extracted responses for {len(pivoted_df)} participants across {len(pivoted_df.columns)-1} questions")
-    
-    return pivoted_df
-
-
-def identify_unreliable_participants(pri_signals_df, method='outliers', threshold=None, debug=False):
-    """
-    Identify participants who should be considered unreliable based on PRI scores.
-    
-    Args:
-        pri_signals_df: DataFrame with calculated PRI scores
-        method: Method to use ('outliers', 'percentile', 'threshold')
-        threshold: Specific threshold value (used with 'threshold' or 'percentile' methods)
-        debug: Whether to print debug information
-        
-    Returns:
-        List of participant IDs identified as unreliable
-    """
-    valid_scores = pri_signals_df['PRI_Scale_1_5'].dropna()
-    
-    if len(valid_scores) == 0:
-        print("Warning: No valid PRI scores to analyze")
-        return []
-    
-    unreliable_participants = []
-    
-    if method == 'outliers':
-        # Use boxplot outlier calculation (1.5 * IQR rule)
-        q1 = valid_scores.quantile(0.25)
-        q3 = valid_scores.quantile(0.75)
-        iqr = q3 - q1
-        lower_bound = q1 - 1.5 * iqr
-        upper_bound = q3 + 1.5 * iqr
-        
-        # Identify outliers (focusing on low scores as unreliable)
-        outlier_mask = (pri_signals_df['PRI_Scale_1_5'] < lower_bound) | (pri_signals_df['PRI_Scale_1_5'] > upper_bound)
-        low_outlier_mask = pri_signals_df['PRI_Scale_1_5'] < lower_bound
-        
-        unreliable_participants = pri_signals_df[low_outlier_mask]['Participant ID'].tolist()
-        
-        if debug:
-            print(f"Outlier analysis: Q1={q1:.3f}, Q3={q3:.3f}, IQR={iqr:.3f}")
-            print(f"Lower bound: {lower_bound:.3f}, Upper bound: {upper_bound:.3f}")
-            print(f"Total outliers: {outlier_mask.sum()}, Low outliers (unreliable): {low_outlier_mask.sum()}")
-    
-    elif method == 'percentile':
-        if threshold is None:
-            threshold = 10  # Default to bottom 10th percentile
-        
-        percentile_threshold = valid_scores.quantile(threshold / 100)
-        unreliable_mask = pri_signals_df['PRI_Scale_1_5'] <= percentile_threshold
-        unreliable_participants = pri_signals_df[unreliable_mask]['Participant ID'].tolist()
-        
-        if debug:
-            print(f"Percentile analysis: Bottom {threshold}th percentile threshold = {percentile_threshold:.3f}")
-            print(f"Participants below threshold: {unreliable_mask.sum()}")
-    
-    elif method == 'threshold':
-        if threshold is None:
-            threshold = 2.5  # Default threshold for "Low Reliability" 
-        
-        unreliable_mask = pri_signals_df['PRI_Scale_1_5'] <= threshold
-        unreliable_participants = pri_signals_df[unreliable_mask]['Participant ID'].tolist()
-        
-        if debug:
-            print(f"Hard threshold analysis: Threshold = {threshold}")
-            print(f"Participants below threshold: {unreliable_mask.sum()}")
-    
-    else:
-        raise ValueError(f"Unknown method: {method}. Use 'outliers', 'percentile', or 'threshold'")
-    
-    if debug:
-        print(f"Identified {len(unreliable_participants)} unreliable participants using method '{method}'")
-    
-    return unreliable_participants
-
-
-def export_unreliable_participants_csv(pri_signals_df, verbatim_map_df, discussion_guide_df, 
-                                      output_path, method='outliers', threshold=None, debug=False):
-    """
-    Export a CSV of unreliable participants with their PRI scores and all open-ended responses.
-    
-    Args:
-        pri_signals_df: DataFrame with calculated PRI scores
-        verbatim_map_df: DataFrame with participant responses
-        discussion_guide_df: DataFrame with question types
-        output_path: Path where to save the CSV file
-        method: Method to identify unreliable participants
-        threshold: Threshold value for identification
-        debug: Whether to print debug information
-        
-    Returns:
-        str: Path to the exported CSV file
-    """
-    if debug:
-        print(f"Exporting unreliable participants using method '{method}'...")
-    
-    # 1. Identify unreliable participants
-    unreliable_participant_ids = identify_unreliable_participants(
-        pri_signals_df, method=method, threshold=threshold, debug=debug
-    )
-    
-    if len(unreliable_participant_ids) == 0:
-        print("No unreliable participants identified.")
-        return None
-    
-    # 2. Get PRI score information for unreliable participants
-    unreliable_pri_df = pri_signals_df[
-        pri_signals_df['Participant ID'].isin(unreliable_participant_ids)
-    ][['Participant ID', 'PRI_Score', 'PRI_Scale_1_5']].copy()
-    
-    # 3. Extract open-ended responses for these participants
-    responses_df = extract_open_ended_responses(
-        verbatim_map_df, discussion_guide_df, unreliable_participant_ids, debug=debug
-    )
-    
-    # 4. Merge PRI scores with responses
-    if len(responses_df) > 0:
-        final_df = unreliable_pri_df.merge(responses_df, on='Participant ID', how='left')
-    else:
-        final_df = unreliable_pri_df
-        if debug:
-            print("Warning: No open-ended responses found for unreliable participants")
-    
-    # 5. Sort by PRI score (lowest first)
-    final_df = final_df.sort_values('PRI_Scale_1_5', ascending=True)
-    
-    # 6. Add metadata columns
-    final_df.insert(0, 'Recommended_Action', 'IGNORE')
-    final_df.insert(1, 'Identification_Method', method)
-    if threshold is not None:
-        final_df.insert(2, 'Threshold_Used', threshold)
-    else:
-        final_df.insert(2, 'Threshold_Used', 'N/A')
-    
-    # 7. Export to CSV
-    final_df.to_csv(output_path, index=False)
-    
-    if debug:
-        print(f"Exported {len(final_df)} unreliable participants to {output_path}")
-        print(f"Columns in export: {list(final_df.columns)}")
-    
-    return output_path
-
-
 def main():
     """Main execution function"""
     start_time = time.time()
@@ -2410,10 +2408,14 @@ def main():
     debug = args.debug
     participant_limit = args.limit
     enable_llm_judge = getattr(args, 'llm_judge', False)
+    enable_duplicate_signal = getattr(args, 'duplicate_signal', False)
+    enable_preference_signal = getattr(args, 'preference_signal', False)
     
     print(f"Calculating PRI for Global Dialogue {gd_number}")
     print(f"Debug mode: {'Enabled' if debug else 'Disabled'}")
     print(f"LLM judge: {'Enabled' if enable_llm_judge else 'Disabled'}")
+    print(f"Duplicate signal: {'Enabled' if enable_duplicate_signal else 'Disabled'}")
+    print(f"Preference signal: {'Enabled' if enable_preference_signal else 'Disabled'}")
     if participant_limit:
         print(f"Limiting to first {participant_limit} participants for testing")
     
@@ -2440,7 +2442,8 @@ def main():
         sys.exit(1)
     
     # 2. Calculate raw PRI signals for all participants
-    pri_signals_df = calculate_all_pri_signals(data_tuple, config, participant_limit, debug, enable_llm_judge)
+    pri_signals_df = calculate_all_pri_signals(data_tuple, config, participant_limit, debug, enable_llm_judge,
+                                               enable_duplicate_signal, enable_preference_signal)
     
     # 3. Normalize and calculate final PRI score
     pri_signals_df = normalize_and_calculate_pri(pri_signals_df, config, debug)
@@ -2483,6 +2486,13 @@ def main():
     pri_signals_df.to_csv(output_path, index=False)
     print(f"\nResults saved to {output_path}")
     
+    # 6a. Save typed Parquet copy with run metadata (weights, thresholds, git revision, input hashes)
+    parquet_path = write_pri_parquet(
+        pri_signals_df, config['PARQUET_OUTPUT_PATH'], build_pri_metadata(config, gd_number)
+    )
+    if parquet_path:
+        print(f"Typed results saved to {parquet_path}")
+    
     # 7. Generate PRI distribution visualization
     try:
         chart_path = create_pri_distribution_chart(pri_signals_df, gd_number, config, debug)
@@ -2502,25 +2512,11 @@ def main():
         # Load discussion guide for question type identification
         discussion_guide_df = pd.read_csv(config['DISCUSSION_GUIDE_PATH'], encoding='utf-8-sig')
         
-        # Export using outliers method by default
-        unreliable_csv_path = f"{config['OUTPUT_DIR']}/GD{gd_number}_unreliable_participants_outliers.csv"
-        export_path = export_unreliable_participants_csv(
-            pri_signals_df, verbatim_map_df, discussion_guide_df, 
-            unreliable_csv_path, method='outliers', debug=debug
+        # Build the response pivot once and export outliers, bottom 10% and threshold 2.5 from memory
+        response_pivot = build_response_pivot(verbatim_map_df, discussion_guide_df, debug)
+        export_unreliable_participants(
+            pri_signals_df, response_pivot, config['OUTPUT_DIR'], gd_number, debug=debug
         )
-        
-        if export_path:
-            print(f"Unreliable participants (outliers) CSV saved to {export_path}")
-        
-        # Also export using 10th percentile method
-        unreliable_csv_path_percentile = f"{config['OUTPUT_DIR']}/GD{gd_number}_unreliable_participants_bottom10pct.csv"
-        export_path_percentile = export_unreliable_participants_csv(
-            pri_signals_df, verbatim_map_df, discussion_guide_df, 
-            unreliable_csv_path_percentile, method='percentile', threshold=10, debug=debug
-        )
-        
-        if export_path_percentile:
-            print(f"Unreliable participants (bottom 10%) CSV saved to {export_path_percentile}")
             
     except Exception as e:
         print(f"Warning: Could not export unreliable participants CSV: {e}")
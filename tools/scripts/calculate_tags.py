@@ -5,6 +5,10 @@ import argparse
 import logging
 import re
 from pathlib import Path
+from lib.agreement_store import load_standardized_store, store_to_standardized_df
+from lib.analysis_utils import parse_percentage_series
+from lib.csv_header import find_csv_header, open_at_header
+from lib.tag_assignments import load_tag_assignments, labels_to_tag_assignments
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -42,37 +46,17 @@ def safe_read_csv(path, **kwargs):
         if not markers:
             markers = ['Question ID'] # Generic fallback
 
-        encodings_to_try = [kwargs.get('encoding', 'utf-8-sig'), 'utf-8', 'latin1', 'iso-8859-1']
-        detected_encoding = None
-
-        for enc in encodings_to_try:
+        # Header row: enough fields (heuristic) and all essential markers
+        header = find_csv_header(path, predicate=lambda columns: len(columns) > min_commas_for_header
+                                 and all(marker in columns for marker in markers))
+        if header is not None:
+            header_row = header.line_index
+            logging.info(f"Detected potential header on line {header_row+1} in {path} using encoding '{header.encoding}' and markers: {markers}")
             try:
-                with open(path, 'r', encoding=enc) as f:
-                    for i, line in enumerate(f):
-                        # Check 1: Does it have enough commas?
-                        if line.count(',') >= min_commas_for_header:
-                            # Check 2: Does it contain all essential markers?
-                            if all(marker in line for marker in markers):
-                                header_row = i
-                                detected_encoding = enc
-                                logging.info(f"Detected potential header on line {header_row+1} in {path} using encoding '{detected_encoding}' and markers: {markers}")
-                                break # Found potential header
-                if header_row != -1:
-                    break # Stop trying encodings if header found
-            except UnicodeDecodeError:
-                logging.warning(f"Encoding {enc} failed for {path}, trying next...")
-                continue
-            except Exception as file_read_error:
-                 logging.error(f"Unexpected error reading {path} with encoding {enc}: {file_read_error}")
-                 break
-
-        if header_row != -1 and detected_encoding:
-            try:
-                kwargs['encoding'] = detected_encoding
-                # --- Read with detected header and VALIDATE columns ---
+                # --- Read from the detected header and VALIDATE columns ---
 
                 # Add on_bad_lines specifically for discussion guide if needed
-                read_kwargs = kwargs.copy()
+                read_kwargs = {key: value for key, value in kwargs.items() if key != 'encoding'}
                 # Use startswith for better matching (e.g., GD3_participants.csv)
                 is_participants_file = filename.startswith('participants') or 'participants' in filename
                 is_guide_file = filename.startswith('guide') or 'guide' in filename # Check again for validation context
@@ -82,11 +66,12 @@ def safe_read_csv(path, **kwargs):
                     read_kwargs['on_bad_lines'] = 'warn'
                     logging.info("Applying 'on_bad_lines=warn' for discussion guide file.")
 
-                df_temp = pd.read_csv(path, header=header_row, **read_kwargs)
+                with open_at_header(path, header) as f:
+                    df_temp = pd.read_csv(f, **read_kwargs)
 
                 # --- Standardized Column Cleaning ---
                 # Clean column names (remove BOM/extra spaces if any) *immediately* after loading
-                df_temp.columns = df_temp.columns.str.replace('^\\ufeff', '', regex=True).str.strip()
+                df_temp.columns = df_temp.columns.str.lstrip('\ufeff').str.strip()
                 logging.info(f"Cleaned columns after loading {filename}: {df_temp.columns.tolist()[:10]}...") # Log cleaned columns
 
 
@@ -166,7 +151,7 @@ def load_and_prep_data(gd_number, data_dir):
             return None # Indicate failure
 
     try:
-        # 1. Load Thought Labels and Melt
+        # 1. Load Thought Labels and expand to one row per tag instance
         logging.info(f"Loading {paths['labels']}...")
         labels_df = safe_read_csv(paths['labels'], encoding='utf-8-sig')
         logging.info(f"  Loaded {len(labels_df)} rows.")
@@ -179,17 +164,18 @@ def load_and_prep_data(gd_number, data_dir):
             logging.error("No columns matching 'Tag \\d+' found in all_thought_labels.csv")
             return None
 
-        logging.info(f"Melting tag columns: {tag_cols}")
-        melted_labels = pd.melt(labels_df,
-                                id_vars=id_vars,
-                                value_vars=tag_cols,
-                                var_name='Tag Source',
-                                value_name='Tag')
-        # Drop rows where Tag is NaN/None/empty and clean Tag text
-        melted_labels.dropna(subset=['Tag'], inplace=True)
-        melted_labels['Tag'] = melted_labels['Tag'].astype(str).str.strip()
-        melted_labels = melted_labels[melted_labels['Tag'] != '']
-        logging.info(f"  Melted to {len(melted_labels)} tag instances.")
+        # Long (thought, tag) table written by preprocess_tag_files.py; built here for older tag directories
+        tag_assignments = load_tag_assignments(paths['labels'].parent, paths['labels'])
+        if tag_assignments is None:
+            logging.info(f"No up-to-date tag assignment table; building it from tag columns: {tag_cols}")
+            tag_assignments = labels_to_tag_assignments(labels_df)
+        assignments, tag_dictionary = tag_assignments
+        if len(assignments) and assignments['thought_index'].max() >= len(labels_df):
+            logging.error(f"Tag assignment table does not match {paths['labels']}; rerun preprocess_tag_files.py.")
+            return None
+        melted_labels = labels_df[id_vars].iloc[assignments['thought_index'].to_numpy()].reset_index(drop=True)
+        melted_labels['Tag'] = tag_dictionary['tag'].to_numpy()[assignments['tag_code'].to_numpy()]
+        logging.info(f"  Expanded to {len(melted_labels)} tag instances.")
         # Ensure correct types
         melted_labels['Participant ID'] = melted_labels['Participant ID'].astype(str)
         melted_labels['Question ID'] = melted_labels['Question ID'].astype(str)
@@ -344,8 +330,12 @@ def load_and_prep_data(gd_number, data_dir):
 
         # 4. Load Standardized Aggregate for Agreement Scores & Question Text
         logging.info(f"Loading {paths['aggregate']}...")
-        agg_df = pd.read_csv(paths['aggregate'], encoding='utf-8', low_memory=False) # Assume preprocess_aggregate handles BOM
-        logging.info(f"  Loaded {len(agg_df)} rows.")
+        # Uses the pre-parsed agreement store next to the CSV (built on first use)
+        agg_store = load_standardized_store(str(paths['aggregate']))
+        if agg_store is None:
+            return None
+        agg_columns = agg_store['metadata']['columns']
+        logging.info(f"  Loaded {len(agg_store['rows'])} rows.")
         # Keep only relevant columns: QID, PID (author), Question Text, Agreement (All)
         # Find the 'All' agreement column (might have varying N)
         # Adjusted pattern to primarily find 'All', but allow 'All (N)' as fallback
@@ -353,13 +343,13 @@ def load_and_prep_data(gd_number, data_dir):
         all_col_pattern_fallback = re.compile(r'^All\s*\((\d+|N)\)\s*$') # Original pattern for 'All (N)'
         all_agreement_col = None
         # Prioritize finding exact 'All'
-        for col in agg_df.columns:
+        for col in agg_columns:
             if all_col_pattern_strict.match(col):
                 all_agreement_col = col
                 break
         # If exact 'All' not found, try the fallback pattern
         if not all_agreement_col:
-            for col in agg_df.columns:
+            for col in agg_columns:
                  # Ensure column name is treated as string
                  if isinstance(col, str) and all_col_pattern_fallback.match(col):
                      all_agreement_col = col
@@ -373,15 +363,16 @@ def load_and_prep_data(gd_number, data_dir):
 
         cols_to_keep_agg = ['Question ID', 'Participant ID', 'Question', all_agreement_col]
         # Check required cols before subsetting
-        missing_agg_cols = [c for c in ['Question ID', 'Participant ID', 'Question'] if c not in agg_df.columns]
+        missing_agg_cols = [c for c in ['Question ID', 'Participant ID', 'Question'] if c not in agg_columns]
         if missing_agg_cols:
-             logging.error(f"Missing required columns {missing_agg_cols} in aggregate_standardized.csv before subsetting. Found: {agg_df.columns.tolist()[:10]}")
+             logging.error(f"Missing required columns {missing_agg_cols} in aggregate_standardized.csv before subsetting. Found: {agg_columns[:10]}")
              return None
         # if not all(c in agg_df.columns for c in ['Question ID', 'Participant ID', 'Question']):
         #      logging.error("Missing required columns ('Question ID', 'Participant ID', 'Question') in aggregate_standardized.csv")
         #      return None
 
-        agg_subset = agg_df[cols_to_keep_agg].copy()
+        # Only the 'All' rates are copied out of the agreement matrix
+        agg_subset = store_to_standardized_df(agg_store, [all_agreement_col])[cols_to_keep_agg].copy()
         # Ensure types for merging
         agg_subset['Question ID'] = agg_subset['Question ID'].astype(str)
         agg_subset['Participant ID'] = agg_subset['Participant ID'].astype(str)
@@ -390,18 +381,7 @@ def load_and_prep_data(gd_number, data_dir):
                                    all_agreement_col: 'Agreement Score'}, inplace=True)
 
         # Parse agreement score
-        # Use the helper function defined in analyze_dialogues.py or replicate it here
-        def parse_percentage(value):
-            if isinstance(value, (int, float)):
-                return float(value) if not np.isnan(value) else np.nan
-            if isinstance(value, str):
-                value = value.strip()
-                if value == '-' or value == '': return np.nan
-                if value.endswith('%'):
-                    try: return float(value[:-1]) / 100.0
-                    except ValueError: return np.nan
-            return np.nan
-        agg_subset['Agreement Score'] = agg_subset['Agreement Score'].apply(parse_percentage)
+        agg_subset['Agreement Score'] = parse_percentage_series(agg_subset['Agreement Score'])
 
         # Merge Agreement Score onto Analysis DF
         logging.info("Merging agreement scores onto analysis data...")
@@ -471,50 +451,67 @@ def calculate_unified_report(df, segment_columns, output_path):
 
     # --- Calculate Segment Frequencies ---
     logging.info("Calculating segment frequencies...")
-    all_frequency_dfs = [metrics_df] # Start with metrics
+    segment_freq_df = None
 
     # Calculate total frequency ('All (Frequency)') - same as 'N Responses'
     metrics_df['All (Frequency)'] = metrics_df['N Responses']
 
-    # Calculate frequency for each segment column
+    # Frequencies for all segment columns at once: melt to long (QID-Tag, segment value, participant) rows
+    # of integer codes, count unique participants per QID-Tag and segment value, and lay the counts out wide
     if segment_columns:
-        for seg_col in segment_columns:
-            logging.info(f"  Calculating frequencies for segment: {seg_col}")
-            # Group by QID, Tag AND the segment value column
-            # Use observed=True to handle categorical data efficiently if present
-            freq_grouped = df.groupby(['Question ID', 'Tag', seg_col], observed=True, dropna=False)
-            # Count unique Participant Ids within each group
-            segment_freq = freq_grouped['Participant Id'].nunique().reset_index()
-            segment_freq.rename(columns={'Participant Id': 'Frequency'}, inplace=True)
-
-            # Pivot to wide format: QID, Tag as index, Segment Values as columns
-            try:
+        logging.info(f"  Calculating frequencies for {len(segment_columns)} segments: {segment_columns}")
+        try:
+            question_codes, question_ids = pd.factorize(df['Question ID'], use_na_sentinel=False)
+            tag_codes, tags = pd.factorize(df['Tag'], use_na_sentinel=False)
+            group_codes, group_pairs = pd.factorize(question_codes * len(tags) + tag_codes)
+            group_keys = pd.MultiIndex.from_arrays([question_ids[group_pairs // len(tags)], tags[group_pairs % len(tags)]],
+                                                   names=['Question ID', 'Tag'])
+            participant_codes, participant_ids = pd.factorize(df['Participant Id']) # -1 for missing IDs, which are not counted
+
+            value_codes = []
+            segment_headers = []
+            for seg_col in segment_columns:
+                # Missing segment values are a value of their own (like groupby dropna=False)
+                codes, values = pd.factorize(df[seg_col], use_na_sentinel=False)
+                value_codes.append(codes + len(segment_headers))
                 # Construct new column names like "Segment Name: Value (Frequency)"
                 # Need to handle potential non-string segment values if any exist
-                segment_freq['Segment Header'] = segment_freq[seg_col].apply(
-                    lambda x: f"{seg_col}: {str(x)} (Frequency)"
-                )
-                pivot_df = segment_freq.pivot_table(index=['Question ID', 'Tag'],
-                                                   columns='Segment Header',
-                                                   values='Frequency',
-                                                   fill_value=0) # Fill missing segment values with 0 count
-                all_frequency_dfs.append(pivot_df)
-                logging.info(f"    Pivoted frequencies for {seg_col}.")
-            except Exception as e:
-                 logging.error(f"    Error pivoting frequencies for segment '{seg_col}': {e}. Skipping this segment.", exc_info=True)
+                segment_headers.extend(f"{seg_col}: {str(value)} (Frequency)" for value in values)
+
+            # Long rows: one per response and segment column
+            has_participant = participant_codes >= 0
+            long_groups = np.tile(group_codes[has_participant], len(segment_columns)).astype(np.int64)
+            long_values = np.concatenate([codes[has_participant] for codes in value_codes]).astype(np.int64)
+            long_participants = np.tile(participant_codes[has_participant], len(segment_columns)).astype(np.int64)
+
+            # Unique participants per (QID-Tag, segment value): sort the packed triples, keep the first of
+            # each run of equal triples, then count per cell (sorting beats hashing millions of distinct keys)
+            cells = long_groups * len(segment_headers) + long_values
+            triples = np.sort(cells * len(participant_ids) + long_participants)
+            unique_triples = triples[np.concatenate(([True], triples[1:] != triples[:-1]))]
+            frequencies = np.bincount(unique_triples // len(participant_ids), minlength=len(group_keys) * len(segment_headers))
+
+            # Wide format: QID, Tag as index, Segment Values as columns; missing segment values count 0
+            segment_freq_df = pd.DataFrame(frequencies.reshape(len(group_keys), len(segment_headers)),
+                                           index=group_keys, columns=segment_headers)
+            logging.info(f"    Calculated {len(segment_headers)} segment frequency columns.")
+        except Exception as e:
+             logging.error(f"    Error calculating segment frequencies: {e}. Skipping segment frequencies.", exc_info=True)
+             segment_freq_df = None
     else:
         logging.warning("No segment columns identified; skipping segment frequency calculation.")
 
 
-    # --- Merge Metrics and Frequencies ---
-    logging.info("Merging all metrics and frequencies...")
+    # --- Combine Metrics and Frequencies ---
+    logging.info("Combining all metrics and frequencies...")
     try:
         # Start with metrics_df (which includes 'All (Frequency)')
         final_report_df = metrics_df
-        # Sequentially merge pivoted frequency tables
-        for freq_df in all_frequency_dfs[1:]: # Skip the first element (metrics_df itself)
-             # Ensure indices match before merging
-            final_report_df = final_report_df.merge(freq_df, left_index=True, right_index=True, how='left')
+        if segment_freq_df is not None:
+            # Align the (QID, Tag) frequencies to the metric rows, then add them as columns in one step
+            aligned_freq_df = segment_freq_df.reindex(metrics_df.index.droplevel(['Question Text', 'Category']))
+            aligned_freq_df.index = metrics_df.index
+            final_report_df = pd.concat([metrics_df, aligned_freq_df], axis=1)
 
         # Fill NaN values in frequency columns with 0 (if any slipped through)
         freq_cols = [col for col in final_report_df.columns if '(Frequency)' in col]
@@ -0,0 +1,179 @@
+import argparse
+import logging
+import os
+import time
+import numpy as np
+import pandas as pd
+from lib.duplicate_detection import (
+    detect_near_duplicates, summarize_participant_duplicates, summarize_clusters,
+    DEFAULT_NUM_PERM, DEFAULT_BANDS, DEFAULT_THRESHOLD, DEFAULT_SHINGLE_SIZE, DEFAULT_MIN_CHARS,
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def build_synthetic_corpus(n_thoughts, n_participants=None, duplicate_rate=0.05, seed=0):
+    """
+    Builds a synthetic verbatim map for benchmarking.
+
+    Thoughts are random word sequences; a fraction `duplicate_rate` are copies
+    (with a small edit) of an earlier thought, half by the same participant and
+    half by someone else.
+
+    Args:
+        n_thoughts: Number of thoughts to generate.
+        n_participants: Number of distinct authors (defaults to n_thoughts / 6).
+        duplicate_rate: Fraction of thoughts that are planted near-duplicates.
+        seed: Random seed.
+
+    Returns:
+        tuple: (corpus, planted, sources)
+               - corpus: DataFrame with Question ID, Participant ID, Thought ID, Thought Text.
+               - planted: Row positions of the planted near-duplicates.
+               - sources: Row position each planted thought was copied from.
+    """
+    rng = np.random.default_rng(seed)
+    n_participants = n_participants or max(1, n_thoughts // 6)
+    vocab = np.array([f"w{i:05d}" for i in range(20000)])
+    n_words = rng.integers(6, 30, size=n_thoughts)
+    word_ids = rng.integers(0, len(vocab), size=int(n_words.sum()))
+    splits = np.cumsum(n_words)[:-1]
+    texts = [' '.join(words) for words in np.split(vocab[word_ids], splits)]
+    participants = rng.integers(0, n_participants, size=n_thoughts)
+
+    # Plant near-duplicates: copy an earlier text and append one extra word
+    dup_idx = np.flatnonzero(rng.random(n_thoughts) < duplicate_rate)
+    dup_idx = dup_idx[dup_idx > 0]
+    sources = (rng.random(len(dup_idx)) * dup_idx).astype(np.int64)
+    same_author = rng.random(len(dup_idx)) < 0.5
+    for i, src, same in zip(dup_idx, sources, same_author):
+        texts[i] = texts[src] + ' ' + vocab[rng.integers(0, len(vocab))]
+        if same:
+            participants[i] = participants[src]
+
+    return pd.DataFrame({
+        'Question ID': rng.integers(0, 20, size=n_thoughts).astype(str),
+        'Participant ID': participants.astype(str),
+        'Thought ID': np.arange(n_thoughts).astype(str),
+        'Thought Text': texts,
+    }), dup_idx, sources
+
+
+def run_benchmark(n_thoughts, args):
+    """Times detection on a synthetic corpus and reports recall on the planted duplicates."""
+    print(f"\n--- Benchmark: {n_thoughts:,} synthetic thoughts ---")
+    start = time.perf_counter()
+    corpus, planted, sources = build_synthetic_corpus(n_thoughts)
+    print(f"  Corpus built in {time.perf_counter() - start:.1f}s ({len(planted):,} planted near-duplicates)")
+
+    start = time.perf_counter()
+    flagged = detect_near_duplicates(
+        corpus, num_perm=args.num_perm, bands=args.bands, threshold=args.threshold,
+        shingle_size=args.shingle_size, min_chars=args.min_chars
+    )
+    elapsed = time.perf_counter() - start
+    n_flagged = int((flagged['Duplicate Cluster'] >= 0).sum())
+    print(f"  Detection time: {elapsed:.1f}s ({n_thoughts / elapsed:,.0f} thoughts/s)")
+    print(f"  Thoughts in near-duplicate clusters: {n_flagged:,}")
+    print(f"  Within-participant repeats: {int(flagged['Within Participant Repeat'].sum()):,}")
+    print(f"  Cross-participant duplicates: {int(flagged['Cross Participant Duplicate'].sum()):,}")
+
+    # A planted duplicate is found when it shares a cluster with the thought it was copied from
+    clusters = flagged['Duplicate Cluster'].to_numpy()
+    found = (clusters[planted] >= 0) & (clusters[planted] == clusters[sources])
+    recall = found.mean() if len(planted) else float('nan')
+    print(f"  Recall on planted near-duplicates: {recall:.2%} ({int(found.sum()):,}/{len(planted):,})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Detect near-duplicate and copy-pasted responses in a verbatim map using MinHash/LSH.')
+
+    # Input specification
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument("--gd_number", type=int, help="Global Dialogue cadence number (e.g., 1, 2, 3). Constructs default paths.")
+    input_group.add_argument("--verbatim_map_csv", help="Explicit path to a GD<N>_verbatim_map.csv file.")
+    input_group.add_argument("--benchmark", type=int, metavar="N", help="Run on a synthetic corpus of N thoughts and report timings.")
+
+    # Output directory
+    parser.add_argument('-o', '--output_dir', help='Directory to save duplicate reports (required if --verbatim_map_csv is used).')
+
+    # Detection parameters
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Minimum estimated Jaccard similarity for two thoughts to count as near-duplicates.')
+    parser.add_argument('--num_perm', type=int, default=DEFAULT_NUM_PERM, help='MinHash signature length.')
+    parser.add_argument('--bands', type=int, default=DEFAULT_BANDS, help='Number of LSH bands (must divide --num_perm).')
+    parser.add_argument('--shingle_size', type=int, default=DEFAULT_SHINGLE_SIZE, help='Character shingle length.')
+    parser.add_argument('--min_chars', type=int, default=DEFAULT_MIN_CHARS,
+                        help='Ignore thoughts shorter than this after normalization.')
+    parser.add_argument('--debug', action='store_true', help='Enable debug logging.')
+
+    args = parser.parse_args()
+
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    if args.benchmark:
+        run_benchmark(args.benchmark, args)
+        return
+
+    # --- Determine File Paths ---
+    if args.gd_number:
+        gd_identifier = f"GD{args.gd_number}"
+        verbatim_path = os.path.join("Data", gd_identifier, f"{gd_identifier}_verbatim_map.csv")
+        output_path = args.output_dir if args.output_dir else os.path.join("analysis_output", gd_identifier, "duplicates")
+        if not os.path.exists(verbatim_path):
+            parser.error(f"Verbatim map not found for {gd_identifier}. Expected at: {verbatim_path}")
+    else:
+        if not args.output_dir:
+            parser.error("--output_dir is required when --verbatim_map_csv is used.")
+        verbatim_path = args.verbatim_map_csv
+        output_path = args.output_dir
+
+    logging.info(f"  Verbatim Map: {verbatim_path}")
+    logging.info(f"  Output Directory: {output_path}")
+    os.makedirs(output_path, exist_ok=True)
+
+    # --- Load Data ---
+    try:
+        verbatim_df = pd.read_csv(verbatim_path, quotechar='"')
+        logging.info(f"Loaded verbatim map with shape: {verbatim_df.shape}")
+    except Exception as e:
+        logging.error(f"Error loading verbatim map: {e}"); exit(1)
+
+    # --- Detect ---
+    print("\n--- Detecting Near-Duplicate Responses --- ")
+    start = time.perf_counter()
+    flagged = detect_near_duplicates(
+        verbatim_df, num_perm=args.num_perm, bands=args.bands, threshold=args.threshold,
+        shingle_size=args.shingle_size, min_chars=args.min_chars
+    )
+    logging.info(f"Detection finished in {time.perf_counter() - start:.2f}s")
+
+    clusters_df = summarize_clusters(flagged)
+    participants_df = summarize_participant_duplicates(flagged)
+    duplicates_df = flagged[flagged['Duplicate Cluster'] >= 0].sort_values(['Duplicate Cluster', 'Participant ID'])
+    duplicates_df = duplicates_df.drop(columns=['Normalized Length'])
+
+    # --- Save ---
+    try:
+        duplicates_df.to_csv(os.path.join(output_path, "duplicate_thoughts.csv"), index=False, encoding='utf-8')
+        clusters_df.to_csv(os.path.join(output_path, "duplicate_clusters.csv"), index=False, encoding='utf-8')
+        participants_df.sort_values('Duplicate_Ratio', ascending=False).to_csv(
+            os.path.join(output_path, "participant_duplicate_ratios.csv"), index=False, float_format='%.4f', encoding='utf-8')
+        logging.info(f"Saved duplicate reports to {output_path}")
+    except Exception as e:
+        logging.error(f"Error saving duplicate reports: {e}")
+
+    # --- Summary ---
+    print("\n--- Duplicate Summary ---")
+    print(f"Thoughts analysed: {len(flagged)}")
+    print(f"Near-duplicate clusters: {len(clusters_df)}")
+    print(f"Within-participant repeats: {int(flagged['Within Participant Repeat'].sum())}")
+    print(f"Cross-participant duplicates: {int(flagged['Cross Participant Duplicate'].sum())}")
+    print(f"Participants with any duplicated thought: {int((participants_df['Duplicate_Ratio'] > 0).sum())}")
+
+    logging.info("Duplicate detection script finished.")
+
+if __name__ == "__main__":
+    main()
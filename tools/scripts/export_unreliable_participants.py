@@ -25,6 +25,7 @@ import argparse
 import sys
 import os
 from pathlib import Path
+from lib.pri_io import read_pri_parquet
 
 
 def parse_args():
@@ -56,34 +57,76 @@ def get_config(gd_number):
         'DATA_DIR': str(data_dir),
         'OUTPUT_DIR': str(output_dir),
         'PRI_SCORES_PATH': str(output_dir / f"GD{gd_number}_pri_scores.csv"),
+        'PRI_PARQUET_PATH': str(output_dir / f"GD{gd_number}_pri_scores.parquet"),
         'VERBATIM_MAP_PATH': str(data_dir / f"GD{gd_number}_verbatim_map.csv"),
         'DISCUSSION_GUIDE_PATH': str(data_dir / f"GD{gd_number}_discussion_guide.csv"),
     }
     
-    # Verify required files exist
+    # Verify required files exist (PRI scores may come from either the CSV or the Parquet file)
     for key, path in config.items():
+        if key in ('PRI_SCORES_PATH', 'PRI_PARQUET_PATH'):
+            continue
         if key.endswith('_PATH') and not os.path.exists(path):
             raise FileNotFoundError(f"Required file not found: {path}")
+    if not os.path.exists(config['PRI_SCORES_PATH']) and not os.path.exists(config['PRI_PARQUET_PATH']):
+        raise FileNotFoundError(f"Required file not found: {config['PRI_SCORES_PATH']}")
     
     return config
 
 
-def extract_open_ended_responses(verbatim_map_df, discussion_guide_df, participant_ids, debug=False):
+def load_pri_scores(config, debug=False):
     """
-    Extract all open-ended (Ask Opinion, Ask Experience) responses for specific participants.
+    Load PRI scores, preferring the typed Parquet output over the CSV.
+    
+    The Parquet file is skipped when it is older than the CSV (stale) or when it
+    lacks required columns; other schema drift is reported but the file is used.
     
     Args:
-        verbatim_map_df: DataFrame with participant responses
-        discussion_guide_df: DataFrame with question types  
-        participant_ids: List of participant IDs to extract responses for
+        config: Dictionary with file paths
         debug: Whether to print debug information
         
     Returns:
-        DataFrame with participant responses pivoted into columns
+        DataFrame with PRI scores
     """
-    if debug:
-        print(f"Extracting open-ended responses for {len(participant_ids)} participants...")
+    parquet_path = config['PRI_PARQUET_PATH']
+    csv_path = config['PRI_SCORES_PATH']
+    
+    if os.path.exists(parquet_path):
+        if os.path.exists(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(parquet_path):
+            print(f"Warning: {csv_path} is newer than {parquet_path}; using the CSV")
+        else:
+            print(f"Loading PRI scores from {parquet_path}...")
+            pri_scores_df, metadata, drift = read_pri_parquet(parquet_path)
+            for message in drift:
+                print(f"Warning: PRI schema drift: {message}")
+            if pri_scores_df is not None:
+                if debug:
+                    print(f"PRI run metadata: git revision {metadata.get('git_revision')}, "
+                          f"created {metadata.get('created_at')}, weights {metadata.get('weights')}")
+                return pri_scores_df
+            print("Falling back to CSV PRI scores")
+    
+    print(f"Loading PRI scores from {csv_path}...")
+    return pd.read_csv(csv_path)
+
+
+def build_response_pivot(verbatim_map_df, discussion_guide_df, debug=False):
+    """
+    Build the participant x question pivot of open-ended (Ask Opinion, Ask Experience)
+    responses for all participants at once.
+    
+    The pivot is built once and reused for every identification method, so exports for
+    several methods/thresholds only need to select rows from it.
     
+    Args:
+        verbatim_map_df: DataFrame with participant responses
+        discussion_guide_df: DataFrame with question types
+        debug: Whether to print debug information
+        
+    Returns:
+        DataFrame indexed by Participant ID with one column per question (named by
+        question text); NaN where a participant has no response
+    """
     # Find Ask Opinion and Ask Experience questions from discussion guide
     open_ended_questions = discussion_guide_df[
         discussion_guide_df['Item type (dropdown)'].str.contains('ask opinion|ask experience', case=False, na=False)
@@ -103,27 +146,21 @@ def extract_open_ended_responses(verbatim_map_df, discussion_guide_df, participa
     if debug:
         print(f"Matching open-ended questions: {matching_questions}")
     
-    # If no matches, use a broader approach - get all responses for participants and filter by question text patterns
+    # If no matches, use a broader approach - filter by question text patterns
     if len(matching_questions) == 0:
         if debug:
             print("No direct question ID matches found. Trying to match by question text patterns...")
         
-        # Filter responses for target participants first
-        participant_responses = verbatim_map_df[
-            verbatim_map_df['Participant ID'].isin(participant_ids)
-        ].copy()
-        
         # Look for question texts that indicate open-ended questions
         open_ended_patterns = [
             'explain why', 'can you explain', 'please explain', 'would you want', 
             'do you think', 'would you prefer', 'what has been', 'is there anything'
         ]
         
-        mask = participant_responses['Question Text'].str.contains(
+        mask = verbatim_map_df['Question Text'].str.contains(
             '|'.join(open_ended_patterns), case=False, na=False
         )
-        
-        responses_df = participant_responses[mask].copy()
+        responses_df = verbatim_map_df[mask]
         
         if debug:
             print(f"Found {len(responses_df)} responses using text pattern matching")
@@ -131,38 +168,67 @@ def extract_open_ended_responses(verbatim_map_df, discussion_guide_df, participa
                 print(f"Sample question texts: {responses_df['Question Text'].unique()[:3]}")
     else:
         # Use the matching question IDs
-        responses_df = verbatim_map_df[
-            (verbatim_map_df['Participant ID'].isin(participant_ids)) &
-            (verbatim_map_df['Question ID'].isin(matching_questions))
-        ].copy()
+        responses_df = verbatim_map_df[verbatim_map_df['Question ID'].isin(matching_questions)]
         
         if debug:
             print(f"Found {len(responses_df)} responses using question ID matching")
     
+    responses_df = responses_df.dropna(subset=['Thought Text'])
     if len(responses_df) == 0:
         if debug:
-            print("No open-ended responses found for target participants")
-        return pd.DataFrame()
+            print("No open-ended responses found in verbatim map")
+        return pd.DataFrame(index=pd.Index([], name='Participant ID'))
     
     # Create a mapping of Question ID to Question Text for column names
     question_mapping = dict(zip(responses_df['Question ID'], responses_df['Question Text']))
     
-    # Group by participant and question, concatenate multiple thoughts if any
-    grouped_responses = responses_df.groupby(['Participant ID', 'Question ID'])['Thought Text'].agg(
-        lambda x: ' | '.join(x.astype(str)) if len(x) > 1 else x.iloc[0] if len(x) == 1 else ''
-    ).reset_index()
-    
-    # Pivot to get one column per question
-    pivoted_df = grouped_responses.pivot(index='Participant ID', columns='Question ID', values='Thought Text')
+    # Concatenate multiple thoughts per participant and question, then pivot to one column per question
+    pivoted_df = (
+        responses_df['Thought Text'].astype(str)
+        .groupby([responses_df['Participant ID'], responses_df['Question ID']])
+        .agg(' | '.join)
+        .unstack('Question ID')
+    )
     
     # Rename columns to use question text instead of question ID
     pivoted_df.columns = [question_mapping.get(col, col) for col in pivoted_df.columns]
     
-    # Reset index to make Participant ID a regular column
-    pivoted_df = pivoted_df.reset_index()
+    if debug:
+        print(f"Built response pivot for {len(pivoted_df)} participants across {len(pivoted_df.columns)} questions")
+    
+    return pivoted_df
+
+
+def extract_open_ended_responses(verbatim_map_df, discussion_guide_df, participant_ids, debug=False,
+                                 response_pivot=None):
+    """
+    Extract all open-ended (Ask Opinion, Ask Experience) responses for specific participants.
+    
+    Args:
+        verbatim_map_df: DataFrame with participant responses
+        discussion_guide_df: DataFrame with question types  
+        participant_ids: List of participant IDs to extract responses for
+        debug: Whether to print debug information
+        response_pivot: Precomputed pivot from build_response_pivot() (built on demand if None)
+        
+    Returns:
+        DataFrame with participant responses pivoted into columns
+    """
+    if debug:
+        print(f"Extracting open-ended responses for {len(participant_ids)} participants...")
+    
+    if response_pivot is None:
+        response_pivot = build_response_pivot(verbatim_map_df, discussion_guide_df, debug)
+    
+    # Keep only these participants and the questions they answered
+    selected = response_pivot[response_pivot.index.isin(participant_ids)].dropna(axis=1, how='all')
     
-    # Fill NaN values with empty strings
-    pivoted_df = pivoted_df.fillna('')
+    if len(selected) == 0:
+        if debug:
+            print("No open-ended responses found for target participants")
+        return pd.DataFrame()
+    
+    pivoted_df = selected.fillna('').reset_index()
     
     if debug:
         print(f"Extracted responses for {len(pivoted_df)} participants across {len(pivoted_df.columns)-1} questions")
@@ -251,70 +317,50 @@ def identify_unreliable_participants(pri_scores_df, method='outliers', threshold
     return unreliable_participants, effective_threshold
 
 
-def main():
-    """Main execution function"""
-    # Parse command-line arguments
-    args = parse_args()
-    gd_number = args.gd_number
-    method = args.method
-    threshold = args.threshold
-    debug = args.debug
-    
-    print(f"Exporting unreliable participants for Global Dialogue {gd_number}")
-    print(f"Method: {method}")
-    if threshold is not None:
-        print(f"Threshold: {threshold}")
-    print(f"Debug mode: {'Enabled' if debug else 'Disabled'}")
-    
-    # Get configuration for this GD
-    try:
-        config = get_config(gd_number)
-    except Exception as e:
-        print(f"Error in configuration: {e}")
-        sys.exit(1)
-    
-    # 1. Load existing PRI scores
-    try:
-        print(f"Loading PRI scores from {config['PRI_SCORES_PATH']}...")
-        pri_scores_df = pd.read_csv(config['PRI_SCORES_PATH'])
-        print(f"Loaded PRI scores for {len(pri_scores_df)} participants")
-    except Exception as e:
-        print(f"Error loading PRI scores: {e}")
-        sys.exit(1)
-    
-    # 2. Load verbatim map data
-    try:
-        print(f"Loading verbatim responses from {config['VERBATIM_MAP_PATH']}...")
-        verbatim_map_df = pd.read_csv(config['VERBATIM_MAP_PATH'], quotechar='"', engine='python')
-        print(f"Loaded verbatim map data with shape: {verbatim_map_df.shape}")
-    except Exception as e:
-        print(f"Error loading verbatim map data: {e}")
-        sys.exit(1)
-    
-    # 3. Load discussion guide
-    try:
-        print(f"Loading discussion guide from {config['DISCUSSION_GUIDE_PATH']}...")
-        discussion_guide_df = pd.read_csv(config['DISCUSSION_GUIDE_PATH'], encoding='utf-8-sig', quotechar='"', 
-                                        engine='python', on_bad_lines='skip')
-        print(f"Loaded discussion guide with {len(discussion_guide_df)} questions")
-    except Exception as e:
-        print(f"Error loading discussion guide: {e}")
-        sys.exit(1)
+# Identification methods exported by default: (method, threshold)
+DEFAULT_EXPORT_METHODS = [('outliers', None), ('percentile', 10), ('threshold', 2.5)]
+
+
+def get_export_filename(gd_number, method, threshold=None):
+    """File name for an unreliable-participants export."""
+    if method == 'outliers':
+        return f"GD{gd_number}_unreliable_participants_outliers.csv"
+    elif method == 'percentile':
+        thresh_str = f"{threshold}pct" if threshold else "10pct"
+        return f"GD{gd_number}_unreliable_participants_bottom{thresh_str}.csv"
+    elif method == 'threshold':
+        thresh_str = f"{threshold}" if threshold else "2.5"
+        return f"GD{gd_number}_unreliable_participants_threshold{thresh_str}.csv"
+    raise ValueError(f"Unknown method: {method}. Use 'outliers', 'percentile', or 'threshold'")
+
+
+def build_unreliable_export(pri_scores_df, response_pivot, method='outliers', threshold=None, debug=False):
+    """
+    Build the export table of unreliable participants for one identification method.
     
-    # 4. Identify unreliable participants
+    Args:
+        pri_scores_df: DataFrame with calculated PRI scores
+        response_pivot: Response pivot from build_response_pivot()
+        method: Method to identify unreliable participants
+        threshold: Threshold value for percentile or threshold methods
+        debug: Whether to print debug information
+        
+    Returns:
+        DataFrame with PRI component scores and open-ended responses, or None if no
+        participants were identified
+    """
     unreliable_participant_ids, effective_threshold = identify_unreliable_participants(
         pri_scores_df, method=method, threshold=threshold, debug=debug
     )
     
     if len(unreliable_participant_ids) == 0:
-        print("No unreliable participants identified.")
-        return
+        return None
     
-    # 5. Get PRI score information for unreliable participants
     # Include final normalized component scores and PRI scores
     # Check if LLM judge columns are available
     base_columns = ['Participant ID', 'Duration_Norm', 'LowQualityTag_Norm', 
                    'UniversalDisagreement_Norm', 'ASC_Norm', 'PRI_Scale_1_5']
+    base_columns = [col for col in base_columns if col in pri_scores_df.columns]
     
     # Look for LLM judge columns (they might have different names)
     available_columns = pri_scores_df.columns.tolist()
@@ -333,22 +379,22 @@ def main():
         pri_scores_df['Participant ID'].isin(unreliable_participant_ids)
     ][columns_to_include].copy()
     
-    # 6. Extract open-ended responses for these participants
+    # Select these participants' open-ended responses from the shared pivot
     responses_df = extract_open_ended_responses(
-        verbatim_map_df, discussion_guide_df, unreliable_participant_ids, debug=debug
+        None, None, unreliable_participant_ids, debug=debug, response_pivot=response_pivot
     )
     
-    # 7. Merge PRI scores with responses
+    # Merge PRI scores with responses
     if len(responses_df) > 0:
         final_df = unreliable_pri_df.merge(responses_df, on='Participant ID', how='left')
     else:
         final_df = unreliable_pri_df
         print("Warning: No open-ended responses found for unreliable participants")
     
-    # 8. Sort by PRI score (lowest first)
+    # Sort by PRI score (lowest first)
     final_df = final_df.sort_values('PRI_Scale_1_5', ascending=True)
     
-    # 9. Add metadata columns
+    # Add metadata columns
     final_df.insert(0, 'Recommended_Action', 'IGNORE')
     final_df.insert(1, 'Identification_Method', method)
     if effective_threshold is not None:
@@ -356,30 +402,109 @@ def main():
     else:
         final_df.insert(2, 'Threshold_Used', 'N/A')
     
-    # 10. Generate output filename
-    if method == 'outliers':
-        output_filename = f"GD{gd_number}_unreliable_participants_outliers.csv"
-    elif method == 'percentile':
-        thresh_str = f"{threshold}pct" if threshold else "10pct"
-        output_filename = f"GD{gd_number}_unreliable_participants_bottom{thresh_str}.csv"
-    elif method == 'threshold':
-        thresh_str = f"{threshold}" if threshold else "2.5"
-        output_filename = f"GD{gd_number}_unreliable_participants_threshold{thresh_str}.csv"
+    return final_df
+
+
+def export_unreliable_participants(pri_scores_df, response_pivot, output_dir, gd_number,
+                                   methods=DEFAULT_EXPORT_METHODS, debug=False):
+    """
+    Export unreliable participants for several identification methods in one call.
     
-    output_path = os.path.join(config['OUTPUT_DIR'], output_filename)
+    Works entirely on in-memory data, so calculate_pri.py can call it with the frames
+    it already holds; only the output CSVs are written.
     
-    # 11. Export to CSV
-    final_df.to_csv(output_path, index=False)
+    Args:
+        pri_scores_df: DataFrame with calculated PRI scores
+        response_pivot: Response pivot from build_response_pivot()
+        output_dir: Directory to write the CSV files to
+        gd_number: Global Dialogue number (used in file names)
+        methods: List of (method, threshold) pairs
+        debug: Whether to print debug information
+        
+    Returns:
+        Dictionary mapping (method, threshold) to the exported CSV path
+    """
+    exported = {}
+    for method, threshold in methods:
+        final_df = build_unreliable_export(pri_scores_df, response_pivot, method, threshold, debug)
+        if final_df is None:
+            print(f"No unreliable participants identified using method '{method}'.")
+            continue
+        
+        output_path = os.path.join(output_dir, get_export_filename(gd_number, method, threshold))
+        final_df.to_csv(output_path, index=False)
+        exported[(method, threshold)] = output_path
+        
+        print(f"\nExported {len(final_df)} unreliable participants ({method}) to {output_path}")
+        if debug:
+            print(f"Columns in export: {list(final_df.columns)}")
+        print(f"- Percentage identified as unreliable: {len(final_df)/len(pri_scores_df)*100:.1f}%")
+        print(f"- PRI score range for unreliable: {final_df['PRI_Scale_1_5'].min():.3f} - {final_df['PRI_Scale_1_5'].max():.3f}")
     
-    print(f"\nExported {len(final_df)} unreliable participants to {output_path}")
-    print(f"Columns in export: {list(final_df.columns)}")
+    return exported
+
+
+def main():
+    """Main execution function"""
+    # Parse command-line arguments
+    args = parse_args()
+    gd_number = args.gd_number
+    method = args.method
+    threshold = args.threshold
+    debug = args.debug
+    
+    print(f"Exporting unreliable participants for Global Dialogue {gd_number}")
+    print(f"Method: {method}")
+    if threshold is not None:
+        print(f"Threshold: {threshold}")
+    print(f"Debug mode: {'Enabled' if debug else 'Disabled'}")
+    
+    # Get configuration for this GD
+    try:
+        config = get_config(gd_number)
+    except Exception as e:
+        print(f"Error in configuration: {e}")
+        sys.exit(1)
+    
+    # 1. Load existing PRI scores
+    try:
+        pri_scores_df = load_pri_scores(config, debug)
+        print(f"Loaded PRI scores for {len(pri_scores_df)} participants")
+    except Exception as e:
+        print(f"Error loading PRI scores: {e}")
+        sys.exit(1)
+    
+    # 2. Load verbatim map data
+    try:
+        print(f"Loading verbatim responses from {config['VERBATIM_MAP_PATH']}...")
+        verbatim_map_df = pd.read_csv(config['VERBATIM_MAP_PATH'], quotechar='"')
+        print(f"Loaded verbatim map data with shape: {verbatim_map_df.shape}")
+    except Exception as e:
+        print(f"Error loading verbatim map data: {e}")
+        sys.exit(1)
+    
+    # 3. Load discussion guide
+    try:
+        print(f"Loading discussion guide from {config['DISCUSSION_GUIDE_PATH']}...")
+        discussion_guide_df = pd.read_csv(config['DISCUSSION_GUIDE_PATH'], encoding='utf-8-sig', quotechar='"', 
+                                        on_bad_lines='skip')
+        print(f"Loaded discussion guide with {len(discussion_guide_df)} questions")
+    except Exception as e:
+        print(f"Error loading discussion guide: {e}")
+        sys.exit(1)
+    
+    # 4. Build the participant x question response pivot once
+    response_pivot = build_response_pivot(verbatim_map_df, discussion_guide_df, debug)
     
-    # 12. Print summary statistics
-    print(f"\nSummary:")
-    print(f"- Total participants with PRI scores: {len(pri_scores_df)}")
-    print(f"- Unreliable participants identified: {len(final_df)}")
-    print(f"- Percentage identified as unreliable: {len(final_df)/len(pri_scores_df)*100:.1f}%")
-    print(f"- PRI score range for unreliable: {final_df['PRI_Scale_1_5'].min():.3f} - {final_df['PRI_Scale_1_5'].max():.3f}")
+    # 5. Identify unreliable participants and export
+    print(f"\nTotal participants with PRI scores: {len(pri_scores_df)}")
+    exported = export_unreliable_participants(
+        pri_scores_df, response_pivot, config['OUTPUT_DIR'], gd_number,
+        methods=[(method, threshold)], debug=debug
+    )
+    
+    if not exported:
+        print("No unreliable participants identified.")
 
 
 if __name__ == "__main__":
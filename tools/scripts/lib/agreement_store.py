@@ -0,0 +1,636 @@
+"""
+Pre-parsed numeric agreement store for the standardized aggregate.
+
+GD<N>_aggregate_standardized.csv keeps agreement rates as percent strings
+("67%", "-"), which every analyzer used to re-parse cell by cell. The store
+converts them once and keeps them next to the CSV in GD<N>_agreement_store/:
+
+    agreement.npy       float64 responses x segments matrix (0-1, NaN = no data),
+                        opened memory-mapped; float64 holds exactly the rates
+                        parse_percentage_series gives for the CSV, so scores and
+                        their ties do not depend on which source was read
+    rows.parquet        row metadata (every non-segment column, in CSV row order)
+    segment_sizes.npy   float32 questions x segments participant counts (NaN = unknown)
+    metadata.json       schema version, source fingerprints, column order,
+                        segment metadata (column, core name, O-code) and question IDs
+
+The store is rebuilt whenever the standardized CSV or segment counts change
+(size or modification time). pyarrow is needed for the row metadata; without
+it the store is not built and load_standardized_store() parses the CSV into
+the same structure in memory.
+
+Scorers work on the matrix directly: iter_store_blocks() splits a store into
+row blocks and block_rates() picks the rates of a question's rows and
+segments, so only the rows being scored are read from the memory map.
+store_to_standardized_df() rebuilds a DataFrame for scripts that need one,
+copying only the segment columns they ask for.
+
+preprocess_aggregate.py also writes GD<N>_aggregate_standardized.parquet, the
+whole standardized table with real dtypes (categorical labels, float64
+agreement, nullable integers). load_standardized_store() (and so
+load_standardized_frame()) reads it when no store can be opened, before
+falling back to the CSV.
+
+write_long_agreement_table() derives GD<N>_agreement_long/ from a store: one
+row per populated (response, segment) cell with integer-coded keys, plus
+dictionary files mapping the codes back to questions, responses and segments:
+
+    agreement.parquet   question_code, response_code, segment_code (int32),
+                        agreement (float32), segment_n (int32, null = unknown)
+    questions.csv       question_code, Question ID, Question Type, Question
+    responses.parquet   response_code (= standardized CSV row), question_code, row metadata
+    segments.csv        segment_code, Column, Core Name, O-Code
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from lib.analysis_utils import parse_percentage_columns
+
+try:
+    import pyarrow
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+STORE_SCHEMA_VERSION = 3
+AGREEMENT_FILENAME = 'agreement.npy'
+ROWS_FILENAME = 'rows.parquet'
+SEGMENT_SIZES_FILENAME = 'segment_sizes.npy'
+METADATA_FILENAME = 'metadata.json'
+
+# Long-format agreement table (see write_long_agreement_table)
+LONG_AGREEMENT_FILENAME = 'agreement.parquet'
+LONG_QUESTIONS_FILENAME = 'questions.csv'
+LONG_RESPONSES_FILENAME = 'responses.parquet'
+LONG_SEGMENTS_FILENAME = 'segments.csv'
+LONG_QUESTION_COLUMNS = ["Question ID", "Question Type", "Question"]
+
+# Non-segment columns of the standardized aggregate (see preprocess_aggregate.FINAL_HEADER_ORDER_BASE)
+STANDARDIZED_BASE_COLUMNS = [
+    "Question ID", "Question Type", "Question", "Response", "OriginalResponse",
+    "Star", "Categories", "Sentiment", "Submitted By", "Language", "Sample ID", "Participant ID"
+]
+
+O_CODE_PATTERN = re.compile(r'^O(\d+):')
+
+# Low-cardinality labels stored as categoricals in the typed standardized file
+TYPED_CATEGORICAL_COLUMNS = ["Question ID", "Question Type", "Sentiment", "Language"]
+
+
+def get_store_dir(std_csv_path):
+    """Default store location for a standardized CSV: Data/GD<N>/GD<N>_agreement_store."""
+    directory, filename = os.path.split(std_csv_path)
+    stem = filename[:-len('_aggregate_standardized.csv')] if filename.endswith('_aggregate_standardized.csv') \
+        else os.path.splitext(filename)[0]
+    return os.path.join(directory, f"{stem}_agreement_store")
+
+
+def get_long_table_dir(std_csv_path):
+    """Default long-format table location for a standardized CSV: Data/GD<N>/GD<N>_agreement_long."""
+    store_dir = get_store_dir(std_csv_path)
+    return store_dir[:-len('_agreement_store')] + '_agreement_long'
+
+
+def get_segment_counts_path(std_csv_path):
+    """Segment counts file written by preprocess_aggregate alongside a standardized CSV."""
+    if std_csv_path.endswith('_aggregate_standardized.csv'):
+        return std_csv_path[:-len('_aggregate_standardized.csv')] + '_segment_counts_by_question.csv'
+    return None
+
+
+def parse_o_code(core_name):
+    """O-code prefix of a core segment name ('O1: English' -> 'O1'), or None."""
+    match = O_CODE_PATTERN.match(str(core_name))
+    return f"O{match.group(1)}" if match else None
+
+
+def _file_fingerprint(path):
+    """Cheap change detection for a source file: absolute path, size and mtime."""
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _read_segment_sizes(segment_counts_path, question_ids, segment_columns):
+    """Participant counts per question (rows) and segment column (columns), NaN where unknown."""
+    segment_sizes = pd.DataFrame(np.nan, index=pd.Index(question_ids, name='Question ID'),
+                                 columns=segment_columns, dtype=np.float32)
+    if not segment_counts_path or not os.path.exists(segment_counts_path):
+        logging.warning(f"Segment counts not found ({segment_counts_path}); segment sizes left empty.")
+        return segment_sizes
+    try:
+        counts_df = pd.read_csv(segment_counts_path)
+        counts_df['Question ID'] = counts_df['Question ID'].astype(str)
+        counts_df = counts_df.drop_duplicates('Question ID').set_index('Question ID')
+        counts_df = counts_df.reindex(index=segment_sizes.index, columns=segment_columns)
+        return counts_df.apply(pd.to_numeric, errors='coerce').astype(np.float32)
+    except Exception as e:
+        logging.warning(f"Could not read segment counts from {segment_counts_path}: {e}")
+        return segment_sizes
+
+
+def standardized_df_to_store(std_df, segment_counts_path=None):
+    """
+    Builds a store in memory from a standardized aggregate DataFrame.
+
+    Used when no store can be opened; agreement is parsed exactly as
+    build_agreement_store() parses it, so the scores do not depend on the source.
+    Categorical row metadata (from the typed Parquet copy) is turned back into
+    plain values, so grouping behaves as for the CSV.
+
+    Args:
+        std_df (pd.DataFrame): The standardized aggregate, read from the CSV or the typed copy.
+        segment_counts_path (str): Segment counts file for the segment sizes (NaN if absent).
+
+    Returns:
+        dict: As load_agreement_store(), with an in-memory agreement matrix.
+    """
+    segment_columns = [col for col in std_df.columns if col not in STANDARDIZED_BASE_COLUMNS]
+    base_columns = [col for col in std_df.columns if col in STANDARDIZED_BASE_COLUMNS]
+
+    # Parse every segment column once into a float64 matrix
+    agreement = parse_percentage_columns(std_df[segment_columns]).to_numpy(dtype=np.float64, na_value=np.nan)
+    rows = std_df[base_columns].reset_index(drop=True)
+    for col in rows.columns:
+        if isinstance(rows[col].dtype, pd.CategoricalDtype):
+            rows[col] = rows[col].astype(rows[col].cat.categories.dtype)
+    question_ids = pd.unique(rows['Question ID'].astype(str)).tolist() if 'Question ID' in rows.columns else []
+
+    metadata = {
+        'columns': std_df.columns.tolist(),
+        'segments': [
+            {'column': col, 'core_name': col, 'o_code': parse_o_code(col)} for col in segment_columns
+        ],
+        'question_ids': question_ids,
+        'num_rows': len(std_df),
+    }
+    return {
+        'agreement': agreement,
+        'rows': rows,
+        'segments': _segments_frame(metadata),
+        'segment_sizes': _read_segment_sizes(segment_counts_path, question_ids, segment_columns),
+        'metadata': metadata,
+    }
+
+
+def _segments_frame(metadata):
+    """Segment metadata of a store as a DataFrame with Column, Core Name and O-Code."""
+    return pd.DataFrame(metadata['segments'], columns=['column', 'core_name', 'o_code']).rename(
+        columns={'column': 'Column', 'core_name': 'Core Name', 'o_code': 'O-Code'}
+    )
+
+
+def get_store_segment_columns(store):
+    """Segment column names of a store, in matrix column order."""
+    return store['segments']['Column'].tolist()
+
+
+def build_agreement_store(std_csv_path, segment_counts_path=None, store_dir=None):
+    """
+    Converts a standardized aggregate CSV into a numeric agreement store.
+
+    Args:
+        std_csv_path (str): Path to GD<N>_aggregate_standardized.csv.
+        segment_counts_path (str): Path to GD<N>_segment_counts_by_question.csv.
+                                   Defaults to the file next to the CSV; sizes are NaN if absent.
+        store_dir (str): Output directory (default: get_store_dir(std_csv_path)).
+
+    Returns:
+        str: The store directory, or None if it could not be built.
+    """
+    if not PYARROW_AVAILABLE:
+        logging.warning("pyarrow is not installed; skipping agreement store build.")
+        return None
+
+    store_dir = store_dir or get_store_dir(std_csv_path)
+    segment_counts_path = segment_counts_path or get_segment_counts_path(std_csv_path)
+    start = time.perf_counter()
+
+    try:
+        std_df = pd.read_csv(std_csv_path, low_memory=False)
+    except Exception as e:
+        logging.error(f"Error loading standardized data from {std_csv_path}: {e}")
+        return None
+
+    store = standardized_df_to_store(std_df, segment_counts_path)
+    del std_df
+    agreement = store['agreement']
+    segment_sizes = store['segment_sizes'].to_numpy(dtype=np.float32)
+
+    # Row metadata; mixed-type object columns are stored as strings (missing values stay missing)
+    rows = store['rows']
+    for col in rows.columns:
+        if rows[col].dtype == object:
+            rows[col] = rows[col].where(rows[col].isna(), rows[col].astype(str))
+
+    metadata = {
+        'schema_version': STORE_SCHEMA_VERSION,
+        'source': _file_fingerprint(std_csv_path),
+        'segment_counts_source': _file_fingerprint(segment_counts_path),
+        **store['metadata'],
+    }
+
+    # Write into a temporary directory and swap it in, so readers never see a partial store
+    tmp_dir = f"{store_dir}.tmp"
+    try:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, AGREEMENT_FILENAME), agreement)
+        np.save(os.path.join(tmp_dir, SEGMENT_SIZES_FILENAME), segment_sizes)
+        rows.to_parquet(os.path.join(tmp_dir, ROWS_FILENAME), index=False)
+        with open(os.path.join(tmp_dir, METADATA_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2)
+        shutil.rmtree(store_dir, ignore_errors=True)
+        os.replace(tmp_dir, store_dir)
+    except Exception as e:
+        logging.error(f"Error writing agreement store to {store_dir}: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+
+    logging.info(f"Built agreement store {store_dir} ({agreement.shape[0]} rows x {agreement.shape[1]} segments) "
+                 f"in {time.perf_counter() - start:.2f}s")
+    return store_dir
+
+
+def is_store_current(store_dir, std_csv_path, segment_counts_path=None):
+    """True if the store exists, has the current schema and matches its source files."""
+    metadata_path = os.path.join(store_dir, METADATA_FILENAME)
+    if not os.path.exists(metadata_path):
+        return False
+    try:
+        with open(metadata_path, encoding='utf-8') as f:
+            metadata = json.load(f)
+    except Exception:
+        return False
+    segment_counts_path = segment_counts_path or get_segment_counts_path(std_csv_path)
+    return (metadata.get('schema_version') == STORE_SCHEMA_VERSION
+            and metadata.get('source') == _file_fingerprint(std_csv_path)
+            and metadata.get('segment_counts_source') == _file_fingerprint(segment_counts_path))
+
+
+def load_agreement_store(store_dir, mmap=True):
+    """
+    Opens an agreement store.
+
+    Args:
+        store_dir (str): Store directory written by build_agreement_store().
+        mmap (bool): Memory-map the agreement matrix instead of reading it into memory.
+
+    Returns:
+        dict: {
+            'agreement': float64 array (responses x segments),
+            'rows': DataFrame of row metadata,
+            'segments': DataFrame with Column, Core Name, O-Code,
+            'segment_sizes': DataFrame (Question ID x segment column) of participant counts,
+            'metadata': the raw metadata dictionary,
+        }
+    """
+    with open(os.path.join(store_dir, METADATA_FILENAME), encoding='utf-8') as f:
+        metadata = json.load(f)
+    mmap_mode = 'r' if mmap else None
+    agreement = np.load(os.path.join(store_dir, AGREEMENT_FILENAME), mmap_mode=mmap_mode)
+    segment_sizes = np.load(os.path.join(store_dir, SEGMENT_SIZES_FILENAME), mmap_mode=mmap_mode)
+    rows = pd.read_parquet(os.path.join(store_dir, ROWS_FILENAME))
+
+    segments = _segments_frame(metadata)
+    segment_columns = segments['Column'].tolist()
+    return {
+        'agreement': agreement,
+        'rows': rows,
+        'segments': segments,
+        'segment_sizes': pd.DataFrame(
+            segment_sizes, index=pd.Index(metadata['question_ids'], name='Question ID'), columns=segment_columns
+        ),
+        'metadata': metadata,
+    }
+
+
+def open_agreement_store(std_csv_path, segment_counts_path=None, build=True):
+    """
+    Opens the store for a standardized CSV, (re)building it first if it is missing or stale.
+
+    Returns:
+        dict: As load_agreement_store(), or None if no usable store is available.
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    store_dir = get_store_dir(std_csv_path)
+    if not is_store_current(store_dir, std_csv_path, segment_counts_path):
+        if not build:
+            return None
+        logging.info(f"Agreement store missing or out of date for {std_csv_path}; building it.")
+        if build_agreement_store(std_csv_path, segment_counts_path, store_dir) is None:
+            return None
+    try:
+        return load_agreement_store(store_dir)
+    except Exception as e:
+        logging.warning(f"Could not open agreement store {store_dir}: {e}")
+        return None
+
+
+def store_to_standardized_df(store, segment_columns=None):
+    """
+    Rebuilds the standardized aggregate as a DataFrame from a store.
+
+    Same row order as the CSV, but segment columns hold parsed float64
+    agreement rates (0-1, NaN for no data) instead of percent strings. Only
+    the requested segment columns are copied out of the agreement matrix;
+    scripts that need the rates of every segment should read the matrix
+    itself (iter_store_blocks) rather than a full copy.
+
+    Args:
+        store (dict): As returned by load_agreement_store() or load_standardized_store().
+        segment_columns (list): Segment columns to include (unknown names are skipped);
+                                all of them by default.
+
+    Returns:
+        pd.DataFrame: The row metadata and the selected segment columns, in CSV column order.
+    """
+    all_segment_columns = get_store_segment_columns(store)
+    wanted = set(all_segment_columns if segment_columns is None else segment_columns)
+    selected = [i for i, col in enumerate(all_segment_columns) if col in wanted]
+    rates = pd.DataFrame(np.asarray(store['agreement'])[:, selected],
+                         columns=[all_segment_columns[i] for i in selected], index=store['rows'].index)
+    combined = pd.concat([store['rows'], rates], axis=1)
+    return combined[[col for col in store['metadata']['columns'] if col in combined.columns]]
+
+
+def iter_store_blocks(store, chunksize=None):
+    """
+    Splits a store into blocks of consecutive rows for scoring.
+
+    Slices of a memory-mapped agreement matrix are views, so a block's rates
+    are only read from disk when a scorer indexes into them.
+
+    Args:
+        store (dict): As returned by load_agreement_store() or load_standardized_store().
+        chunksize (int): Rows per block; one block with every row if not given.
+
+    Yields:
+        tuple: (rows, agreement) - the block's row metadata, indexed by row position
+               in the standardized CSV, and the matching rows of the agreement matrix.
+    """
+    num_rows = len(store['rows'])
+    step = chunksize or max(num_rows, 1)
+    for start in range(0, num_rows, step):
+        yield store['rows'].iloc[start:start + step], store['agreement'][start:start + step]
+
+
+def block_rates(rows, agreement, positions, column_idx):
+    """
+    Agreement rates of some rows and segments of a block from iter_store_blocks().
+
+    Args:
+        rows (pd.DataFrame): The block's row metadata.
+        agreement (np.ndarray): The block's agreement rows.
+        positions (array-like): Row positions in the standardized CSV (e.g. a question group's index).
+        column_idx (list): Indices of the wanted segment columns.
+
+    Returns:
+        np.ndarray: float64 rates (len(positions) x len(column_idx)).
+    """
+    offsets = np.asarray(positions, dtype=np.int64) - (rows.index[0] if len(rows) else 0)
+    return np.asarray(agreement[np.ix_(offsets, np.asarray(column_idx, dtype=np.int64))], dtype=np.float64)
+
+
+def store_to_long_agreement(store):
+    """
+    Converts a store into the long-format agreement table and its code dictionaries.
+
+    Only populated cells become rows, ordered by response then segment.
+
+    Returns:
+        dict: {'agreement', 'questions', 'responses', 'segments'} DataFrames (see module docstring).
+    """
+    agreement = np.asarray(store['agreement'])
+    rows = store['rows']
+    question_ids = store['metadata']['question_ids']
+    segment_sizes = np.asarray(store['segment_sizes'])
+
+    question_codes = pd.Index(question_ids).get_indexer(rows['Question ID'].astype(str)).astype(np.int32)
+    response_codes, segment_codes = np.nonzero(~np.isnan(agreement))
+    cell_question_codes = question_codes[response_codes]
+    sizes = segment_sizes[cell_question_codes, segment_codes] if len(question_ids) else np.full(len(response_codes), np.nan, dtype=np.float32)
+
+    long_df = pd.DataFrame({
+        'question_code': cell_question_codes,
+        'response_code': response_codes.astype(np.int32),
+        'segment_code': segment_codes.astype(np.int32),
+        'agreement': agreement[response_codes, segment_codes].astype(np.float32),
+        'segment_n': pd.array(sizes, dtype='Float32').astype('Int32'), # NaN (unknown size) -> <NA>
+    })
+
+    question_columns = [col for col in LONG_QUESTION_COLUMNS if col in rows.columns]
+    questions = rows[question_columns].assign(**{'Question ID': rows['Question ID'].astype(str)})
+    questions = questions.drop_duplicates('Question ID').reset_index(drop=True)
+    questions.insert(0, 'question_code', np.arange(len(questions), dtype=np.int32))
+
+    responses = rows.drop(columns=question_columns)
+    responses.insert(0, 'question_code', question_codes)
+    responses.insert(0, 'response_code', np.arange(len(rows), dtype=np.int32))
+
+    segments = store['segments'].copy()
+    segments.insert(0, 'segment_code', np.arange(len(segments), dtype=np.int32))
+
+    return {'agreement': long_df, 'questions': questions, 'responses': responses, 'segments': segments}
+
+
+def write_long_agreement_table(store_dir, output_dir):
+    """
+    Writes the long-format agreement table and code dictionaries for a store.
+
+    Args:
+        store_dir (str): Store directory written by build_agreement_store().
+        output_dir (str): Destination directory (replaced atomically).
+
+    Returns:
+        str: The output directory, or None if it could not be written.
+    """
+    if not PYARROW_AVAILABLE:
+        logging.warning("pyarrow is not installed; skipping long-format agreement table.")
+        return None
+    start = time.perf_counter()
+    tmp_dir = f"{output_dir}.tmp"
+    try:
+        tables = store_to_long_agreement(load_agreement_store(store_dir))
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        tables['agreement'].to_parquet(os.path.join(tmp_dir, LONG_AGREEMENT_FILENAME), index=False)
+        tables['responses'].to_parquet(os.path.join(tmp_dir, LONG_RESPONSES_FILENAME), index=False)
+        tables['questions'].to_csv(os.path.join(tmp_dir, LONG_QUESTIONS_FILENAME), index=False)
+        tables['segments'].to_csv(os.path.join(tmp_dir, LONG_SEGMENTS_FILENAME), index=False)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        os.replace(tmp_dir, output_dir)
+    except Exception as e:
+        logging.error(f"Error writing long-format agreement table to {output_dir}: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+    logging.info(f"Wrote long-format agreement table {output_dir} ({len(tables['agreement'])} cells) "
+                 f"in {time.perf_counter() - start:.2f}s")
+    return output_dir
+
+
+def load_long_agreement_table(long_dir, with_dictionaries=True):
+    """
+    Reads a long-format agreement table written by write_long_agreement_table().
+
+    Returns:
+        dict: {'agreement': DataFrame} plus 'questions', 'responses' and 'segments' if with_dictionaries.
+    """
+    tables = {'agreement': pd.read_parquet(os.path.join(long_dir, LONG_AGREEMENT_FILENAME))}
+    if with_dictionaries:
+        tables['questions'] = pd.read_csv(os.path.join(long_dir, LONG_QUESTIONS_FILENAME), dtype={'Question ID': str})
+        tables['responses'] = pd.read_parquet(os.path.join(long_dir, LONG_RESPONSES_FILENAME))
+        tables['segments'] = pd.read_csv(os.path.join(long_dir, LONG_SEGMENTS_FILENAME))
+    return tables
+
+
+def get_typed_standardized_path(std_csv_path):
+    """Typed columnar copy of a standardized CSV: same path with a .parquet extension."""
+    return os.path.splitext(std_csv_path)[0] + '.parquet'
+
+
+def to_typed_standardized_frame(std_df):
+    """
+    Casts a standardized aggregate read from CSV to compact explicit dtypes.
+
+    Segment columns become float64 agreement rates (0-1, NaN for no data; the
+    values the agreement store holds, so analyses match whichever is read), the
+    TYPED_CATEGORICAL_COLUMNS become categoricals, integer-valued base columns
+    (e.g. Star) become nullable Int32, and other text is left as read.
+    """
+    typed = std_df.copy()
+    segment_columns = [col for col in typed.columns if col not in STANDARDIZED_BASE_COLUMNS]
+    if segment_columns:
+        typed[segment_columns] = parse_percentage_columns(typed[segment_columns]).astype(np.float64)
+    for col in [c for c in typed.columns if c in STANDARDIZED_BASE_COLUMNS]:
+        if col in TYPED_CATEGORICAL_COLUMNS:
+            typed[col] = typed[col].astype('category')
+            continue
+        numbers = pd.to_numeric(typed[col], errors='coerce')
+        present = typed[col].notna()
+        if present.any() and numbers[present].notna().all() and (numbers[present] % 1 == 0).all():
+            typed[col] = numbers.astype('Int32')
+    return typed
+
+
+def write_typed_standardized(std_csv_path, output_path=None):
+    """
+    Writes the typed columnar copy of a standardized aggregate CSV.
+
+    Args:
+        std_csv_path (str): Path to GD<N>_aggregate_standardized.csv.
+        output_path (str): Destination (default: get_typed_standardized_path(std_csv_path)).
+
+    Returns:
+        str: The output path, or None if pyarrow is unavailable or writing failed.
+    """
+    if not PYARROW_AVAILABLE:
+        logging.warning("pyarrow is not installed; skipping typed standardized output.")
+        return None
+    output_path = output_path or get_typed_standardized_path(std_csv_path)
+    start = time.perf_counter()
+    try:
+        typed = to_typed_standardized_frame(pd.read_csv(std_csv_path, low_memory=False))
+        tmp_path = f"{output_path}.tmp"
+        typed.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, output_path)
+    except Exception as e:
+        logging.error(f"Error writing typed standardized data to {output_path}: {e}")
+        return None
+    logging.info(f"Wrote typed standardized data {output_path} ({typed.shape[0]} rows x {typed.shape[1]} columns) "
+                 f"in {time.perf_counter() - start:.2f}s")
+    return output_path
+
+
+def read_typed_standardized(std_csv_path):
+    """
+    Reads the typed columnar copy of a standardized CSV if it exists and is not older than the CSV.
+
+    Returns:
+        pd.DataFrame or None if there is no usable typed file.
+    """
+    typed_path = get_typed_standardized_path(std_csv_path)
+    if not PYARROW_AVAILABLE or not os.path.exists(typed_path):
+        return None
+    if os.path.exists(std_csv_path) and os.path.getmtime(typed_path) < os.path.getmtime(std_csv_path):
+        logging.info(f"Typed standardized file {typed_path} is older than the CSV; ignoring it.")
+        return None
+    try:
+        # Convert column by column, freeing Arrow buffers as they are copied, and hand
+        # the freed memory back so the table does not linger next to the DataFrame
+        df = pq.read_table(typed_path).to_pandas(self_destruct=True, split_blocks=True)
+        pyarrow.default_memory_pool().release_unused()
+        return df
+    except Exception as e:
+        logging.warning(f"Could not read typed standardized file {typed_path}: {e}")
+        return None
+
+
+def load_standardized_store(std_csv_path, segment_counts_path=None):
+    """
+    Opens the agreement store for a standardized CSV, building it on first use.
+
+    Without a usable store (e.g. pyarrow missing, or the data directory is
+    read-only) the typed Parquet copy, or else the CSV, is parsed into the
+    same structure in memory.
+
+    Returns:
+        dict: As load_agreement_store(), or None if the CSV cannot be read.
+    """
+    store = open_agreement_store(std_csv_path, segment_counts_path)
+    if store is not None:
+        logging.info(f"Opened agreement store for {std_csv_path} ({store['agreement'].shape[0]} rows x "
+                     f"{store['agreement'].shape[1]} segments)")
+        return store
+    segment_counts_path = segment_counts_path or get_segment_counts_path(std_csv_path)
+
+    df = read_typed_standardized(std_csv_path)
+    if df is not None:
+        logging.info(f"Loaded typed standardized data for {std_csv_path} with shape: {df.shape}")
+        return standardized_df_to_store(df, segment_counts_path)
+
+    logging.info(f"Loading standardized data from: {std_csv_path}")
+    try:
+        df = pd.read_csv(std_csv_path, low_memory=False)
+        logging.info(f"Loaded standardized data with shape: {df.shape}")
+    except FileNotFoundError:
+        logging.error(f"Standardized data file not found: {std_csv_path}")
+        return None
+    except Exception as e:
+        logging.error(f"Error loading standardized data: {e}")
+        return None
+    return standardized_df_to_store(df, segment_counts_path)
+
+
+def load_standardized_frame(std_csv_path, segment_counts_path=None, segment_columns=None):
+    """
+    Loads the standardized aggregate as a DataFrame, via load_standardized_store().
+
+    Segment columns hold float agreement rates (0-1, NaN for no data);
+    parse_percentage_series passes them through unchanged.
+
+    Args:
+        std_csv_path (str): Path to GD<N>_aggregate_standardized.csv.
+        segment_counts_path (str): Segment counts file (default: next to the CSV).
+        segment_columns (list): Segment columns to load (default: all).
+
+    Returns:
+        pd.DataFrame or None if the CSV cannot be read.
+    """
+    store = load_standardized_store(std_csv_path, segment_counts_path)
+    if store is None:
+        return None
+    df = store_to_standardized_df(store, segment_columns)
+    logging.info(f"Loaded standardized data with shape: {df.shape}")
+    return df
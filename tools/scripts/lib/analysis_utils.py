@@ -4,56 +4,203 @@ import logging
 import re # For parsing segment columns
 import numpy as np
 import os # For commonprefix in segment parsing helper
+import math
+
+try:
+    from scipy.special import erfc as _erfc
+except ImportError: # scipy is optional; fall back to the standard library per element
+    _erfc = np.vectorize(math.erfc, otypes=[float])
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# TODO: Define utility functions (e.g., load_data, parse_percentage, etc.)
+# TODO: Define utility functions (e.g., load_data, etc.)
 
 def load_standardized_data(csv_path):
-    """Loads the standardized aggregate CSV into a pandas DataFrame."""
-    logging.info(f"Loading standardized data from: {csv_path}")
-    try:
-        df = pd.read_csv(csv_path, low_memory=False)
-        logging.info(f"Successfully loaded dataframe with shape: {df.shape}")
-        # Basic validation - check for expected columns
-        expected_cols = ["Question ID", "Question Type", "Question", "Responses"]
-        # Removed Participant ID as it might not be present after standardization if only aggregate matters
-        missing_cols = [col for col in expected_cols if col not in df.columns]
-        if missing_cols:
-            logging.warning(f"Standardized CSV missing expected columns: {missing_cols}")
-        return df
-    except FileNotFoundError:
-        logging.error(f"Standardized data file not found: {csv_path}")
-        return None
-    except Exception as e:
-        logging.error(f"Error loading standardized data from {csv_path}: {e}")
-        return None
-
-def parse_percentage(value):
-    """Converts percentage strings ('X%') or ' - ' or empty to floats (0.X or NA)."""
-    if isinstance(value, str):
-        value = value.strip()
-        if value == '-' or value == '':
-            return pd.NA
-        if value.endswith('%'):
-            try:
-                return float(value[:-1]) / 100.0
-            except ValueError:
-                return pd.NA
-    elif pd.isna(value):
-        return pd.NA
-    # Handle potential numeric values that might be 0-100 instead of 0-1
+    """
+    Loads the standardized aggregate into a pandas DataFrame.
+
+    Kept for existing callers; same as agreement_store.load_standardized_frame(csv_path)
+    (agreement store, else typed Parquet copy, else CSV; segment columns as float rates).
+    """
+    from lib.agreement_store import load_standardized_frame # Imported here: agreement_store imports this module
+    return load_standardized_frame(csv_path)
+
+def parse_percentage_series(values):
+    """
+    Converts a column of agreement values into float rates (0-1), vectorized.
+
+    This is the single percentage parser for all scripts. Semantics, per cell:
+        - Missing values (NaN, None, pd.NA), empty strings and '-' (any surrounding
+          whitespace) -> NaN.
+        - Strings ending in '%' ('67%', ' 67.5 % ') -> number / 100, with no range check.
+        - Other numbers, including numeric strings without '%':
+            0 <= v <= 1    -> v (already a fraction)
+            1 < v <= 100   -> v / 100 (a percentage without the sign)
+            otherwise      -> NaN
+        - Anything else (unparseable text) -> NaN.
+
+    Numeric columns (e.g. from the agreement store) are converted with array
+    operations. Other columns are factorized first, so each distinct string is
+    parsed once (agreement columns hold at most a few thousand distinct values)
+    and the result is broadcast back through the integer codes.
+
+    Args:
+        values (pd.Series or array-like): Raw column values.
+
+    Returns:
+        pd.Series: float64 rates with the input's index and name.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return pd.Series(_percentage_rates(series.to_numpy(dtype=float, na_value=np.nan)),
+                         index=series.index, name=series.name)
+
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    is_percent = text.str.endswith('%').to_numpy(dtype=bool)
+    numbers = np.array([_to_float(v) for v in text.str.removesuffix('%').str.strip()], dtype=float)
+    unique_rates = _percentage_rates(numbers, is_percent)
+
+    # Missing values have code -1, which picks the trailing NaN
+    rates = np.append(unique_rates, np.nan)[codes]
+    return pd.Series(rates, index=series.index, name=series.name)
+
+def _to_float(text):
+    """float(text), or NaN if it is not a number."""
     try:
-        numeric_val = float(value)
-        if 1 < numeric_val <= 100:
-             return numeric_val / 100.0
-        elif 0 <= numeric_val <= 1:
-             return numeric_val
-        else: # Handle unexpected numeric ranges if necessary
-            return pd.NA
-    except (ValueError, TypeError):
-         return pd.NA
+        return float(text)
+    except ValueError:
+        return np.nan
+
+def _percentage_rates(numbers, is_percent=None):
+    """Applies the percentage rules of parse_percentage_series to parsed numbers."""
+    with np.errstate(invalid='ignore'):
+        rates = np.where((numbers >= 0) & (numbers <= 1), numbers, np.nan)
+        rates = np.where((numbers > 1) & (numbers <= 100), numbers / 100.0, rates)
+        if is_percent is not None:
+            rates = np.where(is_percent, numbers / 100.0, rates)
+    return rates
+
+def parse_percentage_columns(df):
+    """Applies parse_percentage_series to every column of a DataFrame."""
+    return df.apply(parse_percentage_series)
+
+def calculate_percentile_minimums(rates, percentiles):
+    """
+    Computes percentile minimums for every row of a responses x segments matrix at once.
+
+    For percentile p, the value is the minimum agreement reached by the top p% of a
+    row's valid (non-NaN) segments: the k-th highest rate, with
+    k = max(1, min(n, ceil(n * p / 100))) and n the number of valid segments.
+    All percentiles come from a single sort of the matrix, so the grid can be any
+    length without extra passes.
+
+    Args:
+        rates (array-like): Float matrix (responses x segments), NaN for missing.
+        percentiles (list): Percentiles to compute (e.g., [100, 95, 90]). p == 0 yields NaN.
+
+    Returns:
+        tuple: (num_valid, values)
+               - num_valid: int array (responses,) of non-NaN segment counts per row.
+               - values: float array (responses x len(percentiles)); NaN for rows without valid rates.
+    """
+    rates = np.asarray(rates, dtype=float)
+    percentiles = np.asarray(percentiles, dtype=float)
+    num_valid = np.sum(~np.isnan(rates), axis=1)
+
+    # Ascending sort puts NaNs last, so the k-th highest valid rate is at position n - k
+    sorted_rates = np.sort(rates, axis=1)
+    k = np.ceil(num_valid[:, None] * percentiles[None, :] / 100.0)
+    k = np.clip(k, 1, np.maximum(num_valid, 1)[:, None]).astype(np.int64)
+    positions = np.maximum(num_valid[:, None] - k, 0)
+    values = np.take_along_axis(sorted_rates, positions, axis=1) if rates.shape[1] else \
+        np.full((rates.shape[0], len(percentiles)), np.nan)
+
+    values[:, percentiles == 0] = np.nan
+    values[num_valid == 0] = np.nan
+    return num_valid, values
+
+def calculate_family_eta_squared(rates, sizes, family_codes, num_families):
+    """
+    Eta-squared of agreement by segment family (O-code) for every response at once.
+
+    Each segment of a family is treated as a group of n participants of whom a
+    share p agree, so for one response and family:
+        SS_between = sum n_s (p_s - p_f)^2     (p_f: size-weighted family mean)
+        SS_within  = sum n_s p_s (1 - p_s)
+        eta^2      = SS_between / (SS_between + SS_within)
+    i.e. the share of the participant-level agreement variance explained by
+    which segment of the family a participant is in. All families are reduced
+    together with one-hot matrix products over the segment axis.
+
+    Args:
+        rates (np.ndarray): Float matrix (responses x segments) of agreement rates (0-1), NaN for missing.
+        sizes (np.ndarray): Matrix (responses x segments) of segment participant counts; NaN or <= 0 excludes a cell.
+        family_codes (array-like): Family index per segment (0..num_families-1), -1 for segments in no family.
+        num_families (int): Number of families.
+
+    Returns:
+        tuple: (eta_squared, segments_used)
+               - eta_squared: float matrix (responses x families); NaN where a family has fewer
+                 than two segments with data or no variance at all.
+               - segments_used: int matrix (responses x families) of segments with data.
+    """
+    rates = np.asarray(rates, dtype=float)
+    sizes = np.asarray(sizes, dtype=float)
+    family_codes = np.asarray(family_codes)
+    one_hot = np.zeros((len(family_codes), num_families))
+    in_family = np.flatnonzero(family_codes >= 0)
+    one_hot[in_family, family_codes[in_family]] = 1.0
+
+    with np.errstate(invalid='ignore'):
+        usable = ~np.isnan(rates) & (sizes > 0) # NaN sizes compare False
+    weights = np.where(usable, sizes, 0.0)
+    filled = np.where(usable, rates, 0.0)
+
+    n = weights @ one_hot
+    agree = (weights * filled) @ one_hot
+    agree_sq = (weights * filled * filled) @ one_hot
+    segments_used = np.rint(usable.astype(float) @ one_hot).astype(np.int64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_term = agree * agree / n
+        ss_between = np.maximum(agree_sq - mean_term, 0.0)
+        ss_total = agree - mean_term # = n * p_f * (1 - p_f)
+        eta_squared = np.where((segments_used >= 2) & (ss_total > 0), ss_between / ss_total, np.nan)
+    return np.minimum(eta_squared, 1.0), segments_used
+
+def two_sided_normal_p_values(z):
+    """Two-sided p-values P(|Z| >= |z|) for standard normal z-scores (NaN stays NaN, inf gives 0)."""
+    z = np.abs(np.asarray(z, dtype=float))
+    p = np.full(z.shape, np.nan)
+    finite = np.isfinite(z)
+    p[finite] = _erfc(z[finite] / math.sqrt(2.0))
+    p[np.isposinf(z)] = 0.0
+    return p
+
+def benjamini_hochberg(p_values):
+    """
+    Benjamini-Hochberg false-discovery-rate adjustment.
+
+    Args:
+        p_values (array-like): p-values of one family of tests; NaN entries are ignored.
+
+    Returns:
+        np.ndarray: Adjusted p-values (q-values) in the input order, NaN where the input is NaN.
+    """
+    p_values = np.asarray(p_values, dtype=float)
+    q_values = np.full(p_values.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    if len(valid) == 0:
+        return q_values
+
+    # q_(i) = min over j >= i of p_(j) * m / j, in ascending p order
+    order = valid[np.argsort(p_values[valid], kind='stable')]
+    m = len(order)
+    scaled = p_values[order] * m / np.arange(1, m + 1)
+    q_values[order] = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+    return q_values
 
 def get_segment_columns(header_row):
     """
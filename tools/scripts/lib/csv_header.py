@@ -0,0 +1,119 @@
+"""
+Header sniffing for raw Remesh CSV exports.
+
+Exports start with a preamble of metadata rows (e.g. "Question IDs,<uuid>")
+before the real column header. find_csv_header() reads only the first
+SNIFF_BYTES of a file, once, as bytes; detects the encoding (UTF-8 with or
+without BOM, else Latin-1); and locates the header row by its column markers.
+It returns the encoding and the header's byte offset, so callers can seek
+straight to the header (open_at_header) instead of re-reading and re-parsing
+the preamble.
+"""
+
+import codecs
+import csv
+import io
+from collections import namedtuple
+
+SNIFF_BYTES = 256 * 1024
+
+# encoding: codec to read the file with; offset: byte offset of the header line;
+# line_index: 0-based physical line of the header; columns: stripped header fields;
+# preamble: parsed rows before the header
+CsvHeader = namedtuple('CsvHeader', ['encoding', 'offset', 'line_index', 'columns', 'preamble'])
+
+
+def sniff_encoding(data, final=False):
+    """
+    Detects the encoding of the start of a file.
+
+    Args:
+        data (bytes): Leading bytes of the file (may end mid-character unless final).
+        final (bool): data is the whole file, so a trailing partial character is invalid.
+
+    Returns:
+        str: 'utf-8-sig' if there is a BOM, 'utf-8' if the bytes decode as UTF-8, else 'latin1'.
+    """
+    if data.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(data, final=final)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        return 'latin1'
+
+
+def _iter_sniffed_lines(path, sniff_bytes):
+    """Yields (encoding, line_index, offset, fields) for the complete lines in the first sniff_bytes of a file."""
+    with open(path, 'rb') as f:
+        data = f.read(sniff_bytes)
+        at_eof = not f.read(1)
+    encoding = sniff_encoding(data, final=at_eof)
+    offset = len(codecs.BOM_UTF8) if encoding == 'utf-8-sig' else 0
+    text_encoding = 'utf-8' if encoding == 'utf-8-sig' else encoding
+    lines = data[offset:].splitlines(keepends=True)
+    if lines and not at_eof and not lines[-1].endswith((b'\n', b'\r')):
+        lines.pop() # Cut off by the sniff window
+    for line_index, line in enumerate(lines):
+        text = line.decode(text_encoding, errors='replace')
+        fields = next(csv.reader([text]), [])
+        yield encoding, line_index, offset, fields
+        offset += len(line)
+
+
+def find_csv_header(path, markers=None, predicate=None, start_line=0, sniff_bytes=SNIFF_BYTES):
+    """
+    Locates the column header of a CSV export by its markers.
+
+    Args:
+        path (str or Path): CSV file.
+        markers (list): Column names that must all appear in the header row (after stripping whitespace).
+        predicate (callable): Alternative test, called with the stripped fields of each row.
+        start_line (int): First physical line to consider (for files with several sections).
+        sniff_bytes (int): How much of the file to inspect.
+
+    Returns:
+        CsvHeader, or None if no row in the sniffed window matches.
+    """
+    if predicate is None:
+        required = list(markers or [])
+        predicate = lambda columns: all(marker in columns for marker in required)
+    preamble = []
+    for encoding, line_index, offset, fields in _iter_sniffed_lines(path, sniff_bytes):
+        columns = [field.strip() for field in fields]
+        if line_index >= start_line and len(columns) > 1 and predicate(columns):
+            return CsvHeader(encoding, offset, line_index, columns, preamble)
+        preamble.append(fields)
+    return None
+
+
+def csv_line_at(path, line_index, sniff_bytes=SNIFF_BYTES):
+    """
+    Treats a fixed physical line as the header (for exports with a known layout).
+
+    Returns:
+        CsvHeader, or None if the line is not within the sniffed window.
+    """
+    preamble = []
+    for encoding, index, offset, fields in _iter_sniffed_lines(path, sniff_bytes):
+        if index == line_index:
+            return CsvHeader(encoding, offset, index, [field.strip() for field in fields], preamble)
+        preamble.append(fields)
+    return None
+
+
+def open_at_header(path, header, newline=None):
+    """
+    Opens a CSV as text positioned at its header line.
+
+    Args:
+        path (str or Path): CSV file.
+        header (CsvHeader): From find_csv_header() or csv_line_at().
+        newline: As for open(); use '' when passing the file to the csv module.
+
+    Returns:
+        io.TextIOWrapper: Caller closes it.
+    """
+    raw = open(path, 'rb')
+    raw.seek(header.offset)
+    return io.TextIOWrapper(raw, encoding=header.encoding, newline=newline)
@@ -0,0 +1,290 @@
+"""
+Near-duplicate detection for free-text responses using MinHash / LSH.
+
+Texts are normalized, split into character shingles, and summarized by a
+MinHash signature. Locality-sensitive hashing over signature bands proposes
+candidate pairs in roughly linear time; candidates are confirmed by their
+estimated Jaccard similarity and merged into clusters with a vectorized
+union-find. Everything runs on numpy arrays so a round of ~1M thoughts can be
+processed on a laptop.
+"""
+
+import re
+import numpy as np
+import pandas as pd
+
+# --- Defaults ---
+DEFAULT_SHINGLE_SIZE = 5        # Character k-grams
+DEFAULT_NUM_PERM = 64           # MinHash signature length
+DEFAULT_BANDS = 16              # LSH bands (rows per band = NUM_PERM / BANDS)
+DEFAULT_THRESHOLD = 0.8         # Min estimated Jaccard to call two texts near-duplicates
+DEFAULT_MIN_CHARS = 20          # Shorter normalized texts are ignored (generic short answers)
+DEFAULT_CHUNK_SIZE = 20000      # Documents hashed per chunk (bounds memory)
+DEFAULT_MAX_NEIGHBORS = 32      # Bucket mates each document is verified against per band
+DEFAULT_SEED = 42
+
+_NON_WORD_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_text(text):
+    """Lowercase, drop punctuation/zero-width characters and collapse whitespace."""
+    if not isinstance(text, str):
+        return ''
+    return _NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+def _shingle_hashes(texts, shingle_size):
+    """
+    Hash every character k-gram of every text in one vectorized pass.
+
+    Args:
+        texts: List of normalized strings (all non-empty).
+        shingle_size: Length k of the character shingles.
+
+    Returns:
+        Tuple (hashes, starts): uint64 shingle hashes laid out document by
+        document, and the index where each document's shingles begin (for
+        np.minimum.reduceat).
+    """
+    encoded = [t.encode('utf-8') for t in texts]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    # Texts shorter than k become a single (padded) shingle
+    padded_lengths = np.maximum(lengths, shingle_size)
+    buf = np.zeros(int(padded_lengths.sum()), dtype=np.uint64)
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(padded_lengths, out=offsets[1:])
+    flat = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    # Scatter bytes into their (possibly padded) slots
+    doc_of_byte = np.repeat(np.arange(len(encoded)), lengths)
+    pos_in_doc = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    buf[offsets[:-1][doc_of_byte] + pos_in_doc] = flat
+
+    # Polynomial rolling hash of each window, computed with k vector ops
+    n_windows = len(buf) - shingle_size + 1
+    hashes = np.zeros(max(n_windows, 0), dtype=np.uint64)
+    base = np.uint64(1099511628211)
+    for j in range(shingle_size):
+        hashes = hashes * base + buf[j:j + n_windows] + np.uint64(1)
+
+    # Keep only windows that start and end inside one document
+    shingles_per_doc = padded_lengths - shingle_size + 1
+    starts = offsets[:-1]
+    keep = _window_index(starts, shingles_per_doc)
+    new_starts = np.zeros(len(shingles_per_doc), dtype=np.int64)
+    np.cumsum(shingles_per_doc[:-1], out=new_starts[1:])
+    return hashes[keep], new_starts
+
+
+def _window_index(starts, counts):
+    """Flat indices [s, s+c) for every (start, count) pair without a Python loop."""
+    total = int(counts.sum())
+    group_starts = np.repeat(starts, counts)
+    within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return group_starts + within
+
+
+def _permutation_params(num_perm, seed):
+    """Random odd multipliers and offsets for the multiply-shift hash family."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def compute_minhash_signatures(texts, num_perm=DEFAULT_NUM_PERM, shingle_size=DEFAULT_SHINGLE_SIZE,
+                               chunk_size=DEFAULT_CHUNK_SIZE, seed=DEFAULT_SEED):
+    """
+    Compute MinHash signatures for a list of normalized texts.
+
+    Args:
+        texts: List of normalized, non-empty strings.
+        num_perm: Number of hash functions (signature length).
+        shingle_size: Character shingle length.
+        chunk_size: Number of documents processed at once.
+        seed: Seed for the hash family (fixed so runs are reproducible).
+
+    Returns:
+        uint32 array of shape (len(texts), num_perm).
+    """
+    a, b = _permutation_params(num_perm, seed)
+    shift = np.uint64(32)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for chunk_start in range(0, len(texts), chunk_size):
+        chunk = texts[chunk_start:chunk_start + chunk_size]
+        hashes, starts = _shingle_hashes(chunk, shingle_size)
+        permuted = np.empty_like(hashes)
+        for i in range(num_perm):
+            # h_i(x) = (a_i * x + b_i) >> 32, computed in place with uint64 wraparound
+            np.multiply(hashes, a[i], out=permuted)
+            np.add(permuted, b[i], out=permuted)
+            np.right_shift(permuted, shift, out=permuted)
+            signatures[chunk_start:chunk_start + len(chunk), i] = np.minimum.reduceat(permuted, starts)
+    return signatures
+
+
+def _connected_components(n, edges_u, edges_v):
+    """Label connected components with vectorized min-label propagation."""
+    labels = np.arange(n)
+    if len(edges_u) == 0:
+        return labels
+    while True:
+        pair_min = np.minimum(labels[edges_u], labels[edges_v])
+        new_labels = labels.copy()
+        np.minimum.at(new_labels, edges_u, pair_min)
+        np.minimum.at(new_labels, edges_v, pair_min)
+        # Pointer jumping to shortcut long chains
+        new_labels = new_labels[new_labels]
+        if np.array_equal(new_labels, labels):
+            return labels
+        labels = new_labels
+
+
+def find_near_duplicate_clusters(signatures, bands=DEFAULT_BANDS, threshold=DEFAULT_THRESHOLD,
+                                 max_neighbors=DEFAULT_MAX_NEIGHBORS):
+    """
+    Group documents whose MinHash signatures collide in at least one LSH band
+    and whose estimated Jaccard similarity reaches `threshold`.
+
+    Clusters are the connected components of verified pairs (single linkage):
+    two documents are only linked directly if their own estimated similarity
+    reaches the threshold, never just because they share a bucket. Within a
+    bucket every document is compared with its next `max_neighbors` mates (in
+    index order), so buckets of up to max_neighbors + 1 documents are checked
+    exhaustively and larger ones with a bounded number of pairs per document.
+
+    Args:
+        signatures: Integer array (n_docs, num_perm) from compute_minhash_signatures().
+        bands: Number of LSH bands; num_perm must be divisible by it.
+        threshold: Minimum estimated Jaccard similarity for a confirmed pair.
+        max_neighbors: Bucket mates each document is verified against per band.
+
+    Returns:
+        Integer array of cluster labels (the smallest member index of each cluster).
+    """
+    n_docs, num_perm = signatures.shape
+    if num_perm % bands != 0:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    rows = num_perm // bands
+    mix = np.random.default_rng(DEFAULT_SEED + 1).integers(1, 1 << 63, size=rows, dtype=np.uint64) | np.uint64(1)
+
+    pair_keys = []
+    for band in range(bands):
+        block = signatures[:, band * rows:(band + 1) * rows]
+        keys = (block.astype(np.uint64) * mix).sum(axis=1)  # uint64 wraparound hash of the band
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        is_new_bucket = np.ones(n_docs, dtype=bool)
+        is_new_bucket[1:] = sorted_keys[1:] != sorted_keys[:-1]
+        bucket_id = np.cumsum(is_new_bucket)
+        largest_bucket = int(np.bincount(bucket_id).max()) if n_docs else 0
+        # Pair each sorted position with the next d positions of the same bucket
+        for d in range(1, min(largest_bucket - 1, max_neighbors) + 1):
+            same_bucket = bucket_id[d:] == bucket_id[:-d]
+            u, v = order[:-d][same_bucket], order[d:][same_bucket]
+            pair_keys.append(np.minimum(u, v).astype(np.int64) * n_docs + np.maximum(u, v))
+
+    if not pair_keys:
+        return np.arange(n_docs)
+
+    # The same pair usually collides in several bands; verify it once
+    keys = np.sort(np.concatenate(pair_keys))
+    keys = keys[np.r_[True, keys[1:] != keys[:-1]]] if len(keys) else keys
+    edge_u, edge_v = keys // n_docs, keys % n_docs
+    confirmed = np.zeros(len(keys), dtype=bool)
+    for start in range(0, len(keys), DEFAULT_CHUNK_SIZE):
+        u, v = edge_u[start:start + DEFAULT_CHUNK_SIZE], edge_v[start:start + DEFAULT_CHUNK_SIZE]
+        confirmed[start:start + DEFAULT_CHUNK_SIZE] = (signatures[u] == signatures[v]).mean(axis=1) >= threshold
+    return _connected_components(n_docs, edge_u[confirmed], edge_v[confirmed])
+
+
+def detect_near_duplicates(verbatim_map_df, text_col='Thought Text', participant_col='Participant ID',
+                           num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS, threshold=DEFAULT_THRESHOLD,
+                           shingle_size=DEFAULT_SHINGLE_SIZE, min_chars=DEFAULT_MIN_CHARS,
+                           chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Assign near-duplicate cluster labels to every thought in a verbatim map.
+
+    Args:
+        verbatim_map_df: DataFrame with at least the text and participant columns.
+        text_col: Column holding the thought text.
+        participant_col: Column holding the author's participant ID.
+        num_perm, bands, threshold, shingle_size, chunk_size: MinHash/LSH parameters.
+        min_chars: Thoughts shorter than this (after normalization) are not clustered.
+
+    Returns:
+        Copy of the input with added columns:
+            'Normalized Length', 'Duplicate Cluster' (-1 when not part of a cluster),
+            'Cluster Size', 'Cluster Participants', 'Within Participant Repeat',
+            'Cross Participant Duplicate'.
+    """
+    df = verbatim_map_df.copy()
+    normalized = df[text_col].map(normalize_text)
+    df['Normalized Length'] = normalized.str.len()
+    eligible = (df['Normalized Length'] >= min_chars).to_numpy()
+
+    df['Duplicate Cluster'] = -1
+    if eligible.sum() > 1:
+        texts = normalized[eligible].tolist()
+        signatures = compute_minhash_signatures(texts, num_perm, shingle_size, chunk_size)
+        labels = find_near_duplicate_clusters(signatures, bands, threshold)
+        df.loc[eligible, 'Duplicate Cluster'] = labels
+
+    clustered = df['Duplicate Cluster'] >= 0
+    grouped = df[clustered].groupby('Duplicate Cluster')
+    df['Cluster Size'] = 0
+    df['Cluster Participants'] = 0
+    df.loc[clustered, 'Cluster Size'] = grouped[text_col].transform('size')
+    df.loc[clustered, 'Cluster Participants'] = grouped[participant_col].transform('nunique')
+
+    # Singletons are not duplicates
+    singleton = clustered & (df['Cluster Size'] < 2)
+    df.loc[singleton, ['Duplicate Cluster', 'Cluster Size', 'Cluster Participants']] = [-1, 0, 0]
+    clustered = df['Duplicate Cluster'] >= 0
+
+    own_count = df[clustered].groupby(['Duplicate Cluster', participant_col])[text_col].transform('size')
+    df['Within Participant Repeat'] = False
+    df.loc[clustered, 'Within Participant Repeat'] = own_count > 1
+    df['Cross Participant Duplicate'] = clustered & (df['Cluster Participants'] > 1)
+    return df
+
+
+def summarize_participant_duplicates(flagged_df, participant_col='Participant ID'):
+    """
+    Per-participant duplicate statistics from the output of detect_near_duplicates().
+
+    Returns:
+        DataFrame with Participant ID, Thought_Count, Self_Duplicate_Ratio
+        (share of own thoughts repeated by the same participant),
+        Shared_Duplicate_Ratio (share that also appears for other participants)
+        and Duplicate_Ratio (share in any near-duplicate cluster).
+    """
+    flags = flagged_df.assign(
+        _any=flagged_df['Duplicate Cluster'] >= 0,
+        _self=flagged_df['Within Participant Repeat'].astype(bool),
+        _shared=flagged_df['Cross Participant Duplicate'].astype(bool),
+    )
+    summary = flags.groupby(participant_col).agg(
+        Thought_Count=('_any', 'size'),
+        Self_Duplicate_Ratio=('_self', 'mean'),
+        Shared_Duplicate_Ratio=('_shared', 'mean'),
+        Duplicate_Ratio=('_any', 'mean'),
+    ).reset_index()
+    return summary
+
+
+def summarize_clusters(flagged_df, text_col='Thought Text', participant_col='Participant ID',
+                       question_col='Question ID'):
+    """One row per near-duplicate cluster with its size, spread and an example text."""
+    clustered = flagged_df[flagged_df['Duplicate Cluster'] >= 0]
+    if clustered.empty:
+        return pd.DataFrame(columns=['Duplicate Cluster', 'Cluster Size', 'Participants',
+                                     'Questions', 'Example Text'])
+    agg = {
+        'Cluster Size': (text_col, 'size'),
+        'Participants': (participant_col, 'nunique'),
+        'Example Text': (text_col, 'first'),
+    }
+    if question_col in clustered.columns:
+        agg['Questions'] = (question_col, 'nunique')
+    summary = clustered.groupby('Duplicate Cluster').agg(**agg).reset_index()
+    return summary.sort_values(['Cluster Size', 'Participants'], ascending=False)
@@ -0,0 +1,156 @@
+"""
+Input-hash manifest for the preprocessing steps of a Global Dialogue round.
+
+Each GD directory keeps a preprocess_manifest.json recording, per step entry
+(e.g. one raw file cleaned by preprocess_cleanup_metadata.py, or one aggregate
+standardized by preprocess_aggregate.py):
+
+    inputs          sha256 of every input file, as read by the step
+    outputs         sha256 of every file (or directory) the step wrote
+    tool_version    sha256 of the code that ran (script plus the lib modules it uses)
+    completed_at    UTC timestamp
+
+A step is up to date when its inputs, outputs and code still hash to the
+recorded values, so rerunning the pipeline skips it; --force reruns anyway.
+Steps that rewrite files in place record the rewritten contents as both
+input and output, which is what the next run sees.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+MANIFEST_FILENAME = 'preprocess_manifest.json'
+MANIFEST_SCHEMA_VERSION = 1
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def get_manifest_path(data_dir):
+    """Manifest location for a GD data directory."""
+    return os.path.join(data_dir, MANIFEST_FILENAME)
+
+
+def hash_file(path):
+    """sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_path(path):
+    """
+    sha256 of a file, or of a directory's files (relative names and contents, sorted).
+
+    Returns:
+        str: Hex digest, or None if the path does not exist.
+    """
+    if os.path.isfile(path):
+        return hash_file(path)
+    if not os.path.isdir(path):
+        return None
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            digest.update(os.path.relpath(file_path, path).encode('utf-8'))
+            digest.update(hash_file(file_path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def hash_paths(paths):
+    """Maps each path to hash_path(path) (None for missing paths)."""
+    return {path: hash_path(path) for path in paths}
+
+
+def code_version(code_paths):
+    """Combined sha256 of the source files that implement a step."""
+    digest = hashlib.sha256()
+    for path in code_paths:
+        digest.update(os.path.basename(path).encode('utf-8'))
+        digest.update(hash_file(path).encode('ascii'))
+    return digest.hexdigest()
+
+
+def load_manifest(manifest_path):
+    """Reads a manifest, or returns an empty one if it is missing, unreadable or from another schema."""
+    empty = {'schema_version': MANIFEST_SCHEMA_VERSION, 'steps': {}}
+    if not os.path.exists(manifest_path):
+        return empty
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable preprocess manifest {manifest_path}: {e}")
+        return empty
+    if manifest.get('schema_version') != MANIFEST_SCHEMA_VERSION:
+        return empty
+    manifest.setdefault('steps', {})
+    return manifest
+
+
+def save_manifest(manifest, manifest_path):
+    """Writes the manifest atomically (temp file + rename)."""
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def check_step(manifest, step, input_paths, output_paths, tool_version):
+    """
+    Decides whether a step has to run.
+
+    Args:
+        manifest (dict): From load_manifest().
+        step (str): Step entry key.
+        input_paths (list): Files the step reads.
+        output_paths (list): Files/directories the step writes.
+        tool_version (str): From code_version().
+
+    Returns:
+        tuple: (reason, input_hashes). reason is None if the step is up to date,
+               otherwise a short explanation; input_hashes are the current input hashes.
+    """
+    input_hashes = hash_paths(input_paths)
+    entry = manifest['steps'].get(step)
+    if entry is None:
+        return "no previous run recorded", input_hashes
+    if entry.get('tool_version') != tool_version:
+        return "code changed", input_hashes
+    if entry.get('inputs') != input_hashes:
+        return "inputs changed", input_hashes
+    recorded_outputs = entry.get('outputs', {})
+    if set(recorded_outputs) != set(output_paths):
+        return "requested outputs changed", input_hashes
+    for path in output_paths:
+        current = hash_path(path)
+        if current is None:
+            return f"output missing: {path}", input_hashes
+        if current != recorded_outputs[path]:
+            return f"output modified: {path}", input_hashes
+    return None, input_hashes
+
+
+def record_step(manifest, step, input_hashes, output_paths, tool_version):
+    """Records a completed step (outputs are hashed now; files rewritten in place count as their new contents)."""
+    output_hashes = hash_paths(output_paths)
+    manifest['steps'][step] = {
+        'inputs': {path: output_hashes.get(path, digest) for path, digest in input_hashes.items()},
+        'outputs': output_hashes,
+        'tool_version': tool_version,
+        'completed_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def print_step_summary(script_name, ran, skipped):
+    """Prints which steps ran and which were skipped as up to date."""
+    print(f"\n--- {script_name}: {len(ran)} step(s) run, {len(skipped)} skipped (unchanged) ---")
+    for step, reason in ran:
+        print(f"  ran      {step} ({reason})")
+    for step in skipped:
+        print(f"  skipped  {step}")
@@ -0,0 +1,200 @@
+"""
+Typed columnar storage for PRI results.
+
+The PRI CSV stays the human-readable output; alongside it a Parquet file is
+written with explicit dtypes (float32 metrics, categorical labels) and the
+run's provenance embedded in the schema metadata: component weights,
+thresholds, git revision and hashes of the input files. Readers get the
+frame back without re-parsing text, and can detect when the file was
+produced by a different version of the PRI schema.
+
+pyarrow is optional: without it, writing is skipped and readers fall back
+to the CSV.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import subprocess
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+PRI_SCHEMA_VERSION = 1
+PRI_METADATA_KEY = b'pri_metadata'
+
+# Columns every PRI output must carry for downstream exports to work
+PRI_REQUIRED_COLUMNS = ['Participant ID', 'PRI_Score', 'PRI_Scale_1_5']
+
+# Config entries that are inputs to the calculation (hashed into the metadata)
+PRI_INPUT_PATH_KEYS = [
+    'VERBATIM_MAP_PATH', 'BINARY_PATH', 'PREFERENCE_PATH', 'AGGREGATE_STD_PATH',
+    'SEGMENT_COUNTS_PATH', 'THOUGHT_LABELS_PATH', 'DISCUSSION_GUIDE_PATH',
+]
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """SHA-256 of a file, read in chunks. Returns None if the file is missing."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_git_revision(repo_dir=None):
+    """Current git commit of the repository, or 'unknown' outside a checkout."""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=repo_dir or os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, timeout=10
+        )
+        return result.stdout.strip() if result.returncode == 0 else 'unknown'
+    except Exception:
+        return 'unknown'
+
+
+def build_pri_metadata(config, gd_number=None):
+    """
+    Collects provenance for a PRI run from its config dictionary.
+
+    Args:
+        config: PRI config from calculate_pri.get_config().
+        gd_number: Global Dialogue number, if known.
+
+    Returns:
+        Dictionary with weights, thresholds, git revision and input hashes.
+    """
+    weights = {k: v for k, v in config.items() if k.endswith('_WEIGHT') or k.endswith('_WEIGHT_LLM')}
+    thresholds = {
+        k: v for k, v in config.items()
+        if k not in weights and not k.endswith('_PATH') and not k.endswith('_DIR')
+        and isinstance(v, (int, float))
+    }
+    input_hashes = {
+        k: file_sha256(config[k]) for k in PRI_INPUT_PATH_KEYS if k in config
+    }
+    return {
+        'schema_version': PRI_SCHEMA_VERSION,
+        'gd_number': gd_number,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git_revision': get_git_revision(),
+        'weights': weights,
+        'thresholds': thresholds,
+        'input_hashes': input_hashes,
+    }
+
+
+def to_typed_pri_frame(pri_df):
+    """
+    Casts a PRI results frame to compact explicit dtypes.
+
+    Floats become float32, Participant ID stays a string, and any other
+    text column becomes categorical.
+    """
+    typed = pri_df.copy()
+    for col in typed.columns:
+        if col == 'Participant ID':
+            typed[col] = typed[col].astype(str)
+        elif pd.api.types.is_float_dtype(typed[col]):
+            typed[col] = typed[col].astype(np.float32)
+        elif pd.api.types.is_bool_dtype(typed[col]):
+            continue
+        elif not pd.api.types.is_numeric_dtype(typed[col]):
+            typed[col] = typed[col].astype('category')
+    return typed
+
+
+def _schema_signature(schema):
+    """Column name -> Arrow type string, as recorded in and checked against the metadata."""
+    return {field.name: str(field.type) for field in schema}
+
+
+def write_pri_parquet(pri_df, output_path, metadata):
+    """
+    Writes PRI results to Parquet with typed columns and embedded metadata.
+
+    Args:
+        pri_df: PRI results DataFrame.
+        output_path: Destination .parquet path.
+        metadata: Provenance dictionary from build_pri_metadata().
+
+    Returns:
+        The output path, or None if pyarrow is unavailable or writing failed.
+    """
+    if not PYARROW_AVAILABLE:
+        logging.warning("pyarrow is not installed; skipping Parquet output of PRI results.")
+        return None
+    try:
+        table = pa.Table.from_pandas(to_typed_pri_frame(pri_df), preserve_index=False)
+        full_metadata = dict(metadata, schema=_schema_signature(table.schema))
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[PRI_METADATA_KEY] = json.dumps(full_metadata, default=str).encode('utf-8')
+        pq.write_table(table.replace_schema_metadata(schema_metadata), output_path)
+        return output_path
+    except Exception as e:
+        logging.error(f"Error writing PRI Parquet file {output_path}: {e}")
+        return None
+
+
+def read_pri_parquet(parquet_path, required_columns=PRI_REQUIRED_COLUMNS):
+    """
+    Reads PRI results written by write_pri_parquet() and checks for schema drift.
+
+    Drift is reported when the file was written with a different schema
+    version, when its columns or dtypes no longer match the signature recorded
+    at write time, or when required columns are missing.
+
+    Args:
+        parquet_path: Path to the .parquet file.
+        required_columns: Columns the caller needs.
+
+    Returns:
+        Tuple (DataFrame, metadata dict, list of drift messages). The DataFrame
+        is None when the file cannot be used (missing pyarrow, unreadable, or
+        missing required columns).
+    """
+    if not PYARROW_AVAILABLE:
+        return None, {}, ["pyarrow is not installed"]
+    try:
+        table = pq.read_table(parquet_path)
+    except Exception as e:
+        return None, {}, [f"could not read {parquet_path}: {e}"]
+
+    raw_metadata = (table.schema.metadata or {}).get(PRI_METADATA_KEY)
+    metadata = json.loads(raw_metadata) if raw_metadata else {}
+    df = table.to_pandas()
+
+    drift = []
+    if not metadata:
+        drift.append("no PRI metadata embedded in file")
+    elif metadata.get('schema_version') != PRI_SCHEMA_VERSION:
+        drift.append(f"schema version {metadata.get('schema_version')} != expected {PRI_SCHEMA_VERSION}")
+
+    recorded = metadata.get('schema', {})
+    actual = _schema_signature(table.schema)
+    for col in sorted(set(recorded) - set(actual)):
+        drift.append(f"column '{col}' recorded in metadata but missing from file")
+    for col in sorted(set(actual) - set(recorded)) if recorded else []:
+        drift.append(f"unexpected column '{col}'")
+    for col in sorted(set(recorded) & set(actual)):
+        if recorded[col] != actual[col]:
+            drift.append(f"column '{col}' dtype {actual[col]} != recorded {recorded[col]}")
+
+    missing_required = [col for col in required_columns if col not in df.columns]
+    if missing_required:
+        drift.append(f"missing required columns: {missing_required}")
+        return None, metadata, drift
+
+    return df, metadata, drift
@@ -0,0 +1,138 @@
+"""
+Segment x segment comparisons over a responses x segments agreement matrix.
+
+Used by calculate_divergence.py (pairwise divergence matrices) and
+calculate_consensus.py (bridging statements). All functions take the parsed
+agreement rates of one question (0-1, NaN for missing) and work on whole
+matrices at once.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def calculate_segment_pair_divergence(rates, max_chunk_cells=1 << 24):
+    """
+    Computes segment x segment divergence over all responses of one question.
+
+    For every pair of segments (a, b), only responses where both have a rate count:
+        - pair_count[a, b]: number of such responses.
+        - mean_abs_diff[a, b]: mean |rate_a - rate_b| over them (NaN if none).
+        - opposite_count[a, b]: responses where one segment is above 50% and the
+          other below 50% (a rate of exactly 50% is on neither side).
+
+    The counts are products of indicator matrices. The absolute differences are
+    accumulated by broadcasting over chunks of responses, so memory stays at
+    about max_chunk_cells floats whatever the number of responses.
+
+    Args:
+        rates (np.ndarray): Float matrix (responses x segments) of agreement rates (0-1), NaN for missing.
+        max_chunk_cells (int): Upper bound on chunk_rows * segments^2 for the broadcast.
+
+    Returns:
+        tuple: (mean_abs_diff, opposite_count, pair_count), each a segments x segments array.
+    """
+    rates = np.asarray(rates, dtype=np.float32)
+    num_responses, num_segments = rates.shape
+    valid = ~np.isnan(rates)
+    valid_f = valid.astype(np.float32)
+    above = (rates > 0.5).astype(np.float32) # NaN compares False
+    below = (rates < 0.5).astype(np.float32)
+
+    pair_count = np.rint(valid_f.T @ valid_f).astype(np.int64)
+    above_below = above.T @ below
+    opposite_count = np.rint(above_below + above_below.T).astype(np.int64)
+
+    # Sum of |a - b| over responses, broadcasting chunk x segments x segments at a time
+    filled = np.where(valid, rates, np.float32(0))
+    abs_diff_sum = np.zeros((num_segments, num_segments), dtype=np.float64)
+    chunk_rows = max(1, max_chunk_cells // max(1, num_segments * num_segments))
+    for start in range(0, num_responses, chunk_rows):
+        chunk = filled[start:start + chunk_rows]
+        chunk_valid = valid_f[start:start + chunk_rows]
+        diff = np.abs(chunk[:, :, None] - chunk[:, None, :])
+        diff *= chunk_valid[:, :, None]
+        diff *= chunk_valid[:, None, :]
+        abs_diff_sum += diff.sum(axis=0, dtype=np.float64)
+
+    mean_abs_diff = np.full((num_segments, num_segments), np.nan, dtype=np.float32)
+    np.divide(abs_diff_sum, pair_count, out=mean_abs_diff, where=pair_count > 0, casting='unsafe')
+    return mean_abs_diff, opposite_count, pair_count
+
+
+def top_segment_pairs(mean_abs_diff, opposite_count, pair_count, segment_names, top_k, min_pair_responses=1):
+    """
+    Ranks distinct segment pairs (upper triangle) by mean absolute agreement difference.
+
+    Returns:
+        pd.DataFrame: Up to top_k rows with Segment A/B, Mean Abs Difference,
+                      Opposite Side Count, Opposite Side Share and Responses Compared.
+    """
+    rows, cols = np.triu_indices(len(segment_names), k=1)
+    keep = pair_count[rows, cols] >= max(1, min_pair_responses)
+    rows, cols = rows[keep], cols[keep]
+    if len(rows) == 0:
+        return pd.DataFrame(columns=['Segment A', 'Segment B', 'Mean Abs Difference', 'Opposite Side Count',
+                                     'Opposite Side Share', 'Responses Compared'])
+
+    # Highest mean difference first; ties broken by more opposite-side responses
+    order = np.lexsort((-opposite_count[rows, cols], -mean_abs_diff[rows, cols]))[:top_k]
+    rows, cols = rows[order], cols[order]
+    segment_names = np.asarray(segment_names, dtype=object)
+    compared = pair_count[rows, cols]
+    return pd.DataFrame({
+        'Segment A': segment_names[rows],
+        'Segment B': segment_names[cols],
+        'Mean Abs Difference': mean_abs_diff[rows, cols].astype(float),
+        'Opposite Side Count': opposite_count[rows, cols],
+        'Opposite Side Share': opposite_count[rows, cols] / compared,
+        'Responses Compared': compared,
+    })
+
+
+def calculate_bridging_scores(rates, pair_a, pair_b):
+    """
+    Bridging score of every response for every segment pair at once.
+
+    A response bridges a pair when both groups agree with it, so its score for
+    (a, b) is min(rate_a, rate_b); NaN when either group has no rate.
+
+    Args:
+        rates (np.ndarray): Float matrix (responses x segments) of agreement rates (0-1), NaN for missing.
+        pair_a (array-like): Column index of the first segment of each pair.
+        pair_b (array-like): Column index of the second segment of each pair.
+
+    Returns:
+        np.ndarray: Float matrix (responses x pairs).
+    """
+    rates = np.asarray(rates, dtype=float)
+    return np.minimum(rates[:, np.asarray(pair_a, dtype=np.intp)], rates[:, np.asarray(pair_b, dtype=np.intp)])
+
+
+def top_bridging_responses(scores, top_n):
+    """
+    Indices of the top_n responses per pair by bridging score.
+
+    Args:
+        scores (np.ndarray): Matrix (responses x pairs) from calculate_bridging_scores().
+        top_n (int): Responses to keep per pair.
+
+    Returns:
+        tuple: (response_idx, pair_idx, rank) flat int arrays, ordered by pair and then rank.
+               Responses without a score are never selected; ties keep response order.
+    """
+    num_responses, num_pairs = scores.shape
+    top_n = min(top_n, num_responses)
+    if top_n <= 0 or num_pairs == 0:
+        empty = np.array([], dtype=np.intp)
+        return empty, empty, empty
+
+    # Stable descending sort per column, NaN treated as lowest
+    order = np.argsort(-np.nan_to_num(scores, nan=-np.inf), axis=0, kind='stable')[:top_n]
+    rank = np.broadcast_to(np.arange(1, top_n + 1)[:, None], order.shape)
+    pair_idx = np.broadcast_to(np.arange(num_pairs)[None, :], order.shape)
+    has_score = ~np.isnan(np.take_along_axis(scores, order, axis=0))
+
+    # Flatten pair-major so each pair's ranks are contiguous
+    response_idx, pair_idx, rank, has_score = (x.T.ravel() for x in (order, pair_idx, rank, has_score))
+    return response_idx[has_score], pair_idx[has_score], rank[has_score]
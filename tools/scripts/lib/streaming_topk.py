@@ -0,0 +1,65 @@
+"""
+Bounded-memory top-K selection over a stream of scored blocks.
+
+Report scripts score responses block by block (e.g. while reading the
+standardized aggregate in chunks) and only keep the rows that can still make
+it into a top-K report: at most K rows per group, or K rows overall. Each
+block is merged with the rows kept so far and cut back to K, so memory is
+O(K) per group plus one block, independent of the number of responses.
+
+Ordering is fully determined by the sort keys (stable sort), so feeding the
+same rows in one block or in many gives identical results.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class StreamingTopK:
+    """
+    Keeps the top K rows per group (or overall) of a stream of DataFrames.
+
+    Args:
+        k (int): Rows to keep per group (or overall if group_by is None).
+        sort_by (list): Columns defining the ranking, most significant first.
+        ascending (list): Sort direction per column in sort_by.
+        group_by (str): Optional column; K rows are kept for each of its values.
+    """
+
+    def __init__(self, k, sort_by, ascending, group_by=None):
+        self.k = k
+        self.sort_by = list(sort_by)
+        self.ascending = list(ascending)
+        self.group_by = group_by
+        self._kept = None
+
+    def _prefilter(self, block):
+        """Drops rows that cannot reach the overall top K (ties at the cutoff are kept)."""
+        if self.group_by is not None or len(block) <= self.k or self.k <= 0:
+            return block
+        primary = block[self.sort_by[0]].to_numpy(dtype=float)
+        if np.isnan(primary).any():
+            return block
+        scores = primary if self.ascending[0] else -primary
+        cutoff = np.partition(scores, self.k - 1)[self.k - 1]
+        return block[scores <= cutoff]
+
+    def _select(self, df):
+        ordered = df.sort_values(self.sort_by, ascending=self.ascending, kind='stable')
+        if self.group_by is not None:
+            return ordered.groupby(self.group_by, sort=False).head(self.k)
+        return ordered.head(self.k)
+
+    def update(self, block):
+        """Merges a block of scored rows into the kept top K."""
+        if block is None or block.empty:
+            return
+        block = self._prefilter(block)
+        combined = block if self._kept is None else pd.concat([self._kept, block], ignore_index=True)
+        self._kept = self._select(combined).reset_index(drop=True)
+
+    def result(self):
+        """The kept rows, in ranking order (empty DataFrame if nothing was added)."""
+        if self._kept is None:
+            return pd.DataFrame()
+        return self._select(self._kept).reset_index(drop=True)
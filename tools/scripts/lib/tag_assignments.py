@@ -0,0 +1,148 @@
+"""
+Long-format tag assignments for a round's combined thought labels.
+
+all_thought_labels.csv stores each thought's tags in wide "Tag 1 ... Tag N"
+columns, so finding the thoughts with a given tag means scanning every tag
+column. preprocess_tag_files.py also writes the same assignments one row per
+(thought, tag), next to the combined files:
+
+    all_tag_assignments.csv   question_id, participant_id, thought_index, tag_code
+                              thought_index is the 0-based row in all_thought_labels.csv;
+                              rows are sorted by tag_code, then thought_index
+    tag_dictionary.csv        tag_code, tag, first_row, row_count
+                              the rows of each tag are all_tag_assignments.csv[first_row:first_row + row_count]
+    tag_assignments_source.json
+                              size and sha256 of the all_thought_labels.csv the tables were built from;
+                              load_tag_assignments() ignores the tables if the labels file differs
+
+Tag text is stripped and empty tags are dropped, as calculate_tags.py does when
+it melts the wide columns. A tag's frequency is its row_count, and its rows are
+a slice of the assignments table (rows_with_tag).
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from lib.preprocess_manifest import hash_file
+
+ASSIGNMENTS_FILENAME = 'all_tag_assignments.csv'
+DICTIONARY_FILENAME = 'tag_dictionary.csv'
+SOURCE_FILENAME = 'tag_assignments_source.json'
+TAG_COL_PATTERN = re.compile(r'^Tag \d+$')
+
+
+def labels_to_tag_assignments(labels_df):
+    """
+    Converts wide thought labels to the long assignment table and tag dictionary.
+
+    Args:
+        labels_df (pd.DataFrame): Combined thought labels with 'Question ID', 'Participant ID' and 'Tag N' columns.
+
+    Returns:
+        tuple: (assignments, dictionary) DataFrames as described in the module docstring.
+    """
+    tag_cols = sorted((col for col in labels_df.columns if TAG_COL_PATTERN.match(str(col))),
+                      key=lambda col: int(col.split(' ')[1]))
+    tag_values = labels_df[tag_cols].to_numpy(dtype=object)
+    thought_index, slot = np.nonzero(pd.notna(tag_values))
+    tags = pd.Series(tag_values[thought_index, slot], dtype=object).astype(str).str.strip().to_numpy()
+    keep = tags != ''
+    thought_index, tags = thought_index[keep], tags[keep]
+
+    tag_codes, tag_names = pd.factorize(tags, sort=True)
+    order = np.lexsort((thought_index, tag_codes))
+    thought_index, tag_codes = thought_index[order], tag_codes[order]
+
+    assignments = pd.DataFrame({
+        'question_id': labels_df['Question ID'].astype(str).to_numpy()[thought_index],
+        'participant_id': labels_df['Participant ID'].astype(str).to_numpy()[thought_index],
+        'thought_index': thought_index.astype(np.int32),
+        'tag_code': tag_codes.astype(np.int32),
+    })
+    row_count = np.bincount(tag_codes, minlength=len(tag_names))
+    dictionary = pd.DataFrame({
+        'tag_code': np.arange(len(tag_names), dtype=np.int32),
+        'tag': np.asarray(tag_names, dtype=object),
+        'first_row': (np.cumsum(row_count) - row_count).astype(np.int64),
+        'row_count': row_count.astype(np.int64),
+    })
+    return assignments, dictionary
+
+
+def _labels_signature(labels_path):
+    return {'labels_size': os.path.getsize(labels_path), 'labels_sha256': hash_file(labels_path)}
+
+
+def write_tag_assignments(labels_df, output_dir, labels_path=None):
+    """
+    Writes all_tag_assignments.csv and tag_dictionary.csv for the combined thought labels.
+
+    Args:
+        labels_df (pd.DataFrame): Combined thought labels.
+        output_dir (str or Path): Directory for the tables.
+        labels_path (str or Path): The saved labels_df; its size and hash are recorded so
+            load_tag_assignments() can tell whether the tables still match it.
+
+    Returns:
+        tuple: (assignments, dictionary) as written.
+    """
+    source_path = os.path.join(output_dir, SOURCE_FILENAME)
+    if os.path.exists(source_path):
+        os.remove(source_path) # Never leave a signature next to tables it does not describe
+    assignments, dictionary = labels_to_tag_assignments(labels_df)
+    assignments.to_csv(os.path.join(output_dir, ASSIGNMENTS_FILENAME), index=False, encoding='utf-8-sig')
+    dictionary.to_csv(os.path.join(output_dir, DICTIONARY_FILENAME), index=False, encoding='utf-8-sig')
+    if labels_path is not None:
+        with open(source_path, 'w') as f:
+            json.dump(_labels_signature(labels_path), f, indent=2)
+    return assignments, dictionary
+
+
+def load_tag_assignments(tags_dir, labels_path=None):
+    """
+    Reads the long assignment table and tag dictionary written by preprocess_tag_files.py.
+
+    Args:
+        tags_dir (str or Path): Directory holding the combined tag files.
+        labels_path (str or Path): all_thought_labels.csv the assignments must have been built from.
+
+    Returns:
+        tuple: (assignments, dictionary), or None if the files are missing or, given labels_path,
+            were not recorded as built from a file of its size and sha256.
+    """
+    assignments_path = os.path.join(tags_dir, ASSIGNMENTS_FILENAME)
+    dictionary_path = os.path.join(tags_dir, DICTIONARY_FILENAME)
+    if not os.path.exists(assignments_path) or not os.path.exists(dictionary_path):
+        return None
+    if labels_path is not None and os.path.exists(labels_path):
+        try:
+            with open(os.path.join(tags_dir, SOURCE_FILENAME)) as f:
+                source = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if source.get('labels_size') != os.path.getsize(labels_path) or \
+                source.get('labels_sha256') != hash_file(labels_path):
+            return None
+    assignments = pd.read_csv(assignments_path, encoding='utf-8-sig',
+                              dtype={'question_id': str, 'participant_id': str, 'thought_index': np.int32, 'tag_code': np.int32})
+    dictionary = pd.read_csv(dictionary_path, encoding='utf-8-sig', keep_default_na=False,
+                             dtype={'tag_code': np.int32, 'tag': str, 'first_row': np.int64, 'row_count': np.int64})
+    return assignments, dictionary
+
+
+def rows_with_tag(assignments, dictionary, tag):
+    """
+    Assignment rows carrying a tag (a slice, via the dictionary's row index).
+
+    Returns:
+        pd.DataFrame: Empty if the tag does not occur.
+    """
+    match = dictionary.loc[dictionary['tag'] == tag]
+    if match.empty:
+        return assignments.iloc[0:0]
+    first_row, row_count = int(match['first_row'].iloc[0]), int(match['row_count'].iloc[0])
+    return assignments.iloc[first_row:first_row + row_count]
@@ -3,8 +3,21 @@ import argparse
 import os
 import logging
 import re
+import io
+import shutil
+import tempfile
 from collections import OrderedDict # To preserve segment order somewhat
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, repeat
+from operator import itemgetter
 from lib.analysis_utils import get_segment_columns # Import the updated function
+from lib.agreement_store import (
+    build_agreement_store, write_typed_standardized, get_typed_standardized_path, get_store_dir, PYARROW_AVAILABLE,
+)
+from lib.preprocess_manifest import (
+    get_manifest_path, load_manifest, save_manifest, check_step, record_step, code_version, print_step_summary,
+)
+from lib import analysis_utils, agreement_store
 import pandas as pd
 
 # Configure logging
@@ -28,6 +41,10 @@ FINAL_HEADER_ORDER_BASE = [
     "Participant ID"
 ]
 
+# Projected data rows are spilled as CSV until the final header is known; the spill
+# buffer stays in memory up to SPILL_MEMORY_BYTES, then moves to a temp file.
+SPILL_MEMORY_BYTES = 256 * 1024 * 1024
+
 # --- Helper Functions ---
 
 def is_metadata_row(row, min_cols=10):
@@ -88,47 +105,59 @@ def build_column_map(header_row, header_type, segment_cols_in_header):
         
     return mapping # Note: Segment mapping is now handled in the main loop
 
-def collect_all_segment_columns(input_csv_path):
-    """Pass 1: Read the CSV to find all unique *core* segment column names across all headers."""
-    all_core_segments = OrderedDict() # Use OrderedDict to keep insertion order
-    logging.info("Starting Pass 1: Collecting all unique *core* segment column names...")
-    try:
-        with open(input_csv_path, 'r', encoding='utf-8') as infile:
-            reader = csv.reader(infile)
-            processed_headers = 0
-            temp_details_store = {} # Optional: store details from first encounter if needed later
-
-            for i, row in enumerate(reader):
-                if is_header_row(row):
-                    processed_headers += 1
-                    # get_segment_columns now returns core names in the list
-                    core_names, details_dict, seg_start_idx = get_segment_columns(row)
-                    if core_names:
-                         for core_name in core_names:
-                            if core_name not in all_core_segments:
-                                all_core_segments[core_name] = None # Add core segment name
-                                # Optional: Store details if useful (e.g., size from first time seen)
-                                # Find the original col name that produced this core name from details_dict
-                                # original_col = next((k for k, v in details_dict.items() if v.get('core_name') == core_name), None)
-                                # if original_col: temp_details_store[core_name] = details_dict[original_col]
-                    else:
-                         # This condition remains the same
-                         logging.warning(f"Pass 1: No segments identified in header row {i+1}. Header: {row[:10]}...")
-
-        logging.info(f"Pass 1 complete. Found {len(all_core_segments)} unique *core* segment names across {processed_headers} headers.")
-        # Sort core names: 'All' first, then others alphabetically
-        all_core = [name for name in all_core_segments.keys() if name.lower() == 'all']
-        other_core = [name for name in all_core_segments.keys() if name.lower() != 'all']
-        sorted_core_segment_names = sorted(all_core) + sorted(other_core)
-        
-        return sorted_core_segment_names # Return the sorted list of unique core names
-
-    except FileNotFoundError:
-        logging.error(f"Input file not found during Pass 1: {input_csv_path}")
-        return None
-    except Exception as e:
-        logging.error(f"Error during Pass 1 (collecting segments): {e}", exc_info=True)
-        return None
+def sort_core_segment_names(core_segment_names):
+    """Orders the standardized segment columns: 'All' first, then the others alphabetically."""
+    all_core = [name for name in core_segment_names if name.lower() == 'all']
+    other_core = [name for name in core_segment_names if name.lower() != 'all']
+    return sorted(all_core) + sorted(other_core)
+
+def build_block_column_map(header_row, header_type, segment_details, header_row_number):
+    """Maps the input columns of one header block to standardized column names (segments to core names)."""
+    column_map = {}
+    for input_col_name in header_row:
+        # Map core Question/ID/Type
+        if input_col_name in ["Question ID", "Question Type", "Question"]:
+            column_map[input_col_name] = input_col_name
+        # Map Poll 'Responses' to 'Response'
+        elif header_type == "Poll" and input_col_name == "Responses":
+            column_map[input_col_name] = "Response"
+        # Map Ask 'English Responses' to 'Response'
+        elif header_type in ["Ask Opinion", "Ask Experience"] and input_col_name == "English Responses":
+            column_map[input_col_name] = "Response"
+        # Map Ask 'Original Responses' to 'OriginalResponse'
+        elif header_type in ["Ask Opinion", "Ask Experience"] and input_col_name == "Original Responses":
+            column_map[input_col_name] = "OriginalResponse"
+        # Map other standard metadata cols
+        elif input_col_name in ["Star", "Categories", "Sentiment", "Submitted By", "Language", "Sample ID", "Participant ID"]:
+            column_map[input_col_name] = input_col_name
+        # Segment columns: Map original full name to its core name
+        elif input_col_name in segment_details:
+            core_name = segment_details[input_col_name].get('core_name')
+            if core_name:
+                column_map[input_col_name] = core_name
+            else:
+                logging.warning(f"Could not find core_name for segment '{input_col_name}' in header row {header_row_number}")
+        # else: Input column not needed in standardized output, ignore
+    return column_map
+
+def build_block_projection(header_row, column_map):
+    """
+    Precompiles how data rows of one header block are projected.
+
+    Returns:
+        tuple: (output_names, getter)
+               - output_names: standardized column names kept from this block, in projection order.
+               - getter: operator.itemgetter taking a data row padded to len(header_row) cells
+                 plus one extra trailing cell, returning (values for output_names..., trailing cell).
+                 A standardized name mapped from several input columns takes the last one.
+    """
+    last_index = {}
+    for idx, input_col_name in enumerate(header_row):
+        standardized_col_name = column_map.get(input_col_name)
+        if standardized_col_name:
+            last_index[standardized_col_name] = idx
+    output_names = list(last_index)
+    return output_names, itemgetter(*last_index.values(), len(header_row))
 
 def get_question_info_from_row(row, header_row, column_map):
     """Extracts QID and QText from the first data row of a block."""
@@ -148,51 +177,255 @@ def get_question_info_from_row(row, header_row, column_map):
         logging.warning(f"Could not extract QID/QText from row: {row[:5]}... Error: {e}")
     return qid, qtext
 
-def standardize_aggregate_csv(input_csv_path, output_csv_path, segment_counts_output_path=None):
+def project_aggregate_rows(reader, spill_writer, collect_counts=False):
+    """
+    Projects the data rows of (part of) a raw aggregate onto their header blocks' standardized columns.
+
+    Each data row is reduced to the cells its block maps (a precompiled projection
+    per header block) and written to spill_writer with its block index as the
+    trailing cell. Header, metadata and blank rows are consumed here.
+
+    Args:
+        reader: Iterable of parsed CSV rows (e.g. csv.reader) starting at the top of the file or at a header row.
+        spill_writer: csv.writer receiving the projected rows.
+        collect_counts (bool): Also collect segment participant counts per question.
+
+    Returns:
+        dict: core_segment_names (OrderedDict, in order seen), block_output_names (per block,
+              standardized names of its projected cells), question_segment_counts (OrderedDict),
+              headers_encountered, rows_processed_data, rows_skipped_meta.
+    """
+    rows_skipped_meta = 0
+    rows_processed_data = 0
+    headers_encountered = 0
+    all_core_segments = OrderedDict() # Union of core segment names across all headers, in order seen
+    block_output_names = [] # Per header block: standardized names of its projected cells
+    current_block = None
+    current_header_row = []
+    current_column_map = {} # Maps input col -> standardized col
+    current_segment_details = {} # Maps input full segment name -> details (core_name, size)
+    current_getter = None
+    num_header_cols = 0
+    question_segment_counts = OrderedDict() # Stores {qid: {segment_core_name: count, ...}}
+    current_qid = None
+    current_qtext = None
+
+    for i, row in enumerate(reader):
+        if not row or all(not cell or cell.isspace() for cell in row):
+            current_qid = None # Reset QID tracker on blank rows
+            continue # Skip empty or blank rows
+
+        if is_header_row(row):
+            headers_encountered += 1
+            current_qid = None # Reset QID, needs to be found in first data row
+            current_qtext = None
+            logging.debug(f"Processing header row {i+1}")
+            current_header_row = row
+            header_type = determine_header_type(current_header_row)
+            # Core names extend the output header; details map original full name -> core_name, size
+            core_names, current_segment_details, _ = get_segment_columns(current_header_row)
+            if core_names:
+                for core_name in core_names:
+                    all_core_segments.setdefault(core_name, None)
+            else:
+                logging.warning(f"No segments identified in header row {i+1}. Header: {row[:10]}...")
+
+            current_column_map = build_block_column_map(current_header_row, header_type, current_segment_details, i + 1)
+            output_names, current_getter = build_block_projection(current_header_row, current_column_map)
+            block_output_names.append(output_names)
+            current_block = len(block_output_names) - 1
+            num_header_cols = len(current_header_row)
+
+            logging.debug(f"  Header type: {header_type}. Map created for {len(current_column_map)} columns.")
+            continue # Don't write header rows to output
+
+        elif is_metadata_row(row):
+             rows_skipped_meta += 1
+             logging.debug(f"Skipping metadata row {i+1}: {row[:2]}...")
+             current_qid = None # Reset QID tracker
+             continue
+
+        elif not current_header_row:
+             # Data row encountered before the first header
+             logging.warning(f"Skipping data row {i+1} found before any header: {row[:5]}...")
+             continue
+
+        # --- Process Data Row ---
+        # If generating segment counts, try to get QID/QText from first data row
+        if collect_counts and current_qid is None:
+             # Try to extract QID and QText from this row
+             potential_qid, potential_qtext = get_question_info_from_row(row, current_header_row, current_column_map)
+             if potential_qid:
+                  current_qid = potential_qid
+                  current_qtext = potential_qtext
+                  logging.debug(f"  Identified QID: {current_qid} for current block.")
+                  # Initialize count dict for this QID if not present
+                  if current_qid not in question_segment_counts:
+                       question_segment_counts[current_qid] = {
+                           'Question ID': current_qid,
+                           'Question Text': current_qtext
+                       }
+                       # Populate counts from the current_segment_details (from the header)
+                       for details in current_segment_details.values():
+                           core_name = details.get('core_name')
+                           size = details.get('size')
+                           if core_name:
+                               # Use pd.NA for numpy NaN, or keep integer
+                               question_segment_counts[current_qid][core_name] = int(size) if pd.notna(size) else pd.NA
+             else:
+                 logging.warning(f"Could not extract QID from first data row {i+1} after header. Segment counts for this block might be missed.")
+
+        # --- Project the row onto its block's standardized columns ---
+        # Pad/truncate to the header width plus one trailing cell (missing cells stay blank)
+        if len(row) != num_header_cols:
+            if len(row) < num_header_cols:
+                logging.debug(f"Row {i+1} is shorter ({len(row)}) than its header ({num_header_cols}). Truncating data.")
+            row = row[:num_header_cols]
+            row.extend([''] * (num_header_cols - len(row)))
+        row.append(current_block) # Trailing cell: block index, blanked again when the row is emitted
+        spill_writer.writerow(current_getter(row))
+        rows_processed_data += 1
+
+    return {
+        'core_segment_names': all_core_segments,
+        'block_output_names': block_output_names,
+        'question_segment_counts': question_segment_counts,
+        'headers_encountered': headers_encountered,
+        'rows_processed_data': rows_processed_data,
+        'rows_skipped_meta': rows_skipped_meta,
+    }
+
+def build_block_sources(block_output_names, standardized_header):
+    """Per block: for each output column, the index of its projected cell (the trailing cell if unmapped)."""
+    output_position = {name: pos for pos, name in enumerate(standardized_header)}
+    block_sources = []
+    for output_names in block_output_names:
+        source = [len(output_names)] * len(standardized_header)
+        for cell_idx, name in enumerate(output_names):
+            if name in output_position:
+                source[output_position[name]] = cell_idx
+        block_sources.append(source)
+    return block_sources
+
+def emit_projected_rows(spill, block_sources, writer, block_offset=0):
+    """
+    Writes spilled projected rows in the final column order.
+
+    Args:
+        spill: Text file positioned at the first spilled row.
+        block_sources: From build_block_sources(), indexed by global block index.
+        writer: csv.writer for the standardized output.
+        block_offset (int): Added to the spilled block indices (for spills of one byte range).
+
+    Returns:
+        int: Number of rows written.
+    """
+    block_getters = [itemgetter(*source) for source in block_sources]
+    rows_written = 0
+    for cells in csv.reader(spill):
+        block = int(cells[-1]) + block_offset
+        cells[-1] = ''
+        writer.writerow(block_getters[block](cells))
+        rows_written += 1
+    return rows_written
+
+def find_block_byte_ranges(input_csv_path, num_ranges):
+    """
+    Splits a raw aggregate into up to num_ranges byte ranges that each start at a header row.
+
+    Split points are moved forward to the next line starting with 'Question ID',
+    so every range except the first begins with a complete question block.
+    (A quoted cell spanning lines whose continuation starts with 'Question ID,'
+    would be misread as a boundary; exports do not contain such cells.)
+
+    Returns:
+        list: (start, end) byte offsets covering the whole file, in order.
+    """
+    size = os.path.getsize(input_csv_path)
+    starts = [0]
+    with open(input_csv_path, 'rb') as f:
+        for k in range(1, num_ranges):
+            target = size * k // num_ranges
+            if target <= starts[-1]:
+                continue
+            f.seek(target)
+            f.readline() # Move to the start of the next line
+            while True:
+                position = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                if line.startswith(b'Question ID,') or line.startswith(b'"Question ID",'):
+                    if position > starts[-1]:
+                        starts.append(position)
+                    break
+    return list(zip(starts, starts[1:] + [size]))
+
+def _project_byte_range(input_csv_path, start, end, spill_dir, collect_counts):
+    """Process pool task: projects the rows of one byte range into its own spill file."""
+    with open(input_csv_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    # Same newline handling as reading the whole file in text mode
+    text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8')
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='', dir=spill_dir,
+                                     suffix='.spill.csv', delete=False) as spill:
+        result = project_aggregate_rows(csv.reader(text), csv.writer(spill), collect_counts)
+    result['spill_path'] = spill.name
+    return result
+
+def _emit_byte_range(spill_path, part_path, block_sources, block_offset):
+    """Process pool task: writes one range's spilled rows in the final column order."""
+    with open(spill_path, 'r', encoding='utf-8', newline='') as spill, \
+         open(part_path, 'w', encoding='utf-8', newline='') as part:
+        return emit_projected_rows(spill, block_sources, csv.writer(part), block_offset)
+
+def _merge_range_results(range_results):
+    """Final standardized header and per-block output sources from the results of all byte ranges, in file order."""
+    all_core_segments = OrderedDict()
+    block_output_names = []
+    for result in range_results:
+        for core_name in result['core_segment_names']:
+            all_core_segments.setdefault(core_name, None)
+        block_output_names.extend(result['block_output_names'])
+    all_core_segment_names = sort_core_segment_names(all_core_segments)
+    standardized_header = FINAL_HEADER_ORDER_BASE + all_core_segment_names
+    logging.info(f"Found {len(all_core_segment_names)} unique *core* segment names across {len(block_output_names)} headers.")
+    logging.info(f"Standardized header defined ({len(standardized_header)} columns).")
+    return standardized_header, build_block_sources(block_output_names, standardized_header)
+
+def standardize_aggregate_csv(input_csv_path, output_csv_path, segment_counts_output_path=None,
+                              spill_memory_bytes=SPILL_MEMORY_BYTES, jobs=1):
     """
     Reads an aggregate CSV with varying headers per question block,
     writes a standardized version with a single, comprehensive header,
     and optionally writes a CSV containing segment participant counts per question.
 
+    The input is read once. The union of core segment names grows with every
+    header block, while each data row is reduced to the cells its block maps
+    (a precompiled projection per header block) and spilled, tagged with its block, to a
+    temporary CSV buffer (in memory up to spill_memory_bytes, then on disk). Once the
+    final header is known, every block's projection is mapped onto it and the
+    rows are written out.
+
+    With jobs > 1 the file is split into byte ranges on question block boundaries
+    and the ranges are projected, then written, in a process pool; segment
+    unions, blocks and counts are merged in file order, so the output is
+    identical to a sequential run.
+
     Args:
         input_csv_path (str): Path to the input aggregate CSV file.
         output_csv_path (str): Path to write the standardized output CSV file.
         segment_counts_output_path (str, optional): Path to write the segment counts per question CSV.
+        spill_memory_bytes (int): Size of the spill buffer kept in memory before it moves to disk (sequential mode).
+        jobs (int): Number of worker processes (1 = sequential).
     """
     if not os.path.exists(input_csv_path):
         logging.error(f"Input file does not exist: {input_csv_path}")
         return
 
-    # --- Pass 1: Get all unique *core* segment columns ---
-    all_core_segment_names = collect_all_segment_columns(input_csv_path)
-    if all_core_segment_names is None:
-        logging.error("Failed to collect segment columns. Aborting standardization.")
-        return
-
-    # --- Define Headers --- 
-    standardized_header = FINAL_HEADER_ORDER_BASE + all_core_segment_names
-    segment_counts_header = ["Question ID", "Question Text"] + all_core_segment_names
-    
-    logging.info(f"Standardized header defined ({len(standardized_header)} columns).")
-    if segment_counts_output_path:
-        logging.info(f"Segment counts header defined ({len(segment_counts_header)} columns).")
-
-    # --- Pass 2: Process and Write Data --- 
-    logging.info("Starting Pass 2: Processing data and writing standardized file...")
-    if segment_counts_output_path:
-        logging.info("Segment counts per question will also be generated.")
-        
     rows_written_std = 0
     rows_written_counts = 0
-    rows_skipped_meta = 0
-    rows_processed_data = 0
-    headers_encountered = 0
-    current_header_row = []
-    current_column_map = {} # Maps input col -> standardized col
-    current_segment_details = {} # Maps input full segment name -> details (core_name, size)
-    question_segment_counts = OrderedDict() # Stores {qid: {segment_core_name: count, ...}} 
-    current_qid = None
-    current_qtext = None
 
     output_dir_std = os.path.dirname(output_csv_path)
     if output_dir_std:
@@ -202,119 +435,61 @@ def standardize_aggregate_csv(input_csv_path, output_csv_path, segment_counts_ou
          if output_dir_counts:
              os.makedirs(output_dir_counts, exist_ok=True)
 
+    ranges = find_block_byte_ranges(input_csv_path, jobs) if jobs > 1 else [(0, os.path.getsize(input_csv_path))]
+    if len(ranges) > 1:
+        logging.info(f"Reading aggregate in {len(ranges)} byte ranges with {jobs} worker processes...")
+    else:
+        logging.info("Reading aggregate: collecting segment columns and projecting data rows in a single pass...")
+    if segment_counts_output_path:
+        logging.info("Segment counts per question will also be generated.")
+
+    temp_paths = []
     try:
-        with open(input_csv_path, 'r', encoding='utf-8') as infile, \
-             open(output_csv_path, 'w', encoding='utf-8', newline='') as outfile_std:
-
-            reader = csv.reader(infile)
-            writer_std = csv.DictWriter(outfile_std, fieldnames=standardized_header, extrasaction='ignore')
-            writer_std.writeheader()
-            rows_written_std += 1
-
-            for i, row in enumerate(reader):
-                if not row or all(not cell or cell.isspace() for cell in row):
-                    current_qid = None # Reset QID tracker on blank rows
-                    continue # Skip empty or blank rows
-
-                if is_header_row(row):
-                    headers_encountered += 1
-                    current_qid = None # Reset QID, needs to be found in first data row
-                    current_qtext = None
-                    logging.debug(f"Processing header row {i+1}")
-                    current_header_row = row
-                    header_type = determine_header_type(current_header_row)
-                    # Get segment details (maps original full name -> details incl. core_name, size)
-                    _, current_segment_details, _ = get_segment_columns(current_header_row)
-                    
-                    # Rebuild current_column_map for this header block
-                    current_column_map = {} 
-                    for input_col_name in current_header_row:
-                        # Map core Question/ID/Type
-                        if input_col_name in ["Question ID", "Question Type", "Question"]:
-                            current_column_map[input_col_name] = input_col_name
-                        # Map Poll 'Responses' to 'Response'
-                        elif header_type == "Poll" and input_col_name == "Responses":
-                            current_column_map[input_col_name] = "Response"
-                        # Map Ask 'English Responses' to 'Response'
-                        elif header_type in ["Ask Opinion", "Ask Experience"] and input_col_name == "English Responses":
-                            current_column_map[input_col_name] = "Response" 
-                        # Map Ask 'Original Responses' to 'OriginalResponse'
-                        elif header_type in ["Ask Opinion", "Ask Experience"] and input_col_name == "Original Responses":
-                            current_column_map[input_col_name] = "OriginalResponse"
-                        # Map other standard metadata cols
-                        elif input_col_name in ["Star", "Categories", "Sentiment", "Submitted By", "Language", "Sample ID", "Participant ID"]:
-                            current_column_map[input_col_name] = input_col_name
-                        # Segment columns: Map original full name to its core name
-                        elif input_col_name in current_segment_details:
-                            core_name = current_segment_details[input_col_name].get('core_name')
-                            if core_name:
-                                current_column_map[input_col_name] = core_name
-                            else:
-                                logging.warning(f"Could not find core_name for segment '{input_col_name}' in header row {i+1}")
-                        # else: Input column not needed in standardized output, ignore
-                    
-                    logging.debug(f"  Header type: {header_type}. Map created for {len(current_column_map)} columns.")
-                    continue # Don't write header rows to output
-
-                elif is_metadata_row(row):
-                     rows_skipped_meta += 1
-                     logging.debug(f"Skipping metadata row {i+1}: {row[:2]}...")
-                     current_qid = None # Reset QID tracker
-                     continue
-
-                elif not current_header_row:
-                     # Data row encountered before the first header
-                     logging.warning(f"Skipping data row {i+1} found before any header: {row[:5]}...")
-                     continue
-
-                else:
-                    # --- Process Data Row ---
-                    # If generating segment counts, try to get QID/QText from first data row
-                    if segment_counts_output_path and current_qid is None:
-                         # Try to extract QID and QText from this row
-                         potential_qid, potential_qtext = get_question_info_from_row(row, current_header_row, current_column_map)
-                         if potential_qid:
-                              current_qid = potential_qid
-                              current_qtext = potential_qtext
-                              logging.debug(f"  Identified QID: {current_qid} for current block.")
-                              # Initialize count dict for this QID if not present
-                              if current_qid not in question_segment_counts:
-                                   question_segment_counts[current_qid] = {
-                                       'Question ID': current_qid,
-                                       'Question Text': current_qtext
-                                   }
-                                   # Populate counts from the current_segment_details (from the header)
-                                   for details in current_segment_details.values():
-                                       core_name = details.get('core_name')
-                                       size = details.get('size')
-                                       if core_name and core_name in segment_counts_header: # Check if core name is expected
-                                           # Use pd.NA for numpy NaN, or keep integer
-                                           question_segment_counts[current_qid][core_name] = int(size) if pd.notna(size) else pd.NA
-                                       elif core_name:
-                                            logging.warning(f"Core segment '{core_name}' found in header details but not in expected counts header.")
-                         else:
-                             logging.warning(f"Could not extract QID from first data row {i+1} after header. Segment counts for this block might be missed.")
-                    
-                    # --- Write standardized data row ---
-                    output_row_dict = {h: '' for h in standardized_header} # Initialize with blanks
-                    num_cols_in_data_row = len(row)
-                    num_cols_in_current_header = len(current_header_row)
-
-                    # Use the map derived from the most recent header
-                    for idx, input_col_name in enumerate(current_header_row):
-                        if idx >= num_cols_in_data_row:
-                            if num_cols_in_data_row < num_cols_in_current_header:
-                                 logging.debug(f"Row {i+1} is shorter ({num_cols_in_data_row}) than its header ({num_cols_in_current_header}). Truncating data.")
-                            break
-
-                        standardized_col_name = current_column_map.get(input_col_name)
-                        if standardized_col_name:
-                             if standardized_col_name in output_row_dict:
-                                output_row_dict[standardized_col_name] = row[idx]
-
-                    writer_std.writerow(output_row_dict)
-                    rows_written_std += 1
-                    rows_processed_data += 1
+        if len(ranges) == 1:
+            with open(input_csv_path, 'r', encoding='utf-8') as infile, \
+                 tempfile.SpooledTemporaryFile(max_size=spill_memory_bytes, mode='w+', encoding='utf-8', newline='',
+                                               dir=output_dir_std or None) as spill:
+                range_results = [project_aggregate_rows(csv.reader(infile), csv.writer(spill), bool(segment_counts_output_path))]
+                standardized_header, block_sources = _merge_range_results(range_results)
+                spill.seek(0)
+                with open(output_csv_path, 'w', encoding='utf-8', newline='') as outfile_std:
+                    writer_std = csv.writer(outfile_std)
+                    writer_std.writerow(standardized_header)
+                    rows_written_std += 1 + emit_projected_rows(spill, block_sources, writer_std)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                # Round 1: project every range into its own spill
+                range_results = list(pool.map(
+                    _project_byte_range, repeat(input_csv_path), *zip(*ranges),
+                    repeat(output_dir_std or None), repeat(bool(segment_counts_output_path))
+                ))
+                temp_paths.extend(result['spill_path'] for result in range_results)
+                standardized_header, block_sources = _merge_range_results(range_results)
+
+                # Round 2: write every range in the final column order, then concatenate in file order
+                part_paths = [f"{result['spill_path']}.part" for result in range_results]
+                temp_paths.extend(part_paths)
+                block_offsets = list(accumulate([len(r['block_output_names']) for r in range_results], initial=0))[:-1]
+                rows_per_range = list(pool.map(
+                    _emit_byte_range, [r['spill_path'] for r in range_results], part_paths,
+                    repeat(block_sources), block_offsets
+                ))
+            with open(output_csv_path, 'w', encoding='utf-8', newline='') as outfile_std:
+                csv.writer(outfile_std).writerow(standardized_header)
+                for part_path in part_paths:
+                    with open(part_path, 'r', encoding='utf-8', newline='') as part:
+                        shutil.copyfileobj(part, outfile_std)
+            rows_written_std += 1 + sum(rows_per_range)
+
+        headers_encountered = sum(r['headers_encountered'] for r in range_results)
+        rows_processed_data = sum(r['rows_processed_data'] for r in range_results)
+        rows_skipped_meta = sum(r['rows_skipped_meta'] for r in range_results)
+        all_core_segment_names = standardized_header[len(FINAL_HEADER_ORDER_BASE):]
+        # First block of a question wins, as in a sequential read
+        question_segment_counts = OrderedDict()
+        for result in range_results:
+            for qid, count_data in result['question_segment_counts'].items():
+                question_segment_counts.setdefault(qid, count_data)
 
         # --- Final Checks and Summary for Standardized Output ---
         if headers_encountered == 0:
@@ -322,7 +497,7 @@ def standardize_aggregate_csv(input_csv_path, output_csv_path, segment_counts_ou
              # Don't raise error here yet, maybe counts can still be written
         if rows_processed_data == 0:
              logging.warning("Processing finished, but no data rows were processed for standardized output.")
-             
+
         logging.info(f"Standardized CSV processing complete.")
         logging.info(f"  Headers encountered: {headers_encountered}")
         logging.info(f"  Data rows processed: {rows_processed_data}")
@@ -331,16 +506,22 @@ def standardize_aggregate_csv(input_csv_path, output_csv_path, segment_counts_ou
         logging.info(f"  Standardized file saved to: {output_csv_path}")
 
     except Exception as e:
-        logging.error(f"An error occurred during Pass 2 (standardized data processing): {e}", exc_info=True)
+        logging.error(f"An error occurred during standardized data processing: {e}", exc_info=True)
         # Clean up partially written standardized file
         if os.path.exists(output_csv_path):
              try: os.remove(output_csv_path); logging.warning(f"Removed partially written standardized output file: {output_csv_path}")
              except OSError as remove_err: logging.error(f"Failed to remove partially written file {output_csv_path}: {remove_err}")
         # Re-raise? or just return?
         return # Stop if standardized processing fails
-        
+    finally:
+        for temp_path in temp_paths:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
     # --- Write Segment Counts File (if requested and data available) ---
     if segment_counts_output_path:
+        segment_counts_header = ["Question ID", "Question Text"] + all_core_segment_names
+        logging.info(f"Segment counts header defined ({len(segment_counts_header)} columns).")
         if question_segment_counts:
             logging.info(f"Writing segment counts per question ({len(question_segment_counts)} questions) to: {segment_counts_output_path}")
             try:
@@ -375,10 +556,15 @@ def main():
     # Output paths - conditionally required
     parser.add_argument('--output_file', help='Path to save the standardized output CSV file (required if --gd_number is not used).')
     parser.add_argument('--segment_counts_output', help='(Optional) Path to save the segment counts per question CSV file. Default constructed if --gd_number is used.')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes for parsing question blocks in parallel (default: 1, sequential). Output is identical for any value.')
+    parser.add_argument('--force', action='store_true', help='Reprocess even if the input and code are unchanged since the last run (see preprocess_manifest.json).')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging.')
 
     args = parser.parse_args()
 
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1.")
+
     if args.debug:
         logging.getLogger().setLevel(logging.DEBUG)
 
@@ -430,8 +616,31 @@ def main():
     if counts_output_path and not counts_output_path.lower().endswith('.csv'):
         logging.warning("Segment counts output file might not be a CSV.")
 
+    # --- Skip if nothing changed since the last run (see lib/preprocess_manifest.py) ---
+    manifest_path = get_manifest_path(os.path.dirname(output_path) or '.')
+    manifest = load_manifest(manifest_path)
+    step = f"preprocess_aggregate:{os.path.basename(output_path)}"
+    tool_version = code_version([__file__, analysis_utils.__file__, agreement_store.__file__])
+    expected_outputs = [output_path] + ([counts_output_path] if counts_output_path else [])
+    if PYARROW_AVAILABLE:
+        expected_outputs += [get_typed_standardized_path(output_path), get_store_dir(output_path)]
+    reason, input_hashes = check_step(manifest, step, [input_path], expected_outputs, tool_version)
+    if reason is None and not args.force:
+        logging.info(f"Skipping standardization: {input_path} and the preprocessing code are unchanged since the last run (use --force to rerun).")
+        print_step_summary("Aggregate preprocessing", [], [step])
+        return
+
     # --- Run Standardization --- 
-    standardize_aggregate_csv(input_path, output_path, counts_output_path)
+    standardize_aggregate_csv(input_path, output_path, counts_output_path, jobs=args.jobs)
+
+    # --- Typed columnar copy and the pre-parsed agreement store used by the analysis scripts ---
+    if os.path.exists(output_path):
+        typed_written = write_typed_standardized(output_path)
+        store_built = build_agreement_store(output_path, counts_output_path)
+        if not PYARROW_AVAILABLE or (typed_written and store_built):
+            record_step(manifest, step, input_hashes, expected_outputs, tool_version)
+            save_manifest(manifest, manifest_path)
+        print_step_summary("Aggregate preprocessing", [(step, "forced" if reason is None else reason)], [])
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
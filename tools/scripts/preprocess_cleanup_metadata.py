@@ -1,148 +1,143 @@
 import argparse
+import io
 import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-import pandas as pd
 import csv # For more granular reading if needed
 import shutil # For replacing the file
+from lib.csv_header import find_csv_header, csv_line_at, open_at_header
+from lib.preprocess_manifest import (
+    get_manifest_path, load_manifest, save_manifest, check_step, record_step, code_version, print_step_summary,
+    hash_file,
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Block size for streaming a cleaned export into its replacement file
+COPY_BLOCK_BYTES = 1024 * 1024
+
 def find_header_row(file_path, expected_markers):
     """
-    Attempts to find the 0-based index of the header row in a CSV file.
+    Locates the header row of a CSV file by its expected column names.
 
     Args:
         file_path (Path): Path to the CSV file.
         expected_markers (list): A list of column names expected to be in the header.
 
     Returns:
-        int: The 0-based index of the header row, or -1 if not found or error occurs.
+        CsvHeader: Encoding, byte offset and line index of the header (see lib/csv_header.py),
+                   or None if not found or an error occurs.
     """
     logging.debug(f"Attempting to find header in {file_path} using markers: {expected_markers}")
-    # Try common encodings
-    encodings_to_try = ['utf-8-sig', 'utf-8', 'latin1', 'iso-8859-1']
-    detected_encoding = None
-    header_row_index = -1
+    try:
+        header = find_csv_header(file_path, expected_markers)
+    except Exception as file_read_error:
+        logging.error(f"Unexpected error reading {file_path}: {file_read_error}")
+        return None
 
-    for enc in encodings_to_try:
-        try:
-            with open(file_path, 'r', encoding=enc) as f:
-                # Use csv reader for more control over quoting/delimiters if needed
-                # For now, simple line reading is okay
-                for i, line in enumerate(f):
-                    line_content = line.strip()
-                    # Skip empty lines
-                    if not line_content:
-                        continue
-                    # Basic checks: contains commas, contains markers
-                    if ',' in line_content:
-                        # Check if all markers are present (case-insensitive)
-                        line_lower = line_content.lower()
-                        if all(marker.lower() in line_lower for marker in expected_markers):
-                            # Perform a more robust check with pandas sniffing
-                            try:
-                                # Try reading just this line as header to validate columns
-                                df_header_test = pd.read_csv(file_path, header=i, nrows=0, encoding=enc)
-                                df_header_test.columns = df_header_test.columns.str.replace('^\\ufeff', '', regex=True).str.strip() # Clean potential BOM
-                                if all(marker in df_header_test.columns for marker in expected_markers):
-                                    logging.info(f"Confirmed header on line {i+1} (index {i}) in {file_path} using encoding '{enc}'. Markers: {expected_markers}")
-                                    header_row_index = i
-                                    detected_encoding = enc
-                                    break # Found header
-                                else:
-                                     logging.debug(f"Line {i+1} contained markers but pandas validation failed. Found columns: {df_header_test.columns.tolist()}")
-
-                            except Exception as pd_err:
-                                logging.debug(f"Pandas validation failed for line {i+1} in {file_path} with encoding {enc}: {pd_err}")
-                                continue # Try next line
-                        # else: # Optional: log lines that have commas but not all markers
-                            # logging.debug(f"Line {i+1} did not contain all markers '{expected_markers}'.")
-            if header_row_index != -1:
-                break # Stop trying encodings if header found
-        except UnicodeDecodeError:
-            logging.warning(f"Encoding {enc} failed for {file_path}, trying next...")
-            continue
-        except Exception as file_read_error:
-            logging.error(f"Unexpected error reading {file_path} with encoding {enc}: {file_read_error}")
-            return -1 # Indicate error
-
-    if header_row_index == -1:
+    if header is None:
         logging.warning(f"Could not reliably find header row in {file_path} using markers {expected_markers}.")
+    else:
+        logging.info(f"Confirmed header on line {header.line_index+1} (index {header.line_index}) in {file_path} using encoding '{header.encoding}'. Markers: {expected_markers}")
+    return header
+
+@contextmanager
+def replace_atomically(file_path, mode='wb', **open_kwargs):
+    """
+    Writes to a temporary file in the same directory and renames it over file_path on success.
+
+    Readers see either the old or the new file, never a partial one; on error the
+    temporary file is removed and the original is untouched.
+
+    Args:
+        file_path (Path): File to replace.
+        mode (str): Open mode of the temporary file ('wb' or 'w').
+        **open_kwargs: Passed to open() (e.g. encoding, newline).
+
+    Yields:
+        The open temporary file.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.", suffix='.tmp')
+    try:
+        with open(fd, mode, **open_kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        shutil.copymode(file_path, temp_path)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            logging.error(f"Could not remove temporary file: {temp_path}")
+        raise
+
+def copy_from_header(file_path, header, outfile, block_bytes=COPY_BLOCK_BYTES):
+    """
+    Streams a CSV from its header row to the end into an open binary file as UTF-8.
+
+    UTF-8 input is copied byte for byte through one reused block buffer; other
+    encodings are transcoded block by block. Line endings are preserved. Memory
+    use is one block.
 
-    return header_row_index
+    Args:
+        file_path (Path): Source CSV.
+        header (CsvHeader): Located header (encoding and byte offset to start from).
+        outfile: Binary file to write to.
+        block_bytes (int): Copy block size.
+    """
+    if header.encoding in ('utf-8', 'utf-8-sig'):
+        with open(file_path, 'rb', buffering=0) as infile:
+            infile.seek(header.offset)
+            buffer = bytearray(block_bytes)
+            view = memoryview(buffer)
+            while (read := infile.readinto(buffer)):
+                outfile.write(view[:read])
+    else:
+        with open_at_header(file_path, header, newline='') as infile:
+            for block in iter(lambda: infile.read(block_bytes), ''):
+                outfile.write(block.encode('utf-8'))
 
-def clean_csv_metadata(file_path, header_index):
+def clean_csv_metadata(file_path, header):
     """
-    Reads a CSV starting from the header row and overwrites the original file
-    using basic file I/O to avoid pandas parsing errors during cleanup.
+    Drops the rows before the header of a CSV, rewriting the file in place.
+
+    The file is streamed from the header offset into a temporary file in the same
+    directory (see copy_from_header) that atomically replaces the original, so
+    memory stays constant regardless of file size and nothing is parsed.
 
     Args:
         file_path (Path): Path to the CSV file.
-        header_index (int): 0-based index of the header row.
+        header (CsvHeader): Located header (encoding and byte offset to start from).
 
     Returns:
         bool: True if successful, False otherwise.
     """
-    logging.info(f"Cleaning metadata from {file_path} (header found at index {header_index}) using basic I/O...")
-    temp_file_path = file_path.with_suffix(file_path.suffix + '.tmp')
-
+    logging.info(f"Cleaning metadata from {file_path} (header found at index {header.line_index}) using basic I/O...")
     try:
-        # Determine the original encoding if possible (using find_header_row logic again briefly)
-        # This is slightly redundant but ensures we read correctly
-        original_encoding = 'utf-8-sig' # Default
-        encodings_to_try = ['utf-8-sig', 'utf-8', 'latin1', 'iso-8859-1']
-        for enc in encodings_to_try:
-            try:
-                 with open(file_path, 'r', encoding=enc) as f_check:
-                     f_check.readline() # Try reading one line
-                 original_encoding = enc
-                 logging.debug(f"Determined encoding '{original_encoding}' for reading {file_path}")
-                 break
-            except UnicodeDecodeError:
-                 continue
-            except Exception:
-                 pass # Ignore other errors during encoding check
-
-        with open(file_path, 'r', encoding=original_encoding) as infile, \
-             open(temp_file_path, 'w', encoding='utf-8') as outfile: # Write standard UTF-8
-
-            # Skip lines before the header
-            for _ in range(header_index):
-                next(infile)
-
-            # Read header and remaining lines, write to temp file
-            shutil.copyfileobj(infile, outfile)
-
-        # Replace original file with the temp file
-        shutil.move(str(temp_file_path), str(file_path))
+        with replace_atomically(file_path) as outfile:
+            copy_from_header(file_path, header, outfile)
         logging.info(f"Successfully cleaned and overwrote {file_path}.")
         return True
-
     except Exception as e:
         logging.error(f"Failed to clean or overwrite {file_path} using basic I/O: {e}", exc_info=True)
-        # Clean up temp file if it exists
-        if temp_file_path.exists():
-            try:
-                temp_file_path.unlink()
-            except OSError:
-                logging.error(f"Could not remove temporary file: {temp_file_path}")
         return False
-    finally:
-         # Ensure temp file is removed in case of unexpected exit before move
-        if temp_file_path.exists():
-            try:
-                temp_file_path.unlink()
-                logging.debug(f"Removed leftover temp file: {temp_file_path}")
-            except OSError:
-                 # Log if removal fails but don't stop the process
-                 logging.error(f"Could not remove temporary file during final cleanup: {temp_file_path}")
 
 def clean_summary_csv(file_path):
     """
     Cleans the summary.csv file which has two sections (conversation and question summaries)
     by creating a single combined header and concatenating the data.
 
+    Both sections are read with the csv module from their header offsets and the
+    4-column result is streamed into an atomically replaced temporary file.
+
     Args:
         file_path (Path): Path to the summary.csv file.
 
@@ -152,155 +147,275 @@ def clean_summary_csv(file_path):
     logging.info(f"Attempting special cleaning for {file_path}...")
     header1_markers = ['Conversation ID', 'Conversation Title']
     header2_markers = ['Question ID', 'Question Type'] # Use simpler markers for second header
-    header1_idx = -1
-    header2_idx = -1
+    target_cols = ['ID', 'Type', 'Text', 'Summary']
+    required_quest_cols = ['Question ID', 'Question Type', 'Question Text', 'Question Summary']
+
+    # --- Find header indices --- # Simplified check: contains markers and enough columns
+    def has_markers(markers, min_columns):
+        return lambda columns: len(columns) >= min_columns and all(m.lower() in ','.join(columns).lower() for m in markers)
 
-    # --- Find header indices --- # Simplified check implemented
-    encodings_to_try = ['utf-8-sig', 'utf-8', 'latin1', 'iso-8859-1']
-    detected_encoding = 'utf-8-sig' # Assume default initially
     try:
-        # Find header 1
-        for enc in encodings_to_try:
-            try:
-                with open(file_path, 'r', encoding=enc) as f:
-                    for i, line in enumerate(f):
-                        # Simplified check: contains markers and at least 3 commas
-                        if all(m.lower() in line.lower() for m in header1_markers) and line.count(',') >= 3:
-                            header1_idx = i
-                            detected_encoding = enc
-                            logging.info(f"Found summary header 1 at index {header1_idx} with encoding {detected_encoding} (simplified check)")
-                            break
-                if header1_idx != -1:
-                    break
-            except UnicodeDecodeError:
-                continue
-
-        if header1_idx == -1:
+        # --- Check if already cleaned (to the 4-column format) ---
+        first_line = csv_line_at(file_path, 0)
+        if first_line is not None and first_line.columns == target_cols:
+            logging.info(f"{file_path} already appears to be cleaned to the target 4-column format. Skipping.")
+            return True
+
+        header1 = find_csv_header(file_path, predicate=has_markers(header1_markers, 4))
+        if header1 is None:
             logging.error(f"Could not find summary header 1 using markers {header1_markers} in {file_path}")
             return False
+        logging.info(f"Found summary header 1 at index {header1.line_index} with encoding {header1.encoding} (simplified check)")
 
         # Find header 2 (starting search after header 1)
-        header2_search_start_line = header1_idx + 1
-        with open(file_path, 'r', encoding=detected_encoding) as f:
-             # Skip lines up to the start point
-             for _ in range(header2_search_start_line):
-                 next(f)
-             # Search remaining lines
-             for i, line in enumerate(f, start=header2_search_start_line):
-                 # Simplified check: contains markers and at least 2 commas
-                 if all(m.lower() in line.lower() for m in header2_markers) and line.count(',') >= 2:
-                     header2_idx = i
-                     logging.info(f"Found summary header 2 at index {header2_idx} (simplified check)")
-                     break
-
-        if header2_idx == -1:
-             logging.error(f"Could not find summary header 2 using markers {header2_markers} after index {header1_idx} in {file_path}")
+        header2 = find_csv_header(file_path, predicate=has_markers(header2_markers, 3), start_line=header1.line_index + 1)
+        if header2 is None:
+             logging.error(f"Could not find summary header 2 using markers {header2_markers} after index {header1.line_index} in {file_path}")
              # Decide if we should proceed without question summaries or fail
              # For now, let's fail if the structure isn't as expected.
              return False
+        logging.info(f"Found summary header 2 at index {header2.line_index} (simplified check)")
 
     except Exception as e:
         logging.error(f"Error finding headers in {file_path}: {e}")
         return False
 
-    # --- Read necessary lines manually using determined encoding ---
+    # --- Stream both sections to the 4-column format --- #
     try:
-        lines = []
-        with open(file_path, 'r', encoding=detected_encoding) as f:
-            lines = f.readlines()
-
-        if not lines or len(lines) <= header2_idx:
-             logging.error(f"File {file_path} seems too short or headers not found correctly.")
-             return False
+        # Conversation summary section: header plus one data row
+        with open_at_header(file_path, header1, newline='') as infile:
+            conv_reader = csv.reader(infile)
+            conv_header = [h.strip() for h in next(conv_reader)]
+            conv_data_dict = dict(zip(conv_header, next(conv_reader, [])))
+
+        with open_at_header(file_path, header2, newline='') as infile, \
+             replace_atomically(file_path, 'w', encoding='utf-8', newline='') as outfile:
+            quest_reader = csv.reader(infile)
+            quest_header = [h.strip() for h in next(quest_reader)]
+            if not all(col in quest_header for col in required_quest_cols):
+                raise KeyError(f"Missing expected columns in question summary section. Found: {quest_header}")
+            quest_indices = [quest_header.index(col) for col in required_quest_cols]
+
+            writer = csv.writer(outfile, lineterminator='\n')
+            writer.writerow(target_cols)
+            writer.writerow([
+                conv_data_dict.get('Conversation ID', ''), 'Conversation',
+                conv_data_dict.get('Conversation Title', ''), conv_data_dict.get('Conversation Summary', ''),
+            ])
+            for row in quest_reader:
+                if not any(cell.strip() for cell in row):
+                    continue # Skip blank lines
+                writer.writerow([row[idx] if idx < len(row) else '' for idx in quest_indices])
 
-        header1_line = lines[header1_idx].strip()
-        conv_data_line = lines[header1_idx + 1].strip() # Assume one data line for conv summary
-        header2_line = lines[header2_idx].strip()
-        question_data_lines = [line.strip() for line in lines[header2_idx+1:] if line.strip()] # Get non-empty question data lines
+        logging.info(f"Successfully cleaned and overwrote {file_path} to 4-column format.")
+        return True
 
+    except KeyError as e:
+         logging.error(f"Missing expected column during transformation of {file_path}: {e}", exc_info=True)
     except Exception as e:
-         logging.error(f"Error reading lines manually from {file_path}: {e}")
-         return False
+         logging.error(f"Failed to clean or overwrite {file_path}: {e}", exc_info=True)
+    return False
+
+def _write_synthetic_binary(file_path, size_bytes):
+    """Writes a binary.csv-like export of about size_bytes with a metadata preamble."""
+    block = io.StringIO()
+    writer = csv.writer(block, lineterminator='\n')
+    for i in range(10000):
+        writer.writerow([f"q-{i % 40:04d}", f"participant-{i:06d}", f"thought-{(i * 7) % 997:05d}", "agree" if i % 3 else "disagree"])
+    block = block.getvalue().encode('utf-8')
+    with open(file_path, 'wb') as f:
+        f.write(b"Conversation ID,benchmark\nExport date,2025-01-01\n\n")
+        f.write(b"Question ID,Participant ID,Thought ID,Vote\n")
+        for _ in range(max(1, size_bytes // len(block))):
+            f.write(block)
+
+def _sync():
+    if hasattr(os, 'sync'): # Not available on Windows
+        os.sync()
+
+def _start_cold(file_path):
+    """Flushes pending writes and evicts file_path from the page cache, so every method reads from disk."""
+    _sync()
+    if hasattr(os, 'posix_fadvise'):
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
 
-    # --- Check if already cleaned (to the 4-column format) ---
-    target_cols = ['ID', 'Type', 'Text', 'Summary']
+def _peak_rss_mb():
     try:
-        df_check = pd.read_csv(file_path, nrows=0, encoding=detected_encoding)
-        # Use header1_line to check if it *looks* like the target header
-        # This check is imperfect but better than just checking header1_idx == 0
-        if header1_idx == 0 and "ID" in header1_line and "Type" in header1_line and "Text" in header1_line and "Summary" in header1_line:
-            df_check.columns = df_check.columns.str.replace('^\\ufeff', '', regex=True).str.strip()
-            if list(df_check.columns) == target_cols:
-                logging.info(f"{file_path} already appears to be cleaned to the target 4-column format. Skipping.")
-                return True
-        elif header1_idx == 0: # Header is at line 1, but not the target format
-             # Header 1 is at line 1, but it's not the target format. Proceed with cleaning.
-             logging.info("Header 1 found at line 1, but not the target format. Proceeding with cleaning.")
-        # else: header1_idx > 0, needs cleaning
+        import resource # POSIX only
+    except ImportError:
+        return float('nan')
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # KB on Linux
+
+def _copy_text_previous(file_path, output_path):
+    """Previous cleanup: re-detect the encoding, skip lines in text mode and copy decoded text."""
+    _start_cold(file_path) # Stop once the output is on disk
+    start, start_cpu = time.perf_counter(), time.process_time()
+    header = find_csv_header(file_path, ['Question ID', 'Participant ID', 'Thought ID', 'Vote'])
+    with open(file_path, 'r', encoding='utf-8-sig') as infile, open(output_path, 'w', encoding='utf-8') as outfile:
+        for _ in range(header.line_index):
+            next(infile)
+        shutil.copyfileobj(infile, outfile)
+    _sync()
+    return time.perf_counter() - start, time.process_time() - start_cpu, _peak_rss_mb()
+
+def _copy_streaming(file_path):
+    """Current cleanup: sniff the header and stream blocks into an atomically replaced file."""
+    _start_cold(file_path)
+    start, start_cpu = time.perf_counter(), time.process_time()
+    header = find_csv_header(file_path, ['Question ID', 'Participant ID', 'Thought ID', 'Vote'])
+    clean_csv_metadata(file_path, header)
+    _sync()
+    return time.perf_counter() - start, time.process_time() - start_cpu, _peak_rss_mb()
+
+def run_copy_benchmark(size_gb, directory=None):
+    """
+    Times the previous text-mode cleanup against the streaming block copy on a synthetic binary.csv.
 
-    except Exception as e:
-         logging.error(f"Error checking if {file_path} is already cleaned: {e}. Proceeding with cleaning attempt.")
+    Both methods read the input cold and their timings include flushing the output
+    to disk, so the page cache state left by one method does not favour the other.
+    """
+    with tempfile.TemporaryDirectory(dir=directory) as tmp_dir:
+        file_path = Path(tmp_dir) / "GDX_binary.csv"
+        reference_path = Path(tmp_dir) / "GDX_binary_text_copy.csv"
+        logging.info(f"Writing synthetic {size_gb:g} GB binary.csv to {file_path}...")
+        _write_synthetic_binary(file_path, int(size_gb * 1024 ** 3))
+        size_mb = file_path.stat().st_size / (1024 * 1024)
+
+        # Each method runs in a fresh process so peak RSS is its own
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(1) as pool:
+            text_seconds, text_cpu, text_rss = pool.apply(_copy_text_previous, (file_path, reference_path))
+        with context.Pool(1) as pool:
+            stream_seconds, stream_cpu, stream_rss = pool.apply(_copy_streaming, (file_path,))
+        identical = hash_file(reference_path) == hash_file(file_path)
+
+    print(f"\n--- Benchmark: metadata cleanup of a {size_mb:,.0f} MB binary.csv ---")
+    print(f"{'Method':<40} {'Seconds':>8} {'MB/s':>8} {'CPU s':>8} {'Peak RSS MB':>12}")
+    print(f"{'Text decode/encode copy (previous)':<40} {text_seconds:>8.2f} {size_mb / text_seconds:>8.0f} {text_cpu:>8.2f} {text_rss:>12.0f}")
+    print(f"{'Streaming block copy + atomic rename':<40} {stream_seconds:>8.2f} {size_mb / stream_seconds:>8.0f} {stream_cpu:>8.2f} {stream_rss:>12.0f}")
+    print(f"Outputs identical: {identical}")
+
+class PerThreadLogBuffer(logging.Filter):
+    """
+    Holds back log records of threads that are capturing, so each file's log can be
+    replayed as one block, in file order, while files are cleaned concurrently.
+    """
 
-    # --- Process the data to the 4-column format using manual parsing --- #
-    try:
-        # Parse conversation summary section using csv module
-        conv_reader = csv.reader([header1_line, conv_data_line])
-        conv_header = [h.strip() for h in next(conv_reader)]
-        conv_data = next(conv_reader)
-
-        # Create df_conv from parsed data
-        conv_data_dict = dict(zip(conv_header, conv_data))
-        df_conv = pd.DataFrame({
-            'ID': [conv_data_dict.get('Conversation ID')],
-            'Type': ['Conversation'],
-            'Text': [conv_data_dict.get('Conversation Title')],
-            'Summary': [conv_data_dict.get('Conversation Summary')]
-        })
-
-        # Parse question summary section (header + data lines) using csv module
-        if question_data_lines:
-            quest_reader = csv.reader([header2_line] + question_data_lines)
-            quest_header = [h.strip() for h in next(quest_reader)]
-            quest_data = list(quest_reader)
-
-            # Create df_quest from parsed data
-            df_quest_raw = pd.DataFrame(quest_data, columns=quest_header)
-
-            required_quest_cols = ['Question ID', 'Question Type', 'Question Text', 'Question Summary']
-            if not all(col in df_quest_raw.columns for col in required_quest_cols):
-                logging.error(f"Missing expected columns after parsing question summary section of {file_path}. Found: {df_quest_raw.columns.tolist()}")
-                return False
-
-            df_quest = pd.DataFrame({
-                'ID': df_quest_raw['Question ID'],
-                'Type': df_quest_raw['Question Type'],
-                'Text': df_quest_raw['Question Text'],
-                'Summary': df_quest_raw['Question Summary']
-            })
-        else:
-             df_quest = pd.DataFrame(columns=target_cols) # Empty if no question lines
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
 
+    def filter(self, record):
+        records = getattr(self._local, 'records', None)
+        if records is None:
+            return True
+        records.append(record)
+        return False
 
-        # Concatenate
-        df_final = pd.concat([df_conv, df_quest], ignore_index=True)
+    def run(self, func, *args):
+        """Runs func(*args) capturing this thread's log records; returns (result, records)."""
+        self._local.records = []
+        try:
+            return func(*args), self._local.records
+        finally:
+            self._local.records = None
 
-        # Ensure final columns match target
-        if list(df_final.columns) != target_cols:
-             # This shouldn't happen if logic above is correct, but check anyway
-             logging.warning(f"Final columns {df_final.columns.tolist()} don\'t match target {target_cols}. Reordering.")
-             df_final = df_final[target_cols]
+def clean_export_file(file_path, markers, hardcoded_index=None):
+    """
+    Locates the header of one raw export and removes the rows before it.
 
-        # Overwrite the original file
-        df_final.to_csv(file_path, index=False, encoding='utf-8')
-        logging.info(f"Successfully cleaned and overwrote {file_path} to 4-column format.")
-        return True
+    Args:
+        file_path (Path): Path to the CSV file.
+        markers (list): Column names expected in the header.
+        hardcoded_index (int): 0-based header line to fall back to if the markers are not found.
 
-    except KeyError as e:
-         logging.error(f"Missing expected column during transformation of {file_path}: {e}", exc_info=True)
+    Returns:
+        str: 'cleaned', 'already clean' or 'failed'.
+    """
+    filename = file_path.name
+    logging.info(f"Processing file: {file_path}")
+
+    # 1. Try marker-based detection first
+    header = find_header_row(file_path, markers)
+
+    if header is not None and header.line_index == 0:
+        logging.info(f"Header already at line 1 (index 0) for {filename}. No cleanup needed.")
+        return 'already clean'
+    elif header is not None:
+        logging.info(f"Header found at index {header.line_index} using markers. Scheduling cleanup.")
+    else: # Markers didn't find it
+        logging.warning(f"Marker-based detection failed for {filename}.")
+        # 2. Fall back to the hardcoded index for files with a known layout
+        if hardcoded_index is not None:
+            logging.warning(f"Using hardcoded index {hardcoded_index} for {filename}.")
+            header = csv_line_at(file_path, hardcoded_index)
+            if header is None:
+                logging.error(f"{filename} is shorter than its hardcoded header index {hardcoded_index}.")
+        else:
+            # Markers failed, and no hardcoded index available
+            logging.error(f"Could not find header for {filename} using markers and no hardcoded index provided. Skipping cleanup.")
+
+    # 3. Perform cleanup if possible
+    if header is None:
+        logging.error(f"Final decision: Skipping cleanup for {filename} as header could not be reliably located.")
+        return 'failed'
+    if header.line_index == 0:
+        return 'already clean' # Hardcoded index 0
+    return 'cleaned' if clean_csv_metadata(file_path, header) else 'failed'
+
+def process_export_file(file_path, markers, hardcoded_index, manifest, tool_version, force):
+    """
+    Cleans one export unless the manifest shows it unchanged since the last cleanup.
+
+    Returns:
+        dict: file, step, status, reason (why it ran), size_mb and seconds.
+    """
+    start = time.perf_counter()
+    result = {'file': file_path.name, 'step': f"cleanup_metadata:{file_path.name}", 'reason': None, 'size_mb': 0.0}
+    if not file_path.exists():
+        logging.warning(f"File not found, skipping: {file_path}")
+        result.update(status='not found', seconds=time.perf_counter() - start)
+        return result
+    result['size_mb'] = file_path.stat().st_size / (1024 * 1024)
+
+    reason, input_hashes = check_step(manifest, result['step'], [str(file_path)], [str(file_path)], tool_version)
+    if reason is None and not force:
+        logging.info(f"Skipping {file_path.name}: unchanged since the last cleanup.")
+        result.update(status='unchanged', seconds=time.perf_counter() - start)
+        return result
+
+    if file_path.name.endswith("_summary.csv"):
+        logging.info(f"Processing special file: {file_path}")
+        status = 'cleaned' if clean_summary_csv(file_path) else 'failed'
+        if status == 'failed':
+            logging.error(f"Failed to clean {file_path.name}.")
+    else:
+        status = clean_export_file(file_path, markers, hardcoded_index)
+
+    if status != 'failed':
+        # Each file has its own manifest entry, so concurrent workers never write the same key
+        record_step(manifest, result['step'], input_hashes, [str(file_path)], tool_version)
+    result.update(status=status, reason="forced" if reason is None else reason, seconds=time.perf_counter() - start)
+    return result
+
+def print_cleanup_timings(results, wall_seconds, jobs):
+    """Prints one row per export file with its outcome, size and time."""
+    print(f"\n--- Cleanup timings ({jobs} job{'s' if jobs != 1 else ''}) ---")
+    print(f"{'File':<40} {'Status':<14} {'Size MB':>9} {'Seconds':>8}")
+    for result in results:
+        print(f"{result['file']:<40} {result['status']:<14} {result['size_mb']:>9.1f} {result['seconds']:>8.2f}")
+    total_file_seconds = sum(result['seconds'] for result in results)
+    print(f"{'Total':<40} {'':<14} {sum(r['size_mb'] for r in results):>9.1f} {total_file_seconds:>8.2f}")
+    print(f"Wall time: {wall_seconds:.2f}s")
 
 def main(args):
     gd_number = args.gd_number
     data_dir = Path("./Data") / f"GD{gd_number}"
+    jobs = getattr(args, 'jobs', 1)
 
     if not data_dir.is_dir():
         logging.error(f"Data directory not found: {data_dir}")
@@ -308,6 +423,11 @@ def main(args):
 
     logging.info(f"Starting metadata cleanup for GD{gd_number} in {data_dir}")
 
+    # Files whose cleaned contents are unchanged since the last run are skipped (see lib/preprocess_manifest.py)
+    manifest_path = get_manifest_path(data_dir)
+    manifest = load_manifest(manifest_path)
+    tool_version = code_version([__file__])
+
     # Define files to check and their key header markers
     # Exclude aggregate.csv (handled by preprocess_aggregate.py)
     # Exclude *_standardized.csv, *_report.csv etc.
@@ -317,7 +437,7 @@ def main(args):
         f"GD{gd_number}_binary.csv": ['Question ID', 'Participant ID', 'Thought ID', 'Vote'],
         f"GD{gd_number}_preference.csv": ['Question ID', 'Participant ID', 'Thought A ID', 'Thought B ID', 'Vote'],
         f"GD{gd_number}_verbatim_map.csv": ['Question ID', 'Question Text', 'Participant ID', 'Thought ID', 'Thought Text'],
-        f"GD{gd_number}_summary.csv": ['Conversation ID', 'Conversation Title', 'Questions Selected'],
+        f"GD{gd_number}_summary.csv": ['Conversation ID', 'Conversation Title', 'Questions Selected'], # Special two-section format
         # Add other raw Remesh files if necessary
     }
 
@@ -325,84 +445,56 @@ def main(args):
     hardcoded_headers = {
         f"GD{gd_number}_participants.csv": 11,
         f"GD{gd_number}_discussion_guide.csv": 12,
-        # f"GD{gd_number}_summary.csv": 7 # Removed - handled separately
     }
 
-    # --- Process standard files ---
-    for filename, markers in files_to_clean.items():
-        # Skip summary file in this loop
-        if "summary.csv" in filename:
-            continue
-
-        file_path = data_dir / filename
-        if file_path.exists():
-            logging.info(f"Processing file: {file_path}")
-            header_idx = -1
-            needs_cleaning = False
-
-            # 1. Try marker-based detection first
-            detected_idx = find_header_row(file_path, markers)
-
-            if detected_idx == 0:
-                logging.info(f"Header already at line 1 (index 0) for {filename}. No cleanup needed.")
-                header_idx = 0 # Mark as found at 0
-            elif detected_idx > 0:
-                logging.info(f"Header found at index {detected_idx} using markers. Scheduling cleanup.")
-                header_idx = detected_idx
-                needs_cleaning = True
-            else: # detected_idx == -1 (markers didn't find it)
-                logging.warning(f"Marker-based detection failed for {filename}.")
-                # 2. Check if it's a file with a hardcoded index
-                if filename in hardcoded_headers:
-                    logging.info(f"Checking hardcoded index for {filename}.")
-                    # 2a. Check if header is *already* at line 1 (index 0) even though markers failed
-                    # We need a quick check here without full find_header_row logic
-                    try:
-                        df_check = pd.read_csv(file_path, nrows=1, encoding='utf-8-sig') # Read first line + header
-                        df_check.columns = df_check.columns.str.replace('^\\ufeff', '', regex=True).str.strip()
-                        if all(marker in df_check.columns for marker in markers):
-                            logging.info(f"Header check confirms header is already at line 1 for {filename} (hardcoded case). No cleanup needed.")
-                            header_idx = 0 # Mark as found at 0
-                        else:
-                            logging.warning(f"Header not at line 1 for {filename}. Using hardcoded index.")
-                            header_idx = hardcoded_headers[filename]
-                            needs_cleaning = True
-                    except Exception as e:
-                        logging.error(f"Error checking line 1 for {filename} before using hardcoded index: {e}")
-                        # Fallback to assuming it needs cleaning with hardcoded index
-                        logging.warning(f"Falling back to hardcoded index {hardcoded_headers[filename]} for {filename}.")
-                        header_idx = hardcoded_headers[filename]
-                        needs_cleaning = True
-                else:
-                    # Markers failed, and no hardcoded index available
-                    logging.error(f"Could not find header for {filename} using markers and no hardcoded index provided. Skipping cleanup.")
-                    # Keep header_idx = -1
-
-            # 3. Perform cleanup if needed and possible
-            if needs_cleaning and header_idx > 0:
-                clean_csv_metadata(file_path, header_idx)
-            elif not needs_cleaning and header_idx == 0:
-                pass # Already clean, do nothing
-            elif header_idx == -1:
-                logging.error(f"Final decision: Skipping cleanup for {filename} as header could not be reliably located.")
+    tasks = [
+        (data_dir / filename, markers, hardcoded_headers.get(filename), manifest, tool_version, args.force)
+        for filename, markers in files_to_clean.items()
+    ]
 
-        else:
-            logging.warning(f"File not found, skipping: {file_path}")
-
-    # --- Process the special summary.csv file ---
-    summary_filename = f"GD{gd_number}_summary.csv"
-    summary_file_path = data_dir / summary_filename
-    if summary_file_path.exists():
-        logging.info(f"Processing special file: {summary_file_path}")
-        if not clean_summary_csv(summary_file_path):
-             logging.error(f"Failed to clean {summary_filename}.")
+    # --- Clean the files: independent, mostly I/O-bound, so threads overlap well ---
+    start = time.perf_counter()
+    if jobs <= 1:
+        results = [process_export_file(*task) for task in tasks]
     else:
-        logging.warning(f"File not found, skipping: {summary_file_path}")
-
+        log_buffer = PerThreadLogBuffer()
+        root_logger = logging.getLogger()
+        root_logger.addFilter(log_buffer)
+        results = []
+        try:
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                futures = [pool.submit(log_buffer.run, process_export_file, *task) for task in tasks]
+                # Replay each file's log as one block, in file order
+                for future in futures:
+                    result, records = future.result()
+                    for record in records:
+                        root_logger.handle(record)
+                    results.append(result)
+        finally:
+            root_logger.removeFilter(log_buffer)
+    wall_seconds = time.perf_counter() - start
+
+    save_manifest(manifest, manifest_path)
+    print_cleanup_timings(results, wall_seconds, jobs)
+    print_step_summary(
+        f"Metadata cleanup GD{gd_number}",
+        [(r['step'], r['reason']) for r in results if r['status'] in ('cleaned', 'already clean')],
+        [r['step'] for r in results if r['status'] == 'unchanged'],
+    )
     logging.info(f"Metadata cleanup for GD{gd_number} completed.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Remove initial metadata rows from raw Remesh CSV files, making the header the first line.")
-    parser.add_argument("--gd_number", type=int, required=True, help="Global Dialogue cadence number (e.g., 3).")
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument("--gd_number", type=int, help="Global Dialogue cadence number (e.g., 3).")
+    input_group.add_argument("--benchmark", type=float, metavar="GB", help="Time the cleanup copy on a synthetic binary.csv of this many GB and exit.")
+    parser.add_argument("--benchmark_dir", help="Directory for the synthetic benchmark file (default: system temp dir).")
+    parser.add_argument("--force", action="store_true", help="Clean every file even if it is unchanged since the last run (see preprocess_manifest.json).")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of files to clean concurrently (default: 1). Logs stay grouped per file, in file order.")
     args = parser.parse_args()
-    main(args) 
\ No newline at end of file
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1.")
+    if args.benchmark:
+        run_copy_benchmark(args.benchmark, args.benchmark_dir)
+    else:
+        main(args)
\ No newline at end of file
@@ -4,71 +4,61 @@ import argparse
 import re
 import glob
 import csv
+import contextlib
+import io
 import traceback # Added for better error reporting
+from concurrent.futures import ProcessPoolExecutor
+from lib.csv_header import find_csv_header, open_at_header
+from lib.preprocess_manifest import (
+    get_manifest_path, load_manifest, save_manifest, check_step, record_step, code_version, print_step_summary,
+)
+from lib.tag_assignments import write_tag_assignments, ASSIGNMENTS_FILENAME, DICTIONARY_FILENAME
+
+# Per-question output file suffix for each file type returned by process_raw_file
+OUTPUT_SUFFIXES = {"categories": "_tag_categories.csv", "labels": "_thought_labels.csv"}
+# Parsed per-question frames reused by rebuild_combined_files (inside the output directory, git-ignored)
+FRAME_CACHE_DIRNAME = '.frame_cache'
 
 def extract_metadata_and_find_header(file_path):
     """
     Reads the start of a Remesh CSV export to find metadata (like Question ID)
-    and the actual header row content and its index.
+    and the actual header row content and its location.
 
     Args:
         file_path (str): Path to the CSV file.
 
     Returns:
-        tuple: (metadata_dict, header_content, header_row_num) or (None, None, None) if fails.
+        tuple: (metadata_dict, header_content, header) or (None, None, None) if fails.
                metadata_dict contains extracted key-value pairs.
                header_content is the list of strings in the header row.
-               header_row_num is the 0-based index of the data header row.
+               header is the CsvHeader (encoding, byte offset, line index) of the data header row.
     """
-    metadata = {}
-    header_content = None
-    header_row_num = None
     expected_headers_cat_keys = ["category", "tag"]
     expected_headers_labels_keys = ["participant id", "sentiment"]
     optional_response_keys = ["response", "thought text"]
 
+    def is_data_header(columns):
+        row_lower_stripped = [h.lower() for h in columns]
+        # Check Categories header
+        is_cat_header = all(eh in row_lower_stripped for eh in expected_headers_cat_keys)
+        # Check Labels header (updated logic)
+        has_required_label_keys = all(eh in row_lower_stripped for eh in expected_headers_labels_keys)
+        has_optional_response_key = any(resp_key in row_lower_stripped for resp_key in optional_response_keys)
+        return is_cat_header or (has_required_label_keys and has_optional_response_key)
+
     try:
-        with open(file_path, 'r', encoding='utf-8-sig') as f:
-            reader = csv.reader(f)
-            for i, row in enumerate(reader):
-                # Check for metadata rows (Key, Value) - usually before the header
-                if len(row) == 2 and row[0] and row[1] and header_content is None:
-                    key = row[0].strip()
-                    value = row[1].strip()
-                    metadata[key] = value
-                # Check for potential data header
-                elif len(row) > 1:
-                    row_lower_stripped = [str(h).lower().strip() for h in row]
-                    
-                    # Check Categories header
-                    is_cat_header = all(eh in row_lower_stripped for eh in expected_headers_cat_keys)
-                    
-                    # Check Labels header (updated logic)
-                    has_required_label_keys = all(eh in row_lower_stripped for eh in expected_headers_labels_keys)
-                    has_optional_response_key = any(resp_key in row_lower_stripped for resp_key in optional_response_keys)
-                    is_labels_header = has_required_label_keys and has_optional_response_key
-
-                    if is_cat_header or is_labels_header:
-                        header_row_num = i
-                        header_content = [str(h).strip() for h in row]
-                        # print(f"Debug: Found header at row {i}: {header_content}")
-                        # Stop searching once header is found
-                        break 
-                
-                # Optimization: Stop searching for header after too many rows
-                if i > 30 and header_content is None: 
-                    print(f"Warning: Could not definitively locate data header in {file_path} within first 30 lines.")
-                    break
-
-        # Validation after reading whole file (or stopping early)
+        header = find_csv_header(file_path, predicate=is_data_header)
+        if header is None:
+             print(f"Warning: Data header row not found for {file_path}. Cannot process.")
+             return None, None, None
+
+        # Metadata rows (Key, Value) come before the header
+        metadata = {row[0].strip(): row[1].strip() for row in header.preamble if len(row) == 2 and row[0] and row[1]}
         if "Question IDs" not in metadata:
             print(f"Warning: 'Question IDs' not found in metadata for {file_path}. Cannot process.")
             return None, None, None
-        if header_content is None:
-             print(f"Warning: Data header row not found for {file_path}. Cannot process.")
-             return None, None, None
 
-        return metadata, header_content, header_row_num
+        return metadata, header.columns, header
 
     except Exception as e:
         print(f"Error reading or parsing metadata/header for {file_path}: {e}")
@@ -81,9 +71,9 @@ def process_raw_file(file_path, output_dir):
     Returns the Question ID and file type if successful.
     """
     print(f"Processing raw file: {os.path.basename(file_path)}")
-    metadata, header, header_idx = extract_metadata_and_find_header(file_path)
+    metadata, header, header_location = extract_metadata_and_find_header(file_path)
 
-    if metadata is None or header is None or header_idx is None:
+    if metadata is None or header is None or header_location is None:
         return None, None
 
     # --- QID Validation --- (same as before)
@@ -95,21 +85,21 @@ def process_raw_file(file_path, output_dir):
     # --- Manual Data Reading --- 
     data_rows = []
     try:
-        with open(file_path, 'r', encoding='utf-8-sig') as f:
+        with open_at_header(file_path, header_location, newline='') as f:
             reader = csv.reader(f)
-            for i, row in enumerate(reader):
-                if i > header_idx: # Only read rows after the header
-                    # Ensure row has at least as many columns as header 
-                    # (Pad shorter rows, truncate longer ones to match header length)
-                    # This helps handle rows with extra/fewer commas potentially
-                    row_len = len(row)
-                    header_len = len(header)
-                    if row_len < header_len:
-                        row.extend([None] * (header_len - row_len)) # Pad with None
-                    elif row_len > header_len:
-                        print(f"  Warning: Row {i+1} in {os.path.basename(file_path)} has {row_len} fields (expected {header_len}). Truncating.")
-                        row = row[:header_len] # Truncate
-                    data_rows.append(row)
+            next(reader, None) # Header row
+            for i, row in enumerate(reader, start=header_location.line_index + 1):
+                # Ensure row has at least as many columns as header 
+                # (Pad shorter rows, truncate longer ones to match header length)
+                # This helps handle rows with extra/fewer commas potentially
+                row_len = len(row)
+                header_len = len(header)
+                if row_len < header_len:
+                    row.extend([None] * (header_len - row_len)) # Pad with None
+                elif row_len > header_len:
+                    print(f"  Warning: Row {i+1} in {os.path.basename(file_path)} has {row_len} fields (expected {header_len}). Truncating.")
+                    row = row[:header_len] # Truncate
+                data_rows.append(row)
     except Exception as e:
         print(f"Error reading data rows for {file_path}: {e}")
         return None, None
@@ -224,16 +214,185 @@ def process_raw_file(file_path, output_dir):
         return None, None
 
 
-def rebuild_combined_files(output_dir):
+def _process_raw_file_captured(file_path, output_dir):
+    """Runs process_raw_file in a worker process, returning its printed output along with the result."""
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        qid, file_type = process_raw_file(file_path, output_dir)
+    return qid, file_type, log.getvalue()
+
+
+def process_raw_files(raw_files, output_dir, manifest, tool_version, jobs=1, force=False):
+    """
+    Processes raw tag exports, skipping those unchanged since the last run.
+
+    A raw file is skipped when it, the per-question file it produced and this
+    script all still hash to the values in the manifest. The remaining files
+    are processed in a process pool when jobs > 1; each file's messages are
+    printed together, in file order.
+
+    Args:
+        raw_files (list): Raw *_Tag_Categories.csv / *_Thought_Labels.csv paths.
+        output_dir (str): Directory for the cleaned per-question files.
+        manifest (dict): From load_manifest(); updated in place.
+        tool_version (str): From code_version().
+        jobs (int): Number of worker processes.
+        force (bool): Process every file even if it is unchanged.
+
+    Returns:
+        tuple: (processed_count, ran, skipped) where ran is a list of (step, reason)
+               and skipped a list of steps, for print_step_summary().
+    """
+    ran, skipped, pending = [], [], []
+    for file_path in raw_files:
+        step = f"preprocess_tag_files:{os.path.basename(file_path)}"
+        # The per-question output name comes from the Question ID inside the file, so take it from the last run
+        entry = manifest['steps'].get(step)
+        output_paths = list(entry.get('outputs', {})) if entry else []
+        reason, input_hashes = check_step(manifest, step, [file_path], output_paths, tool_version)
+        if reason is None and not force:
+            skipped.append(step)
+            continue
+        pending.append((file_path, step, "forced" if reason is None else reason, input_hashes))
+
+    if jobs > 1 and len(pending) > 1:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        futures = [pool.submit(_process_raw_file_captured, file_path, output_dir) for file_path, _, _, _ in pending]
+        outcomes = (future.result() for future in futures)
+    else:
+        pool = None
+        outcomes = (process_raw_file(file_path, output_dir) + ("",) for file_path, _, _, _ in pending)
+
+    processed_count = 0
+    try:
+        for (file_path, step, reason, input_hashes), (qid, file_type, log) in zip(pending, outcomes):
+            print(log, end="")
+            if qid and file_type:
+                processed_count += 1
+                output_path = os.path.join(output_dir, f"{qid}{OUTPUT_SUFFIXES[file_type]}")
+                record_step(manifest, step, input_hashes, [output_path], tool_version)
+                ran.append((step, reason))
+            else:
+                manifest['steps'].pop(step, None) # Retry next run
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return processed_count, ran, skipped
+
+
+class ProcessedFrameCache:
+    """
+    Parsed per-question frames kept between rebuilds of the combined files.
+
+    Each frame (as read by rebuild_combined_files, with its Question ID column)
+    is pickled to output_dir/.frame_cache/ and the manifest records the hash of
+    the per-question CSV it came from, so a rebuild only parses the CSVs that
+    changed and loads the rest from the cache.
+    """
+
+    def __init__(self, output_dir, manifest, tool_version, force=False):
+        self.cache_dir = os.path.join(output_dir, FRAME_CACHE_DIRNAME)
+        self.manifest = manifest
+        self.tool_version = tool_version
+        self.force = force
+        self.seen = set()
+        self.reused = 0
+        self.parsed = 0
+
+    def _step(self, filename):
+        return f"frame_cache:{filename}"
+
+    def _cache_path(self, filename):
+        return os.path.join(self.cache_dir, filename + '.pkl')
+
+    def load(self, file_path, read_frame):
+        """
+        Returns the frame for a per-question file, from the cache if the file is unchanged.
+
+        Args:
+            file_path (str): Per-question CSV.
+            read_frame (callable): Parses the CSV; returns a DataFrame, or None to skip the file (not cached).
+
+        Returns:
+            pd.DataFrame or None: As returned by read_frame.
+        """
+        filename = os.path.basename(file_path)
+        self.seen.add(filename)
+        step, cache_path = self._step(filename), self._cache_path(filename)
+        reason, input_hashes = check_step(self.manifest, step, [file_path], [cache_path], self.tool_version)
+        if reason is None and not self.force:
+            try:
+                df = pd.read_pickle(cache_path)
+                self.reused += 1
+                return df
+            except Exception as e:
+                print(f"  Warning: Ignoring unreadable cached frame {cache_path}: {e}")
+
+        df = read_frame()
+        self.parsed += 1
+        if df is None:
+            self.manifest['steps'].pop(step, None)
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        df.to_pickle(cache_path)
+        record_step(self.manifest, step, input_hashes, [cache_path], self.tool_version)
+        return df
+
+    def prune(self):
+        """Drops cached frames whose per-question file was not seen in this rebuild."""
+        prefix = self._step("")
+        for step in [s for s in self.manifest['steps'] if s.startswith(prefix)]:
+            filename = step[len(prefix):]
+            if filename not in self.seen:
+                del self.manifest['steps'][step]
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self._cache_path(filename))
+
+
+def _read_label_frame(file_path, qid):
+    """Reads one processed label file for the rebuild, or returns None if it lacks essential columns."""
+    filename = os.path.basename(file_path)
+    df = pd.read_csv(file_path)
+    df["Question ID"] = qid
+    # Basic check for essential columns before appending
+    # Assuming individual files now have correct 'ResponseText' and 'Tag N' columns
+    essential_cols = ["Question ID", "Participant ID", "ResponseText", "Sentiment"]
+    if not all(ec in df.columns for ec in essential_cols[:2]): # Check QID, PartID
+        print(f"Warning: Skipping {filename} during rebuild - missing Question ID or Participant ID.")
+        return None
+    if "ResponseText" not in df.columns: # Check ResponseText explicitly
+         print(f"Warning: Skipping {filename} during rebuild - missing ResponseText column.")
+         return None
+    if "Sentiment" not in df.columns: # Check Sentiment explicitly
+         print(f"Warning: Skipping {filename} during rebuild - missing Sentiment column.")
+         return None
+    return df
+
+
+def _read_category_frame(file_path, qid):
+    """Reads one processed category file for the rebuild, or returns None if it lacks the Category column."""
+    df = pd.read_csv(file_path)
+    df["Question ID"] = qid
+    # Basic check
+    if "Category" not in df.columns:
+        print(f"Warning: Skipping {os.path.basename(file_path)} during rebuild - missing Category column.")
+        return None
+    return df
+
+
+def rebuild_combined_files(output_dir, frame_cache=None):
     """
     Scans the output directory for processed individual files and rebuilds
     the combined all_tag_categories.csv and all_thought_labels.csv files.
+    Files are combined in name order. With a ProcessedFrameCache, only the
+    individual files that changed since the last rebuild are parsed.
     """
     print("\nRebuilding combined files...")
+    load_frame = frame_cache.load if frame_cache is not None else (lambda file_path, read_frame: read_frame())
 
     # --- Rebuild Labels ---
     all_labels_dfs = []
-    label_files = glob.glob(os.path.join(output_dir, '*_thought_labels.csv'))
+    label_files = sorted(glob.glob(os.path.join(output_dir, '*_thought_labels.csv')))
     print(f"\nFound {len(label_files)} processed label files.")
     for file_path in label_files:
         filename = os.path.basename(file_path)
@@ -243,21 +402,9 @@ def rebuild_combined_files(output_dir):
         if match:
             qid = match.group(1)
             try:
-                df = pd.read_csv(file_path)
-                df["Question ID"] = qid
-                # Basic check for essential columns before appending
-                # Assuming individual files now have correct 'ResponseText' and 'Tag N' columns
-                essential_cols = ["Question ID", "Participant ID", "ResponseText", "Sentiment"]
-                if not all(ec in df.columns for ec in essential_cols[:2]): # Check QID, PartID
-                    print(f"Warning: Skipping {filename} during rebuild - missing Question ID or Participant ID.")
+                df = load_frame(file_path, lambda: _read_label_frame(file_path, qid))
+                if df is None:
                     continue
-                if "ResponseText" not in df.columns: # Check ResponseText explicitly
-                     print(f"Warning: Skipping {filename} during rebuild - missing ResponseText column.")
-                     continue
-                if "Sentiment" not in df.columns: # Check Sentiment explicitly
-                     print(f"Warning: Skipping {filename} during rebuild - missing Sentiment column.")
-                     continue
-
                 all_labels_dfs.append(df) # Append the whole df, selection happens after concat
             except Exception as e: print(f"  Error reading processed label file {file_path}: {e}")
         else: print(f"  Warning: Could not extract QID from label filename {filename}")
@@ -316,17 +463,26 @@ def rebuild_combined_files(output_dir):
 
             combined_labels_df = combined_labels_df[final_cols] # Reorder columns
             output_path = os.path.join(output_dir, 'all_thought_labels.csv')
+            labels_saved = False
             try:
                 combined_labels_df.to_csv(output_path, index=False, encoding='utf-8-sig')
+                labels_saved = True
                 print(f"Saved combined labels file: {output_path}")
             except Exception as e: print(f"  Error saving combined labels file: {e}")
+            # Long-format (thought, tag) table for tag lookups (see lib/tag_assignments.py)
+            try:
+                assignments, dictionary = write_tag_assignments(combined_labels_df, output_dir,
+                                                                output_path if labels_saved else None)
+                print(f"Saved {len(assignments)} tag assignments ({len(dictionary)} distinct tags): "
+                      f"{os.path.join(output_dir, ASSIGNMENTS_FILENAME)}, {os.path.join(output_dir, DICTIONARY_FILENAME)}")
+            except Exception as e: print(f"  Error saving tag assignment table: {e}")
         else: print("Processed labels list was empty after standardization or initial read.")
     else: print("No processed label files found to combine.")
 
 
     # --- Rebuild Categories ---
     all_categories_dfs = []
-    category_files = glob.glob(os.path.join(output_dir, '*_tag_categories.csv'))
+    category_files = sorted(glob.glob(os.path.join(output_dir, '*_tag_categories.csv')))
     print(f"\nFound {len(category_files)} processed category files.")
     for file_path in category_files:
         filename = os.path.basename(file_path)
@@ -336,11 +492,8 @@ def rebuild_combined_files(output_dir):
         if match:
             qid = match.group(1)
             try:
-                df = pd.read_csv(file_path)
-                df["Question ID"] = qid
-                # Basic check
-                if "Category" not in df.columns:
-                    print(f"Warning: Skipping {filename} during rebuild - missing Category column.")
+                df = load_frame(file_path, lambda: _read_category_frame(file_path, qid))
+                if df is None:
                     continue
                 all_categories_dfs.append(df)
             except Exception as e: print(f"  Error reading processed category file {file_path}: {e}")
@@ -393,31 +546,46 @@ def rebuild_combined_files(output_dir):
         else: print("Processed categories list was empty after standardization or initial read.")
     else: print("No processed category files found to combine.")
 
+    if frame_cache is not None:
+        frame_cache.prune()
+        print(f"\nParsed {frame_cache.parsed} changed individual file(s); reused {frame_cache.reused} cached frame(s).")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Preprocess Remesh tag export files.")
     parser.add_argument("--raw_dir", required=True, help="Directory containing raw Remesh *_Tag_Categories.csv and *_Thought_Labels.csv files.")
     parser.add_argument("--output_dir", required=True, help="Directory to save cleaned individual and combined tag files.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of raw files to process in parallel worker processes (default: 1).")
+    parser.add_argument("--force", action="store_true", help="Reprocess every raw file and re-read every individual file even if unchanged since the last run (see preprocess_manifest.json in the output directory).")
     args = parser.parse_args()
+    if args.jobs < 1: parser.error("--jobs must be at least 1.")
     if not os.path.isdir(args.raw_dir): print(f"Error: Raw directory not found: {args.raw_dir}"); exit(1)
     if not os.path.isdir(args.output_dir): print(f"Output directory not found, creating: {args.output_dir}"); os.makedirs(args.output_dir)
 
+    # Raw files and parsed frames unchanged since the last run are skipped (see lib/preprocess_manifest.py)
+    manifest_path = get_manifest_path(args.output_dir)
+    manifest = load_manifest(manifest_path)
+    tool_version = code_version([__file__])
+
     # --- Process Raw Files --- 
-    raw_files = glob.glob(os.path.join(args.raw_dir, '*.csv'))
+    raw_files = sorted(glob.glob(os.path.join(args.raw_dir, '*.csv')))
     print(f"Found {len(raw_files)} CSV files in raw directory.")
-    processed_count = 0
+    tag_files = []
     for file_path in raw_files:
         basename = os.path.basename(file_path)
         if "_Tag_Categories" in basename or "_Thought_Labels" in basename:
-            qid, file_type = process_raw_file(file_path, args.output_dir)
-            if qid and file_type:
-                processed_count += 1
+            tag_files.append(file_path)
         else:
             print(f"Skipping file with unexpected name format: {basename}")
-    print(f"\nProcessed {processed_count} raw files.")
+    processed_count, ran, skipped = process_raw_files(tag_files, args.output_dir, manifest, tool_version, jobs=args.jobs, force=args.force)
+    print(f"\nProcessed {processed_count} raw files ({len(skipped)} unchanged, skipped).")
+    save_manifest(manifest, manifest_path)
 
     # --- Rebuild Combined Files ---
-    rebuild_combined_files(args.output_dir)
+    frame_cache = ProcessedFrameCache(args.output_dir, manifest, tool_version, force=args.force)
+    rebuild_combined_files(args.output_dir, frame_cache)
+    save_manifest(manifest, manifest_path)
+    print_step_summary("preprocess_tag_files.py", ran, skipped)
 
     print("\nPreprocessing complete.")
     print(f"Cleaned files saved in: {args.output_dir}")
@@ -0,0 +1,58 @@
+"""Puts tools/scripts on sys.path so tests import scripts and lib modules the way the scripts do."""
+
+import os
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SEGMENTS = ['All', 'O1: English', 'O1: French', 'O2: 18-25', 'O2: 26-35', 'O2: 36-45',
+            'O3: Female', 'O3: Male', 'Africa', 'Europe']
+
+
+def make_standardized_round(directory, num_questions=6, responses_per_question=60, seed=0):
+    """
+    Writes a small synthetic GD9_aggregate_standardized.csv and segment counts file.
+
+    Agreement is whole percent strings ('-' or blank for no data), so many
+    responses tie on their scores, and one segment is too small for the default
+    minimum size. Sample ID mixes numbers, text and blanks.
+
+    Returns:
+        tuple: (standardized CSV path, segment counts CSV path) as strings.
+    """
+    rng = np.random.default_rng(seed)
+    rows, counts = [], []
+    for q in range(num_questions):
+        q_id = f"q{q:02d}-{rng.integers(1 << 30):08x}"
+        q_type = 'Ask Opinion' if q % 3 else 'Poll Single Select'
+        sizes = rng.integers(20, 400, size=len(SEGMENTS))
+        sizes[SEGMENTS.index('O1: French')] = 8
+        counts.append({'Question ID': q_id, **dict(zip(SEGMENTS, sizes.tolist()))})
+        for r in range(responses_per_question):
+            pct = rng.integers(0, 101, size=len(SEGMENTS)).astype(object)
+            pct = [f"{p}%" for p in pct]
+            for i in rng.choice(len(SEGMENTS), size=rng.integers(0, 4), replace=False):
+                pct[i] = '-' if rng.random() < 0.5 else ''
+            rows.append({
+                'Question ID': q_id, 'Question Type': q_type, 'Question': f"Question {q}?",
+                'Response': f"Response {q}-{r}", 'OriginalResponse': f"Response {q}-{r}",
+                'Star': '', 'Categories': '', 'Sentiment': '', 'Submitted By': '', 'Language': 'en',
+                'Sample ID': ['', 'S1', str(r)][r % 3], 'Participant ID': f"p{r:03d}",
+                **dict(zip(SEGMENTS, pct)),
+            })
+    std_path = os.path.join(directory, 'GD9_aggregate_standardized.csv')
+    counts_path = os.path.join(directory, 'GD9_segment_counts_by_question.csv')
+    pd.DataFrame(rows).to_csv(std_path, index=False)
+    pd.DataFrame(counts).to_csv(counts_path, index=False)
+    return std_path, counts_path
+
+
+@pytest.fixture
+def standardized_round(tmp_path):
+    return make_standardized_round(str(tmp_path))
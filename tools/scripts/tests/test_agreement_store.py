@@ -0,0 +1,116 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from calculate_consensus import calculate_consensus_profiles, calculate_major_segment_consensus
+from calculate_divergence import calculate_divergence_report
+from lib import agreement_store
+from lib.agreement_store import (
+    build_agreement_store, load_agreement_store, load_standardized_frame, load_standardized_store,
+    standardized_df_to_store, write_typed_standardized,
+)
+from lib.analysis_utils import load_standardized_data
+
+
+def test_store_keeps_missing_text_missing(standardized_round):
+    std_path, counts_path = standardized_round
+    # Object (not pyarrow string) columns, as read_csv returns them before pandas 3
+    with pd.option_context('future.infer_string', False):
+        store = load_agreement_store(build_agreement_store(std_path, counts_path))
+        expected = pd.read_csv(std_path, low_memory=False)['Sample ID']
+    sample_ids = store['rows']['Sample ID']
+    assert sample_ids.isna().tolist() == expected.isna().tolist()
+    assert 'nan' not in set(sample_ids.dropna())
+
+
+def _report_files(output_dir):
+    return {name: open(os.path.join(output_dir, name), 'rb').read() for name in sorted(os.listdir(output_dir))}
+
+
+def test_reports_from_store_match_reports_from_csv(standardized_round, tmp_path):
+    std_path, counts_path = standardized_round
+    counts = pd.read_csv(counts_path)
+    outputs = {}
+    for source in ['csv', 'store']:
+        if source == 'csv':
+            store = standardized_df_to_store(pd.read_csv(std_path, low_memory=False), counts_path)
+        else:
+            store = load_standardized_store(std_path, counts_path)
+            assert isinstance(store['agreement'], np.memmap)
+        output_dir = str(tmp_path / source)
+        calculate_divergence_report(store, counts.copy(), output_dir, min_segment_size=15,
+                                    top_n_per_question=5, top_n_overall=10)
+        calculate_consensus_profiles(store, counts.copy(), output_dir, min_segment_size=15)
+        outputs[source] = _report_files(output_dir)
+    assert outputs['store'] == outputs['csv']
+    assert 'divergence_overall.csv' in outputs['store']
+
+
+def test_typed_parquet_fallback_matches_store(standardized_round, tmp_path, monkeypatch):
+    std_path, counts_path = standardized_round
+    counts = pd.read_csv(counts_path)
+    stores = {'store': load_standardized_store(std_path, counts_path)}
+    assert write_typed_standardized(std_path) is not None
+    monkeypatch.setattr(agreement_store, 'open_agreement_store', lambda *args, **kwargs: None)
+    read_csv = pd.read_csv
+
+    def read_csv_except_standardized(path, *args, **kwargs):
+        assert str(path) != str(std_path), "typed copy should be read instead of the CSV"
+        return read_csv(path, *args, **kwargs)
+
+    monkeypatch.setattr(pd, 'read_csv', read_csv_except_standardized)
+    stores['typed'] = load_standardized_store(std_path, counts_path)
+    monkeypatch.undo()
+    assert not any(isinstance(dtype, pd.CategoricalDtype) for dtype in stores['typed']['rows'].dtypes)
+
+    outputs = {}
+    for source, store in stores.items():
+        output_dir = str(tmp_path / source)
+        calculate_divergence_report(store, counts.copy(), output_dir, min_segment_size=15,
+                                    top_n_per_question=5, top_n_overall=10)
+        calculate_consensus_profiles(store, counts.copy(), output_dir, min_segment_size=15)
+        outputs[source] = _report_files(output_dir)
+    assert outputs['typed'] == outputs['store']
+
+
+def test_load_standardized_data_is_load_standardized_frame(standardized_round):
+    std_path, _ = standardized_round
+    pd.testing.assert_frame_equal(load_standardized_data(std_path), load_standardized_frame(std_path))
+    assert load_standardized_data(str(std_path) + '.missing') is None
+
+
+def test_chunked_reports_match_whole_store(standardized_round, tmp_path):
+    std_path, counts_path = standardized_round
+    counts = pd.read_csv(counts_path)
+    store = load_standardized_store(std_path, counts_path)
+    outputs = {}
+    for chunksize in [None, 7, 50]:
+        output_dir = str(tmp_path / f"chunks_{chunksize}")
+        calculate_divergence_report(store, counts.copy(), output_dir, min_segment_size=15,
+                                    top_n_per_question=5, top_n_overall=10, chunksize=chunksize)
+        calculate_major_segment_consensus(store, counts.copy(), {}, output_dir, min_segment_size=15,
+                                          top_n=3, chunksize=chunksize)
+        outputs[chunksize] = _report_files(output_dir)
+    assert outputs[7] == outputs[None]
+    assert outputs[50] == outputs[None]
+
+
+def test_top_n_percentile_outside_percentiles(standardized_round, tmp_path):
+    std_path, counts_path = standardized_round
+    counts = pd.read_csv(counts_path)
+    store = load_standardized_store(std_path, counts_path)
+    profiles, results = {}, {}
+    for chunksize in [None, 50]:
+        output_dir = tmp_path / f"chunks_{chunksize}"
+        results[chunksize] = calculate_consensus_profiles(store, counts.copy(), str(output_dir), min_segment_size=15,
+                                                          percentiles_to_calc=[90, 50], top_n_percentiles=[100],
+                                                          chunksize=chunksize)
+        # Chunked profiles are written in file order, whole-store ones sorted
+        profiles[chunksize] = pd.read_csv(output_dir / 'consensus_profiles.csv', keep_default_na=False)
+        profiles[chunksize] = profiles[chunksize].sort_values(list(profiles[chunksize].columns), ignore_index=True)
+    pd.testing.assert_frame_equal(profiles[50], profiles[None])
+    assert [col for col in profiles[None].columns if col.startswith('MinAgree_')] == \
+        ['MinAgree_100pct', 'MinAgree_90pct', 'MinAgree_50pct']
+    expected_top = results[None].sort_values('MinAgree_100pct', ascending=False).head(5)
+    assert results[50]['MinAgree_100pct'].tolist() == expected_top['MinAgree_100pct'].tolist()
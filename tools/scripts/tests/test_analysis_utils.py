@@ -0,0 +1,128 @@
+import math
+
+import numpy as np
+import pytest
+
+from lib.analysis_utils import (
+    benjamini_hochberg, calculate_family_eta_squared, calculate_percentile_minimums, two_sided_normal_p_values,
+)
+
+PERCENTILES = [100, 95, 90, 75, 50, 33, 10, 1, 0]
+
+
+def _percentile_minimum(row, p):
+    """Per-row loop the vectorized version replaced."""
+    valid = sorted((rate for rate in row if not np.isnan(rate)), reverse=True)
+    if not valid or p == 0:
+        return np.nan
+    k = max(1, min(len(valid), math.ceil(len(valid) * p / 100.0)))
+    return valid[k - 1]
+
+
+def test_percentile_minimums_match_per_row_loop():
+    rng = np.random.default_rng(3)
+    rates = rng.random((200, 37)).round(2) # Rounding makes ties common
+    rates[rng.random(rates.shape) < 0.3] = np.nan
+    rates[5] = np.nan
+    rates[6, 1:] = np.nan
+    rates[6, 0] = 0.4
+
+    num_valid, values = calculate_percentile_minimums(rates, PERCENTILES)
+
+    assert num_valid.tolist() == (~np.isnan(rates)).sum(axis=1).tolist()
+    expected = np.array([[_percentile_minimum(row, p) for p in PERCENTILES] for row in rates])
+    np.testing.assert_array_equal(values, expected)
+    assert np.isnan(values[5]).all()
+    assert (values[6, :-1] == 0.4).all()
+
+
+@pytest.mark.parametrize('num_segments', [0, 1])
+def test_percentile_minimums_small_matrices(num_segments):
+    rates = np.full((3, num_segments), 0.5)
+    num_valid, values = calculate_percentile_minimums(rates, [100, 50, 0])
+    assert num_valid.tolist() == [num_segments] * 3
+    assert values.shape == (3, 3)
+    assert np.isnan(values[:, 2]).all()
+    assert (np.isnan(values[:, :2]) if num_segments == 0 else values[:, :2] == 0.5).all()
+
+
+def test_two_sided_normal_p_values():
+    p = two_sided_normal_p_values([0.0, 1.959963984540054, -1.959963984540054, np.inf, -np.inf, np.nan])
+    np.testing.assert_allclose(p[:3], [1.0, 0.05, 0.05])
+    assert p[3] == 0 and p[4] == 0
+    assert np.isnan(p[5])
+
+
+def _benjamini_hochberg(p_values):
+    """q_i = min over tests j with p_j >= p_i of p_j * m / rank_j, straight from the definition."""
+    valid = sorted(p for p in p_values if not np.isnan(p))
+    m = len(valid)
+    return [np.nan if np.isnan(p) else
+            min(1.0, min(valid[j] * m / (j + 1) for j in range(m) if valid[j] >= p))
+            for p in p_values]
+
+
+def test_benjamini_hochberg():
+    np.testing.assert_allclose(benjamini_hochberg([0.01, 0.04, 0.03, 0.005]), [0.02, 0.04, 0.04, 0.02])
+    np.testing.assert_allclose(benjamini_hochberg([0.01, 0.02, 0.03, 0.04, 0.05]), [0.05] * 5)
+
+    rng = np.random.default_rng(7)
+    p_values = np.concatenate([rng.random(80) ** 3, [0.2, 0.2, 0.2, 1.0, 0.0], [np.nan] * 5])
+    rng.shuffle(p_values)
+    q_values = benjamini_hochberg(p_values)
+    np.testing.assert_allclose(q_values, _benjamini_hochberg(p_values))
+    # NaN tests are left out of the family rather than counted
+    np.testing.assert_allclose(q_values[~np.isnan(p_values)], benjamini_hochberg(p_values[~np.isnan(p_values)]))
+    assert (q_values[~np.isnan(p_values)] >= p_values[~np.isnan(p_values)]).all()
+
+
+def test_benjamini_hochberg_empty():
+    assert benjamini_hochberg([]).shape == (0,)
+    assert np.isnan(benjamini_hochberg([np.nan, np.nan])).all()
+
+
+def _participant_eta_squared(rates, sizes):
+    """Eta-squared over individual 0/1 answers, each segment contributing n agree/disagree participants."""
+    groups = [np.repeat([1.0, 0.0], [round(n * p), n - round(n * p)]) for p, n in zip(rates, sizes)]
+    answers = np.concatenate(groups)
+    ss_total = ((answers - answers.mean()) ** 2).sum()
+    ss_between = sum(len(group) * (group.mean() - answers.mean()) ** 2 for group in groups)
+    return ss_between / ss_total
+
+
+def test_family_eta_squared_matches_participant_level_anova():
+    rng = np.random.default_rng(11)
+    family_codes = np.array([0, 0, 0, 1, 1, -1, 2])
+    sizes = rng.integers(5, 60, size=(40, len(family_codes))).astype(float)
+    rates = rng.integers(0, sizes + 1) / sizes
+
+    eta_squared, segments_used = calculate_family_eta_squared(rates, sizes, family_codes, 3)
+
+    assert eta_squared.shape == segments_used.shape == (40, 3)
+    assert (segments_used == [3, 2, 1]).all()
+    assert np.isnan(eta_squared[:, 2]).all() # A single segment explains nothing
+    for row in range(40):
+        for family in range(2):
+            in_family = family_codes == family
+            assert np.isclose(eta_squared[row, family],
+                              _participant_eta_squared(rates[row, in_family], sizes[row, in_family].astype(int)))
+
+
+def test_family_eta_squared_skips_unusable_cells():
+    family_codes = [0, 0, 0]
+    rates = np.array([
+        [0.2, 0.8, np.nan], # Missing rate
+        [0.2, 0.8, 0.5],    # Unknown size for the third segment
+        [0.5, 0.5, 0.5],    # No variance between segments
+        [1.0, 1.0, 1.0],    # No variance at all
+        [0.0, 1.0, 0.5],
+    ])
+    sizes = np.array([[10, 10, 10], [10, 10, np.nan], [10, 20, 30], [10, 20, 30], [10, 10, 0]])
+    eta_squared, segments_used = calculate_family_eta_squared(rates, sizes, family_codes, 1)
+
+    assert segments_used[:, 0].tolist() == [2, 2, 3, 3, 2]
+    assert np.isclose(eta_squared[0, 0], _participant_eta_squared([0.2, 0.8], [10, 10]))
+    assert eta_squared[1, 0] == eta_squared[0, 0]
+    assert eta_squared[2, 0] == 0
+    assert np.isnan(eta_squared[3, 0])
+    assert eta_squared[4, 0] == 1
@@ -0,0 +1,73 @@
+import csv
+
+import pytest
+
+from lib.csv_header import find_csv_header, open_at_header, sniff_encoding
+
+PREAMBLE = 'Conversation,Global Dialogues\r\nQuestion IDs,1b2c,3d4e\r\n\r\n'
+HEADER = 'Participant Id, Sample Provider Id ,Réponse\r\n'
+ROWS = 'p1,s1,oui\r\np2,s2,café\r\n'
+
+
+def _write(tmp_path, text, encoding, bom=False):
+    path = tmp_path / 'export.csv'
+    path.write_bytes((b'\xef\xbb\xbf' if bom else b'') + text.encode(encoding))
+    return path
+
+
+def _rows_after_header(path, header):
+    with open_at_header(path, header, newline='') as f:
+        return list(csv.reader(f))
+
+
+@pytest.mark.parametrize('encoding, bom, expected', [
+    ('utf-8', True, 'utf-8-sig'),
+    ('utf-8', False, 'utf-8'),
+    ('latin1', False, 'latin1'),
+])
+def test_finds_header_after_preamble(tmp_path, encoding, bom, expected):
+    path = _write(tmp_path, PREAMBLE + HEADER + ROWS, encoding, bom)
+    header = find_csv_header(path, markers=['Participant Id', 'Sample Provider Id'])
+
+    assert header.encoding == expected
+    assert header.line_index == 3
+    assert header.columns == ['Participant Id', 'Sample Provider Id', 'Réponse']
+    assert header.preamble[1] == ['Question IDs', '1b2c', '3d4e']
+    rows = _rows_after_header(path, header)
+    assert rows[0][2] == 'Réponse'
+    assert rows[2] == ['p2', 's2', 'café']
+
+
+def test_bom_on_header_line(tmp_path):
+    path = _write(tmp_path, HEADER + ROWS, 'utf-8', bom=True)
+    header = find_csv_header(path, markers=['Participant Id'])
+
+    assert header.offset == 3
+    assert header.columns[0] == 'Participant Id'
+    assert _rows_after_header(path, header)[0][0] == 'Participant Id'
+
+
+def test_sniff_encoding_tolerates_truncated_utf8():
+    data = 'café'.encode('utf-8')
+    assert sniff_encoding(data[:-1]) == 'utf-8'
+    assert sniff_encoding(data[:-1], final=True) == 'latin1'
+
+
+def test_latin1_file_ending_in_accent(tmp_path):
+    path = _write(tmp_path, PREAMBLE + HEADER + 'p1,s1,café', 'latin1')
+    header = find_csv_header(path, markers=['Participant Id'])
+    assert header.encoding == 'latin1'
+    assert _rows_after_header(path, header)[1] == ['p1', 's1', 'café']
+
+
+def test_header_cut_by_sniff_window_is_not_matched(tmp_path):
+    path = _write(tmp_path, PREAMBLE + HEADER + ROWS, 'utf-8')
+    cut = len((PREAMBLE + HEADER).encode('utf-8')) - 5
+    assert find_csv_header(path, markers=['Participant Id', 'Réponse'], sniff_bytes=cut) is None
+    assert find_csv_header(path, markers=['Participant Id', 'Réponse'], sniff_bytes=cut + 5).line_index == 3
+
+
+def test_start_line_skips_earlier_sections(tmp_path):
+    path = _write(tmp_path, HEADER + ROWS + HEADER + ROWS, 'utf-8')
+    assert find_csv_header(path, markers=['Participant Id']).line_index == 0
+    assert find_csv_header(path, markers=['Participant Id'], start_line=1).line_index == 3
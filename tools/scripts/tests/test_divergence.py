@@ -0,0 +1,41 @@
+import numpy as np
+
+from calculate_divergence import calculate_divergence_scores
+
+
+def test_gap_at_0_and_100_percent_is_finite():
+    rates = np.array([[0.0, 1.0], [1.0, 0.0], [0.2, 0.9]])
+    results = calculate_divergence_scores(rates, ['A', 'B'], segment_sizes=[30, 50])
+
+    assert np.isfinite(results[['Gap SE', 'Gap Z', 'Gap P Value']].to_numpy()).all()
+    # Pooled SE: p = (30 * 0 + 50 * 1) / 80
+    p = 50 / 80
+    expected_se = np.sqrt(p * (1 - p) * (1 / 30 + 1 / 50))
+    assert np.isclose(results.loc[0, 'Gap SE'], expected_se)
+    assert np.isclose(results.loc[0, 'Gap Z'], 1.0 / expected_se)
+    assert 0 < results.loc[0, 'Gap P Value'] < 1e-6
+
+
+def test_larger_segments_make_the_same_gap_more_significant():
+    rates = np.array([[0.3, 0.7]])
+    small = calculate_divergence_scores(rates, ['A', 'B'], segment_sizes=[20, 20])
+    large = calculate_divergence_scores(rates, ['A', 'B'], segment_sizes=[2000, 2000])
+    assert large.loc[0, 'Gap Z'] > small.loc[0, 'Gap Z']
+    assert large.loc[0, 'Gap P Value'] < small.loc[0, 'Gap P Value']
+
+
+def test_unknown_or_zero_sizes_give_nan_not_inf():
+    rates = np.array([[0.0, 1.0]])
+    for sizes in ([np.nan, 40], [0, 40]):
+        results = calculate_divergence_scores(rates, ['A', 'B'], segment_sizes=sizes)
+        values = results[['Gap SE', 'Gap Z', 'Gap P Value']].to_numpy()
+        assert not np.isinf(values).any()
+        assert np.isnan(values).all()
+
+
+def test_scores_only_rows_straddling_50_percent():
+    rates = np.array([[0.6, 0.7], [0.4, np.nan], [0.1, 0.8], [0.2, 0.3]])
+    results = calculate_divergence_scores(rates, ['A', 'B'])
+    assert results.index.tolist() == [2]
+    assert np.isclose(results.loc[2, 'Divergence Score'], np.sqrt(0.3 * 0.4))
+    assert 'Gap SE' not in results.columns
@@ -0,0 +1,51 @@
+import numpy as np
+
+from detect_duplicate_responses import build_synthetic_corpus
+from lib.duplicate_detection import detect_near_duplicates, find_near_duplicate_clusters
+
+
+def test_bucket_mates_below_threshold_are_not_merged():
+    # All three collide in band 0; 1 and 2 each match 0 on half the
+    # signature, and only 1 and 2 match each other on the rest.
+    signatures = np.array([
+        [1, 1, 2, 2, 3, 3, 4, 4],
+        [1, 1, 2, 2, 9, 9, 9, 9],
+        [1, 1, 8, 8, 9, 9, 9, 9],
+    ], dtype=np.uint32)
+    labels = find_near_duplicate_clusters(signatures, bands=4, threshold=0.75)
+    assert labels.tolist() == [0, 1, 1]
+
+
+def test_pairs_beyond_the_bucket_head_are_verified():
+    # 0 shares a bucket with 1 and 2 but is similar to neither; 1 and 2 are
+    # near-duplicates of each other, which a star around 0 would never check.
+    signatures = np.array([
+        [5, 5, 5, 5, 0, 0, 0, 0],
+        [5, 5, 5, 5, 1, 1, 1, 2],
+        [5, 5, 5, 5, 1, 1, 1, 3],
+    ], dtype=np.uint32)
+    labels = find_near_duplicate_clusters(signatures, bands=2, threshold=0.8)
+    assert labels.tolist() == [0, 1, 1]
+
+
+def test_large_identical_bucket_forms_one_cluster():
+    signatures = np.tile(np.arange(8, dtype=np.uint32), (100, 1))
+    labels = find_near_duplicate_clusters(signatures, bands=4, threshold=0.8, max_neighbors=4)
+    assert (labels == 0).all()
+
+
+def test_no_collisions_leaves_singletons():
+    signatures = np.arange(24, dtype=np.uint32).reshape(3, 8)
+    labels = find_near_duplicate_clusters(signatures, bands=4, threshold=0.5)
+    assert labels.tolist() == [0, 1, 2]
+
+
+def test_planted_duplicates_share_a_cluster_with_their_source():
+    corpus, planted, sources = build_synthetic_corpus(3000, seed=1)
+    texts = corpus['Thought Text'].to_numpy()
+    assert len(planted) > 100 and (sources < planted).all()
+    assert all(texts[i].startswith(texts[src] + ' ') for i, src in zip(planted, sources))
+
+    clusters = detect_near_duplicates(corpus)['Duplicate Cluster'].to_numpy()
+    found = (clusters[planted] >= 0) & (clusters[planted] == clusters[sources])
+    assert found.mean() > 0.95
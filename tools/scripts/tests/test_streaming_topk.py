@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from lib.streaming_topk import StreamingTopK
+
+
+def _scored_rows(n=500, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Score': rng.integers(0, 20, size=n) / 10.0, # Heavy ties
+        'Question ID': rng.choice(['q1', 'q2', 'q3'], size=n),
+        'Row Position': np.arange(n),
+    })
+
+
+def _feed(topk, df, block_sizes):
+    start = 0
+    for size in block_sizes:
+        topk.update(df.iloc[start:start + size])
+        start += size
+    topk.update(df.iloc[start:])
+    return topk.result()
+
+
+@pytest.mark.parametrize('group_by', [None, 'Question ID'])
+@pytest.mark.parametrize('block_sizes', [[], [1, 1, 1], [7] * 70, [250, 3, 100]])
+def test_result_does_not_depend_on_blocks(group_by, block_sizes):
+    df = _scored_rows()
+    sort_by, ascending = ['Score', 'Question ID', 'Row Position'], [False, True, True]
+    expected = df.sort_values(sort_by, ascending=ascending, kind='stable')
+    expected = (expected.groupby(group_by, sort=False).head(10) if group_by else expected.head(10)).reset_index(drop=True)
+
+    result = _feed(StreamingTopK(10, sort_by, ascending, group_by=group_by), df, block_sizes)
+    pd.testing.assert_frame_equal(result, expected)
+
+
+def test_nan_scores_sort_last():
+    df = _scored_rows(50)
+    df.loc[::3, 'Score'] = np.nan
+    topk = StreamingTopK(5, ['Score', 'Row Position'], [False, True])
+    result = _feed(topk, df, [10, 10, 10])
+    assert result['Score'].notna().all()
+    assert len(result) == 5
+
+
+def test_empty_stream():
+    topk = StreamingTopK(5, ['Score'], [False])
+    topk.update(pd.DataFrame())
+    assert topk.result().empty
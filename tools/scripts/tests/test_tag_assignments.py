@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from lib.tag_assignments import labels_to_tag_assignments, load_tag_assignments, rows_with_tag, write_tag_assignments
+
+
+def _labels():
+    return pd.DataFrame({
+        'Question ID': ['q1', 'q1', 'q2', 'q2'],
+        'Participant ID': ['p1', 'p2', 'p1', 'p3'],
+        'Tag 2': ['Safety', np.nan, ' Uninformative answer', 'Safety'],
+        'Tag 10': [np.nan, 'Jobs', '', np.nan],
+        'Tag 1': ['Jobs', 'Uninformative answer', 'Jobs', np.nan],
+    })
+
+
+def _expected_pairs(labels_df):
+    pairs = set()
+    for thought_index, row in labels_df.iterrows():
+        for col in labels_df.columns:
+            if col.startswith('Tag ') and pd.notna(row[col]) and str(row[col]).strip():
+                pairs.add((thought_index, str(row[col]).strip()))
+    return pairs
+
+
+def test_labels_to_tag_assignments():
+    labels_df = _labels()
+    assignments, dictionary = labels_to_tag_assignments(labels_df)
+
+    assert dictionary['tag'].tolist() == ['Jobs', 'Safety', 'Uninformative answer']
+    assert dictionary['row_count'].tolist() == [3, 2, 2]
+    assert dictionary['first_row'].tolist() == [0, 3, 5]
+    pairs = set(zip(assignments['thought_index'], dictionary['tag'].to_numpy()[assignments['tag_code']]))
+    assert pairs == _expected_pairs(labels_df)
+    assert len(assignments) == len(pairs)
+    # Sorted by tag, then thought, so each tag is one block
+    assert list(zip(assignments['tag_code'], assignments['thought_index'])) == \
+        sorted(zip(assignments['tag_code'], assignments['thought_index']))
+    assert assignments['participant_id'].tolist() == \
+        labels_df['Participant ID'].to_numpy()[assignments['thought_index']].tolist()
+
+    uninformative = rows_with_tag(assignments, dictionary, 'Uninformative answer')
+    assert uninformative['thought_index'].tolist() == [1, 2]
+    assert rows_with_tag(assignments, dictionary, 'Missing').empty
+
+
+def test_tag_assignments_without_tags():
+    labels_df = _labels()[['Question ID', 'Participant ID']]
+    assignments, dictionary = labels_to_tag_assignments(labels_df)
+    assert assignments.empty and dictionary.empty
+
+
+def test_load_checks_labels_size_and_hash(tmp_path):
+    labels_df = _labels()
+    labels_path = tmp_path / 'all_thought_labels.csv'
+    labels_df.to_csv(labels_path, index=False, encoding='utf-8-sig')
+    written = write_tag_assignments(labels_df, tmp_path, labels_path)
+
+    loaded = load_tag_assignments(tmp_path, labels_path)
+    pd.testing.assert_frame_equal(loaded[0], written[0], check_dtype=False)
+    pd.testing.assert_frame_equal(loaded[1], written[1], check_dtype=False)
+
+    # Same size and mtime, different content
+    stat = os.stat(labels_path)
+    data = labels_path.read_bytes()
+    labels_path.write_bytes(data.replace(b'p3', b'p4'))
+    os.utime(labels_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert load_tag_assignments(tmp_path, labels_path) is None
+    assert load_tag_assignments(tmp_path) is not None
+
+    # Tables written without a labels file have no signature to match
+    write_tag_assignments(labels_df, tmp_path)
+    assert load_tag_assignments(tmp_path, labels_path) is None